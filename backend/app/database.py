@@ -1,11 +1,36 @@
+from fastapi import Path
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.metrics import (
+    TimedAsyncAdaptedQueuePool,
+    TimedQueuePool,
+    instrument_engine,
+    state_collector,
+)
+from app.replicas import ReplicaPool, RoutingSession, reads_pinned_to_primary
+from app.sharding import ShardMap
+from app.slow_queries import slow_query_recorder
+from app.tracing import tracer
+
+
+def to_async_url(url: str) -> str:
+    return url.replace("+psycopg2", "+asyncpg", 1)
+
+
+def get_async_database_url() -> str:
+    """URL para el driver asíncrono (asyncpg), derivada de DATABASE_URL si no se configura"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    return to_async_url(settings.DATABASE_URL)
 
-# Crear engine
+
+# Engine síncrono: scripts (init_db.py, alembic, benchmarks) y creación de tablas
 engine = create_engine(
     settings.DATABASE_URL,
+    poolclass=TimedQueuePool,
     pool_pre_ping=True,
     pool_size=10,
     max_overflow=20
@@ -14,15 +39,131 @@ engine = create_engine(
 # Crear SessionLocal
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine asíncrono: todas las rutas de la API y tareas en segundo plano
+async_engine = create_async_engine(
+    get_async_database_url(),
+    poolclass=TimedAsyncAdaptedQueuePool,
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20
+)
+
+# Réplicas de solo lectura (ver app/replicas.py); sin DATABASE_REPLICA_URLS todo va a la primaria
+replica_pool = ReplicaPool(
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval_seconds=settings.REPLICA_CHECK_INTERVAL_SECONDS,
+    check_timeout_seconds=settings.REPLICA_CHECK_TIMEOUT_SECONDS
+)
+for i, url in enumerate(settings.DATABASE_REPLICA_URLS):
+    replica_pool.add(f"replica_{i}", create_async_engine(
+        to_async_url(url),
+        poolclass=TimedAsyncAdaptedQueuePool,
+        pool_pre_ping=True,
+        pool_size=settings.REPLICA_POOL_SIZE,
+        max_overflow=settings.REPLICA_MAX_OVERFLOW
+    ))
+
+# Shards adicionales por edificio (ver app/sharding.py); el shard 0 es async_engine
+shard_engines = [
+    create_async_engine(
+        to_async_url(url),
+        poolclass=TimedAsyncAdaptedQueuePool,
+        pool_pre_ping=True,
+        pool_size=settings.SHARD_POOL_SIZE,
+        max_overflow=settings.SHARD_MAX_OVERFLOW
+    )
+    for url in settings.SHARD_DATABASE_URLS
+]
+
+# Métricas de pool y de sentencias SQL (ver app/metrics.py)
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+state_collector.add_pool("sync", engine.pool)
+state_collector.add_pool("async", async_engine.pool)
+for replica in replica_pool.replicas:
+    instrument_engine(replica.engine.sync_engine, replica.name)
+    state_collector.add_pool(replica.name, replica.engine.pool)
+for i, shard_engine in enumerate(shard_engines, start=1):
+    instrument_engine(shard_engine.sync_engine, f"shard_{i}")
+    state_collector.add_pool(f"shard_{i}", shard_engine.pool)
+
+# Sentencias lentas con plan EXPLAIN (ver app/slow_queries.py)
+if settings.SLOW_QUERY_ENABLED:
+    slow_query_recorder.instrument(engine, "sync", explain_engine=engine)
+    slow_query_recorder.instrument(async_engine.sync_engine, "async", explain_engine=async_engine)
+    for replica in replica_pool.replicas:
+        slow_query_recorder.instrument(replica.engine.sync_engine, replica.name, explain_engine=replica.engine)
+    for i, shard_engine in enumerate(shard_engines, start=1):
+        slow_query_recorder.instrument(shard_engine.sync_engine, f"shard_{i}", explain_engine=shard_engine)
+
+# Un span por sentencia dentro de las trazas muestreadas (ver app/tracing.py)
+if tracer.enabled:
+    tracer.instrument_engine(engine)
+    tracer.instrument_engine(async_engine.sync_engine)
+    for replica in replica_pool.replicas:
+        tracer.instrument_engine(replica.engine.sync_engine)
+    for shard_engine in shard_engines:
+        tracer.instrument_engine(shard_engine.sync_engine)
+
+# expire_on_commit=False: tras un commit los atributos siguen disponibles sin E/S implícita
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# Sesiones de lectura: SELECT a una réplica si se indica en info["replica"], escrituras a la primaria
+ReadSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+def read_session() -> AsyncSession:
+    """Sesión para consultas: réplica al día por turno rotativo, o la primaria si no hay
+    réplicas elegibles o el cliente acaba de escribir (lectura de sus propias escrituras)"""
+    replica = None if reads_pinned_to_primary() else replica_pool.choose()
+    return ReadSessionLocal(info={"replica": replica})
+
+
+# Mapa edificio -> shard; con un solo shard todo va a la base principal como antes
+shard_map = ShardMap(assignments={edificio.upper(): i for edificio, i in settings.SHARD_MAP.items()})
+shard_map.add("shard_0", async_engine, AsyncSessionLocal, read_session)
+for i, shard_engine in enumerate(shard_engines, start=1):
+    shard_map.add(
+        f"shard_{i}",
+        shard_engine,
+        async_sessionmaker(shard_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    )
+shard_map.check_assignments()
+
+
 # Base para modelos
 Base = declarative_base()
 
 
 # Dependency para obtener DB session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
+
+# Dependency para rutas de solo lectura (ver read_session)
+async def get_read_db():
+    async with read_session() as db:
+        yield db
+
+
+# Dependencies para rutas de un edificio (/{edificio}/...): sesión en el shard que lo contiene
+async def get_building_db(edificio: str = Path(..., max_length=10)):
+    async with shard_map.session(edificio.upper()) as db:
+        yield db
+
+
+async def get_building_read_db(edificio: str = Path(..., max_length=10)):
+    async with shard_map.read_session(edificio.upper()) as db:
+        yield db
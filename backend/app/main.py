@@ -1,18 +1,87 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import readings, alerts, predictions, dashboard, data_import, notifications
+from sqlalchemy import create_engine
+from app.routers import readings, alerts, predictions, dashboard, buildings, data_import, notifications, jobs, admin
 from app.config import settings
-from app.database import engine, Base
+from app.database import engine, async_engine, replica_pool, shard_map
+from app.models.lectura_compacta import create_tables
+from app.middleware.admission import AdmissionControlMiddleware, admission_controller
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.query_budget import QueryBudgetMiddleware, query_tracker
+from app.middleware.read_your_writes import ReadYourWritesMiddleware
+from app.middleware.tracing import TracingMiddleware
+from app.metrics import (
+    METRICS_CONTENT_TYPE,
+    admission_metrics,
+    job_metrics,
+    line_protocol_metrics,
+    render_metrics,
+    spool_metrics,
+    state_collector,
+)
+from app.profiling import ProfilingMiddleware, request_profiler
+from app.responses import ORJSONResponse
+from app.services.prediction_scheduler import prediction_scheduler
+from app.services.line_protocol_listener import line_protocol_listener
+from app.services.spool import reading_spool, spool_replayer
+from app.services.job_service import job_manager
+from app.services.training_service import shutdown_executor
+from app.tracing import tracer
+
+# Crear tablas si no existen (también en los shards adicionales)
+create_tables(engine)
+for shard_url in settings.SHARD_DATABASE_URLS:
+    shard_engine = create_engine(shard_url)
+    create_tables(shard_engine)
+    shard_engine.dispose()
+
+# Estado de los servicios, leído al momento del scrape de /metrics
+state_collector.add_source("admission", lambda: admission_metrics(admission_controller))
+state_collector.add_source("spool", lambda: spool_metrics(reading_spool))
+state_collector.add_source("jobs", lambda: job_metrics(job_manager))
+state_collector.add_source("line_protocol", lambda: line_protocol_metrics(line_protocol_listener))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tareas en segundo plano
+    tracer.start()
+    await replica_pool.start()
+    reading_spool.start()
+    spool_replayer.start()
+    job_manager.start()
+    if settings.PREDICTION_SCHEDULER_ENABLED:
+        prediction_scheduler.start()
+    if settings.LINE_PROTOCOL_ENABLED:
+        await line_protocol_listener.start()
+    yield
+    if settings.LINE_PROTOCOL_ENABLED:
+        await line_protocol_listener.stop()
+    await prediction_scheduler.stop()
+    await job_manager.stop()
+    await spool_replayer.stop()
+    await reading_spool.stop()
+    shutdown_executor()
+    await replica_pool.stop()
+    await shard_map.stop()
+    await async_engine.dispose()
+    await tracer.stop()
 
-# Crear tablas si no existen
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    description="API para sistema de monitoreo SmartFloors"
+    description="API para sistema de monitoreo SmartFloors",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Lectura de las propias escrituras con réplicas: tras escribir, el cliente lee de la primaria
+if replica_pool.enabled:
+    app.add_middleware(ReadYourWritesMiddleware, pool=replica_pool)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -22,13 +91,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión negociada (brotli/gzip) para respuestas grandes
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.RESPONSE_COMPRESSION_MIN_BYTES,
+    gzip_level=settings.RESPONSE_GZIP_LEVEL,
+    brotli_quality=settings.RESPONSE_BROTLI_QUALITY
+)
+
+# Control de admisión: límites por ruta de ingesta y prioridad para lecturas interactivas
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+
+# Perfilado cProfile de requests con X-Profile (y token de administración) o muestreados
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
+# Sentencias SQL por request: presupuestos por ruta, detector de N+1 y headers de depuración
+if settings.QUERY_TRACKING_ENABLED:
+    app.add_middleware(QueryBudgetMiddleware, tracker=query_tracker, debug_headers=settings.QUERY_DEBUG_HEADERS)
+
+# Span raíz por request (los spans de servicios y SQL cuelgan de él)
+if tracer.enabled:
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Métricas por ruta: se agrega al final para medir también la espera de admisión
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Incluir routers
 app.include_router(readings.router, prefix="/api/v1/readings", tags=["Readings"])
 app.include_router(alerts.router, prefix="/api/v1/alerts", tags=["Alerts"])
 app.include_router(predictions.router, prefix="/api/v1/predictions", tags=["Predictions"])
 app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["Dashboard"])
+app.include_router(buildings.router, prefix="/api/v1/buildings", tags=["Buildings"])
 app.include_router(data_import.router, prefix="/api/v1/data", tags=["Data Import"])
 app.include_router(notifications.router, prefix="/api/v1/notifications", tags=["Notifications"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["Jobs"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"], include_in_schema=bool(settings.ADMIN_TOKEN))
 
 
 @app.get("/")
@@ -43,3 +142,45 @@ def root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métricas en formato de texto Prometheus"""
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/health/queries")
+def query_stats():
+    """Sentencias SQL por ruta, presupuestos excedidos y sentencias repetidas (N+1)"""
+    return query_tracker.summary()
+
+
+@app.get("/health/tracing")
+def tracing_stats():
+    """Spans terminados, exportados, en cola y descartados"""
+    return tracer.stats()
+
+
+@app.get("/health/replicas")
+def replica_stats():
+    """Retraso medido de cada réplica de lectura y cuáles reciben consultas"""
+    return replica_pool.stats()
+
+
+@app.get("/health/shards")
+def shard_stats():
+    """Shards por edificio, sesiones abiertas en cada uno y consultas repartidas en todos"""
+    return shard_map.stats()
+
+
+@app.get("/health/admission")
+def admission_stats():
+    """Cupos en uso, profundidad de la cola de ingesta y rechazos por ruta"""
+    return admission_controller.stats()
+
+
+@app.get("/health/spool")
+def spool_stats():
+    """Estado de la base según la ingesta y lecturas pendientes en el spool local"""
+    return reading_spool.summary()
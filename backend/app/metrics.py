@@ -0,0 +1,284 @@
+"""
+Métricas Prometheus de la API (expuestas en /metrics).
+
+La instrumentación es de bajo costo: contadores e histogramas en memoria
+actualizados con eventos de SQLAlchemy y un middleware ASGI; los estados de
+admisión, spool y listener se leen recién al momento del scrape. Con varios
+workers de uvicorn, definir PROMETHEUS_MULTIPROC_DIR para agregarlos.
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Optional
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    disable_created_metrics,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+# Las series *_created no aportan en los dashboards y duplican el volumen del scrape
+disable_created_metrics()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "smartfloors_http_request_duration_seconds",
+    "Latencia de requests HTTP por ruta",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "smartfloors_http_requests_in_progress",
+    "Requests HTTP en curso",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+DB_POOL_CHECKOUTS = Counter(
+    "smartfloors_db_pool_checkouts_total",
+    "Conexiones tomadas del pool",
+    ["engine"],
+)
+DB_POOL_WAIT = Histogram(
+    "smartfloors_db_pool_wait_seconds",
+    "Espera para obtener una conexión del pool (incluye abrir conexiones nuevas)",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+DB_QUERIES = Counter(
+    "smartfloors_db_queries_total",
+    "Sentencias SQL ejecutadas",
+    ["engine"],
+)
+DB_QUERY_DURATION = Histogram(
+    "smartfloors_db_query_duration_seconds",
+    "Duración de sentencias SQL",
+    ["engine"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "smartfloors_db_queries_per_request",
+    "Sentencias SQL por request HTTP",
+    ["route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "smartfloors_db_time_per_request_seconds",
+    "Tiempo en SQL por request HTTP",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+
+CACHE_REQUESTS = Counter(
+    "smartfloors_cache_requests_total",
+    "Consultas a cachés (la tasa de aciertos es hit / (hit + miss))",
+    ["cache", "result"],
+)
+
+INGEST_READINGS = Counter(
+    "smartfloors_ingest_readings_total",
+    "Lecturas insertadas por origen",
+    ["source"],
+)
+INGEST_REJECTED = Counter(
+    "smartfloors_ingest_rejected_total",
+    "Lecturas rechazadas (inválidas o duplicadas) por origen",
+    ["source"],
+)
+INGEST_SPOOLED = Counter(
+    "smartfloors_ingest_spooled_total",
+    "Lecturas guardadas en el spool local por caída de la base",
+)
+
+ALERTS_CREATED = Counter(
+    "smartfloors_alerts_created_total",
+    "Alertas nuevas creadas por AlertService",
+    ["variable", "nivel"],
+)
+ALERTS_UPDATED = Counter(
+    "smartfloors_alerts_updated_total",
+    "Excedencias que actualizaron una alerta activa existente",
+    ["variable", "nivel"],
+)
+
+
+class RequestDbStats:
+    """Sentencias y tiempo en SQL acumulados durante un request.
+
+    statements (texto SQL -> ejecuciones) solo se llena si quien crea las
+    estadísticas lo pide, p. ej. el detector de N+1 (app/middleware/query_budget.py).
+    shards es el máximo de shards consultados a la vez (ver ShardMap.gather).
+    """
+
+    __slots__ = ("queries", "db_time", "statements", "shards")
+
+    def __init__(self, track_statements: bool = False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.shards = 1
+        self.statements: Optional[Dict[str, int]] = {} if track_statements else None
+
+
+# Estadísticas del request en curso; las tareas y el código síncrono de SQLAlchemy
+# (greenlets) heredan el contexto, por lo que los eventos del engine las ven
+request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_ingest(source: str, created: int, rejected: int = 0) -> None:
+    if created:
+        INGEST_READINGS.labels(source).inc(created)
+    if rejected:
+        INGEST_REJECTED.labels(source).inc(rejected)
+
+
+class _TimedPoolMixin:
+    """Mide la espera en _do_get (checkout bloqueado por pool agotado o conexión nueva)"""
+
+    metrics_name = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.labels(self.metrics_name).observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metrics_name = "sync"
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Registra los eventos de pool y de ejecución de un engine (para async: engine.sync_engine)"""
+    checkouts = DB_POOL_CHECKOUTS.labels(name)
+    queries = DB_QUERIES.labels(name)
+    duration = DB_QUERY_DURATION.labels(name)
+
+    @event.listens_for(engine.pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.inc()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # En el contexto de ejecución: si la sentencia falla no queda estado pendiente
+        context._metrics_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_start
+        queries.inc()
+        duration.observe(elapsed)
+        stats = request_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+            if stats.statements is not None:
+                stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+class StateCollector:
+    """Gauges calculados al momento del scrape desde el estado de pools y servicios"""
+
+    def __init__(self):
+        self._pools: Dict[str, object] = {}
+        self._sources: Dict[str, Callable[[], Iterable[GaugeMetricFamily]]] = {}
+
+    def add_pool(self, name: str, pool) -> None:
+        self._pools[name] = pool
+
+    def add_source(self, name: str, source: Callable[[], Iterable[GaugeMetricFamily]]) -> None:
+        self._sources[name] = source
+
+    def collect(self):
+        size = GaugeMetricFamily("smartfloors_db_pool_size", "Tamaño base del pool", labels=["engine"])
+        checked_out = GaugeMetricFamily("smartfloors_db_pool_checked_out", "Conexiones en uso", labels=["engine"])
+        overflow = GaugeMetricFamily("smartfloors_db_pool_overflow", "Conexiones por sobre pool_size", labels=["engine"])
+        for name, pool in self._pools.items():
+            size.add_metric([name], pool.size())
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], max(pool.overflow(), 0))
+        yield from (size, checked_out, overflow)
+        for source in self._sources.values():
+            yield from source()
+
+
+def admission_metrics(controller) -> Iterable:
+    """Cupos y colas del control de admisión (app/middleware/admission.py)"""
+    stats = controller.stats()
+    yield GaugeMetricFamily("smartfloors_admission_in_progress", "Requests /api admitidos en curso", value=stats["en_curso"])
+    yield GaugeMetricFamily("smartfloors_admission_ingest_queue", "Requests de ingesta en cola", value=stats["cola_ingesta"])
+    admitted = CounterMetricFamily("smartfloors_admission_admitted", "Requests de ingesta admitidos", labels=["endpoint"])
+    rejected = CounterMetricFamily("smartfloors_admission_rejected", "Requests de ingesta rechazados con 429", labels=["endpoint"])
+    for endpoint, values in stats["endpoints"].items():
+        admitted.add_metric([endpoint], values["admitidas"])
+        rejected.add_metric([endpoint], values["rechazadas"])
+    yield admitted
+    yield rejected
+
+
+def spool_metrics(spool) -> Iterable:
+    """Disponibilidad de la base y lecturas pendientes en el spool local"""
+    segments = spool.pending_segments()
+    yield GaugeMetricFamily("smartfloors_spool_db_available", "1 si la ingesta considera disponibles todos los shards", value=int(spool.db_available))
+    yield GaugeMetricFamily("smartfloors_spool_segments", "Segmentos pendientes de reproducir", value=len(segments))
+    yield GaugeMetricFamily(
+        "smartfloors_spool_pending_bytes",
+        "Bytes pendientes de reproducir",
+        value=sum(path.stat().st_size for path in segments)
+    )
+    yield CounterMetricFamily("smartfloors_spool_replayed_readings", "Lecturas reproducidas desde el spool", value=spool.stats["lecturas_reproducidas"])
+
+
+def job_metrics(manager) -> Iterable:
+    """Trabajos en segundo plano por estado"""
+    family = GaugeMetricFamily("smartfloors_jobs", "Trabajos conocidos por estado", labels=["estado"])
+    counts: Dict[str, int] = {}
+    for job in list(manager.jobs.values()):
+        counts[job["estado"]] = counts.get(job["estado"], 0) + 1
+    for estado, count in counts.items():
+        family.add_metric([estado], count)
+    yield family
+
+
+def line_protocol_metrics(listener) -> Iterable:
+    """Contadores del listener de protocolo de líneas"""
+    family = CounterMetricFamily("smartfloors_line_protocol", "Actividad del listener de protocolo de líneas", labels=["contador"])
+    for name, value in listener.stats.items():
+        family.add_metric([name], value)
+    yield family
+
+
+state_collector = StateCollector()
+REGISTRY.register(state_collector)
+
+
+def render_metrics() -> bytes:
+    """Exposición en formato de texto Prometheus"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
@@ -0,0 +1,180 @@
+import asyncio
+import heapq
+import itertools
+from typing import Dict, List, Optional, Tuple
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.config import settings
+from app.responses import ORJSONResponse
+
+
+# Prioridades: el menor valor se atiende primero al liberarse un cupo
+PRIORIDAD_LECTURA = 0
+PRIORIDAD_INGESTA = 1
+
+
+class PriorityLimiter:
+    """Semáforo con prioridad: al liberar un cupo se entrega a la espera de mayor prioridad (FIFO dentro de cada una)"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self.waiting = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int = 0) -> None:
+        if self.in_use < self.capacity and not self.waiting:
+            self.in_use += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.waiting += 1
+        try:
+            await future
+        except BaseException:
+            # Cancelada (timeout o desconexión): si el cupo ya había sido entregado se devuelve
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            self.waiting -= 1
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # El cupo pasa directamente a la espera, in_use no cambia
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+
+class AdmissionController:
+    """Control de admisión para la API.
+
+    Todas las rutas /api comparten `max_concurrent` cupos (por debajo del pool de
+    conexiones) y las lecturas interactivas tienen prioridad sobre la ingesta al
+    liberarse uno. Las rutas de ingesta tienen además un límite propio y uno total,
+    y una cola acotada: si está llena, o la espera supera `queue_timeout`, se
+    responde 429 con Retry-After en lugar de acaparar el pool.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 25,
+        ingest_max_concurrent: int = 8,
+        ingest_queue_size: int = 32,
+        queue_timeout: float = 5.0,
+        retry_after: int = 1,
+        endpoint_limits: Optional[Dict[str, int]] = None
+    ):
+        self.limiter = PriorityLimiter(max_concurrent)
+        self.ingest_limiter = PriorityLimiter(ingest_max_concurrent)
+        self.endpoint_limiters = {
+            endpoint: PriorityLimiter(limit) for endpoint, limit in (endpoint_limits or {}).items()
+        }
+        self.ingest_queue_size = ingest_queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self.ingest_queued = 0
+        self.admitted: Dict[str, int] = {endpoint: 0 for endpoint in self.endpoint_limiters}
+        self.rejected: Dict[str, int] = {endpoint: 0 for endpoint in self.endpoint_limiters}
+
+    async def _acquire_ingest(self, endpoint: str) -> bool:
+        """Espera los cupos de la ruta, de la ingesta y global; False si hay que rechazar"""
+        if self.ingest_queued >= self.ingest_queue_size:
+            return False
+
+        acquired = []
+        admitted = False
+        self.ingest_queued += 1
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                for limiter in (self.endpoint_limiters[endpoint], self.ingest_limiter, self.limiter):
+                    await limiter.acquire(PRIORIDAD_INGESTA)
+                    acquired.append(limiter)
+            admitted = True
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            # Timeout, cancelación o desconexión del cliente: devolver los cupos ya tomados
+            if not admitted:
+                for limiter in reversed(acquired):
+                    limiter.release()
+            self.ingest_queued -= 1
+
+    async def __call__(self, app: ASGIApp, scope: Scope, receive: Receive, send: Send) -> None:
+        endpoint = f"{scope['method']} {scope['path'].rstrip('/')}"
+
+        if endpoint not in self.endpoint_limiters:
+            await self.limiter.acquire(PRIORIDAD_LECTURA)
+            try:
+                await app(scope, receive, send)
+            finally:
+                self.limiter.release()
+            return
+
+        if not await self._acquire_ingest(endpoint):
+            self.rejected[endpoint] += 1
+            response = ORJSONResponse(
+                {"detail": "Ingesta saturada, reintentar más tarde"},
+                status_code=429,
+                headers={"Retry-After": str(self.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        self.admitted[endpoint] += 1
+        try:
+            await app(scope, receive, send)
+        finally:
+            self.limiter.release()
+            self.ingest_limiter.release()
+            self.endpoint_limiters[endpoint].release()
+
+    def stats(self) -> Dict:
+        return {
+            "en_curso": self.limiter.in_use,
+            "en_espera": self.limiter.waiting,
+            "capacidad": self.limiter.capacity,
+            "ingesta_en_curso": self.ingest_limiter.in_use,
+            "cola_ingesta": self.ingest_queued,
+            "cola_ingesta_max": self.ingest_queue_size,
+            "endpoints": {
+                endpoint: {
+                    "limite": limiter.capacity,
+                    "en_curso": limiter.in_use,
+                    "en_espera": limiter.waiting,
+                    "admitidas": self.admitted[endpoint],
+                    "rechazadas": self.rejected[endpoint],
+                }
+                for endpoint, limiter in self.endpoint_limiters.items()
+            },
+        }
+
+
+class AdmissionControlMiddleware:
+    """Aplica el control de admisión a las rutas /api (health, docs y OpenAPI quedan fuera)"""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        await self.controller(self.app, scope, receive, send)
+
+
+admission_controller = AdmissionController(
+    max_concurrent=settings.ADMISSION_MAX_CONCURRENT,
+    ingest_max_concurrent=settings.ADMISSION_INGEST_MAX_CONCURRENT,
+    ingest_queue_size=settings.ADMISSION_INGEST_QUEUE_SIZE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+    endpoint_limits=settings.ADMISSION_INGEST_ENDPOINT_LIMITS
+)
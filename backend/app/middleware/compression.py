@@ -0,0 +1,145 @@
+import zlib
+from typing import Callable, Dict, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se negocia gzip
+    brotli = None
+
+
+# Contenido ya comprimido o que se envía por partes al cliente a medida que se genera
+TIPOS_EXCLUIDOS = ("text/event-stream", "application/gzip", "application/zip", "image/", "audio/", "video/")
+
+# Comprime un trozo del cuerpo; con more_body=False cierra el flujo
+Compresor = Callable[[bytes, bool], bytes]
+
+
+def gzip_compressor(level: int) -> Compresor:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(body: bytes, more_body: bool) -> bytes:
+        return compressor.compress(body) + compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+    return compress
+
+
+def brotli_compressor(quality: int) -> Compresor:
+    compressor = brotli.Compressor(quality=quality)
+
+    def compress(body: bytes, more_body: bool) -> bytes:
+        return compressor.process(body) + (compressor.flush() if more_body else compressor.finish())
+
+    return compress
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """Codificaciones aceptadas por el cliente con su peso q"""
+    encodings = {}
+    for part in value.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[name.strip().lower()] = q
+    return encodings
+
+
+class CompressionResponder:
+    """Envuelve send de una respuesta: retiene el inicio hasta ver el primer trozo del cuerpo
+    y, si corresponde, comprime el cuerpo (completo o por partes) y ajusta los headers"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int, encoding: Optional[str], compressor: Callable[[], Compresor]):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoding = encoding
+        self.compressor = compressor
+        self.send: Optional[Send] = None
+        self.start: Optional[Message] = None
+        self.compress: Optional[Compresor] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            await self.send_start(start, message)
+            return
+
+        if self.compress is not None and message["type"] == "http.response.body":
+            message = {**message, "body": self.compress(message.get("body", b""), message.get("more_body", False))}
+        await self.send(message)
+
+    async def send_start(self, start: Message, message: Message) -> None:
+        """Decide con el primer mensaje después del inicio si la respuesta se comprime"""
+        headers = MutableHeaders(raw=list(start.get("headers", [])))
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        content_type = headers.get("content-type", "").lower()
+        if (
+            message["type"] != "http.response.body"
+            or start["status"] == 206
+            or "content-encoding" in headers
+            or content_type.startswith(TIPOS_EXCLUIDOS)
+            or (len(body) < self.minimum_size and not more_body)
+        ):
+            await self.send(start)
+            await self.send(message)
+            return
+
+        headers.add_vary_header("Accept-Encoding")
+        if self.encoding is not None:
+            self.compress = self.compressor()
+            body = self.compress(body, more_body)
+            headers["Content-Encoding"] = self.encoding
+            if more_body or start.get("trailers", False):
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            message = {**message, "body": body}
+
+        await self.send({**start, "headers": headers.raw})
+        await self.send(message)
+
+
+class CompressionMiddleware:
+    """Comprime con brotli o gzip (según Accept-Encoding) las respuestas mayores a minimum_size"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = parse_accept_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        br_q = accepted.get("br", 0.0) if brotli is not None else 0.0
+        gzip_q = accepted.get("gzip", 0.0)
+
+        if br_q > 0 and br_q >= gzip_q:
+            responder = CompressionResponder(self.app, self.minimum_size, "br", lambda: brotli_compressor(self.brotli_quality))
+        elif gzip_q > 0:
+            responder = CompressionResponder(self.app, self.minimum_size, "gzip", lambda: gzip_compressor(self.gzip_level))
+        else:
+            # Sin compresión, pero las respuestas comprimibles llevan igual Vary: Accept-Encoding
+            responder = CompressionResponder(self.app, self.minimum_size, None, lambda: None)
+
+        await responder(scope, receive, send)
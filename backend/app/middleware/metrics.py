@@ -0,0 +1,58 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    DB_TIME_PER_REQUEST,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_PROGRESS,
+    RequestDbStats,
+    request_db_stats,
+)
+
+
+def route_template(scope: Scope) -> str:
+    """Plantilla de la ruta resuelta (p. ej. /api/v1/alerts/{alert_id}/acknowledge) para acotar la cardinalidad"""
+    # Con routers incluidos, FastAPI deja en scope["route"] la ruta relativa al router;
+    # la plantilla completa (con prefijo) está en el contexto efectivo de la ruta
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or "sin_ruta"
+
+
+class MetricsMiddleware:
+    """Latencia por ruta, requests en curso y sentencias SQL por request"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        stats = RequestDbStats()
+        token = request_db_stats.set(stats)
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_progress.dec()
+            request_db_stats.reset(token)
+            route = route_template(scope)
+            HTTP_REQUEST_DURATION.labels(method, route, str(status)).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(stats.queries)
+            DB_TIME_PER_REQUEST.labels(route).observe(stats.db_time)
@@ -0,0 +1,199 @@
+"""
+Presupuesto de sentencias SQL por request y detector de N+1.
+
+Cuenta las sentencias de cada request con los eventos del engine (app/metrics.py),
+agrupa las repetidas por forma normalizada y, según la configuración:
+
+- agrega los headers de depuración X-DB-Queries y X-DB-Time (ms);
+- avisa cuando una misma forma se repite QUERY_REPEAT_THRESHOLD veces (N+1 típico);
+- compara el total con QUERY_BUDGETS por ruta y, con QUERY_BUDGET_ENFORCE=True,
+  levanta QueryBudgetExceeded para que la corrida de pruebas falle.
+
+Los presupuestos son por shard: una ruta que consulta todos los shards
+(app/sharding.py) puede ejecutar el presupuesto una vez en cada uno.
+"""
+import re
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.metrics import RequestDbStats, request_db_stats
+from app.middleware.metrics import route_template
+
+
+# Formas de sentencia guardadas por ruta en el resumen (las menos repetidas se descartan)
+MAX_SHAPES_PER_ROUTE = 20
+
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER_LIST = re.compile(r"(\$\d+|%\(\w+\)s|%s|\?)(\s*,\s*(\$\d+|%\(\w+\)s|%s|\?))+")
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Una ruta (o bloque de código) ejecutó más sentencias que su presupuesto"""
+
+
+def normalize_statement(statement: str) -> str:
+    """Forma de la sentencia: sin literales y con las listas de parámetros colapsadas"""
+    shape = _STRING.sub("?", statement)
+    shape = _PLACEHOLDER_LIST.sub("?, ...", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def repeated_shapes(statements: Dict[str, int], minimum: int = 2) -> List[Tuple[str, int]]:
+    """Formas ejecutadas al menos `minimum` veces, de más a menos repetida"""
+    shapes: Dict[str, int] = {}
+    for statement, count in statements.items():
+        shape = normalize_statement(statement)
+        shapes[shape] = shapes.get(shape, 0) + count
+    return sorted(
+        ((shape, count) for shape, count in shapes.items() if count >= minimum),
+        key=lambda item: item[1],
+        reverse=True
+    )
+
+
+class QueryTracker:
+    """Resumen por ruta: requests, máximo de sentencias, excesos de presupuesto y formas repetidas"""
+
+    def __init__(self, budgets: Dict[str, int], repeat_threshold: int = 10, enforce: bool = False):
+        self.budgets = dict(budgets)
+        self.repeat_threshold = repeat_threshold
+        self.enforce = enforce
+        self.routes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def budget_for(self, endpoint: str) -> Optional[int]:
+        return self.budgets.get(endpoint)
+
+    def record(self, endpoint: str, stats: RequestDbStats) -> Optional[str]:
+        """Registra un request; retorna el mensaje de exceso de presupuesto, si lo hubo"""
+        route = self.routes.get(endpoint)
+        if route is None:
+            route = self.routes[endpoint] = {
+                "requests": 0,
+                "max_sentencias": 0,
+                "sentencias": 0,
+                "tiempo_db_ms": 0.0,
+                "presupuesto": None,
+                "excedidos": 0,
+                "repetidas": {},
+            }
+        route["requests"] += 1
+        route["sentencias"] += stats.queries
+        route["max_sentencias"] = max(route["max_sentencias"], stats.queries)
+        route["tiempo_db_ms"] += stats.db_time * 1000
+
+        repeated = repeated_shapes(stats.statements or {}, minimum=self.repeat_threshold)
+        if repeated:
+            shapes = route["repetidas"]
+            for shape, count in repeated:
+                shapes[shape] = max(shapes.get(shape, 0), count)
+            if len(shapes) > MAX_SHAPES_PER_ROUTE:
+                route["repetidas"] = dict(sorted(shapes.items(), key=lambda item: item[1], reverse=True)[:MAX_SHAPES_PER_ROUTE])
+            shape, count = repeated[0]
+            print(f"Posible N+1 en {endpoint}: {count} ejecuciones de {shape[:200]}")
+
+        budget = route["presupuesto"] = self.budget_for(endpoint)
+        if budget is not None and stats.queries > budget * stats.shards:
+            route["excedidos"] += 1
+            return budget_message(endpoint, stats, budget * stats.shards)
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "presupuestos": self.budgets,
+            "umbral_repeticion": self.repeat_threshold,
+            "rutas": {
+                endpoint: {
+                    **route,
+                    "promedio_sentencias": round(route["sentencias"] / route["requests"], 2),
+                    "tiempo_db_ms": round(route["tiempo_db_ms"], 2),
+                    "repetidas": [
+                        {"sentencia": shape, "max_por_request": count}
+                        for shape, count in sorted(route["repetidas"].items(), key=lambda item: item[1], reverse=True)
+                    ],
+                }
+                for endpoint, route in self.routes.items()
+            },
+        }
+
+    def reset(self) -> None:
+        self.routes.clear()
+
+
+def budget_message(label: str, stats: RequestDbStats, budget: int) -> str:
+    lines = [f"{label}: {stats.queries} sentencias SQL (presupuesto {budget})"]
+    for shape, count in repeated_shapes(stats.statements or {})[:5]:
+        lines.append(f"  {count} x {shape[:200]}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def assert_max_queries(limit: int, label: str = "bloque") -> Iterator[RequestDbStats]:
+    """Falla con QueryBudgetExceeded si el bloque ejecuta más de `limit` sentencias SQL.
+
+        with assert_max_queries(2, "listado de alertas"):
+            await AlertService(db).get_alerts(piso=1)
+    """
+    stats = RequestDbStats(track_statements=True)
+    token = request_db_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        request_db_stats.reset(token)
+    if stats.queries > limit:
+        raise QueryBudgetExceeded(budget_message(label, stats, limit))
+
+
+class QueryBudgetMiddleware:
+    """Cuenta las sentencias SQL de cada request y aplica los presupuestos por ruta"""
+
+    def __init__(self, app: ASGIApp, tracker: "QueryTracker", debug_headers: bool = False):
+        self.app = app
+        self.tracker = tracker
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Reutiliza las estadísticas del middleware de métricas si ya las creó
+        stats = request_db_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestDbStats()
+            token = request_db_stats.set(stats)
+        stats.statements = {}
+
+        async def send_wrapper(message: Message) -> None:
+            if self.debug_headers and message["type"] == "http.response.start":
+                # Sentencias hasta el inicio de la respuesta (sin las de tareas en segundo plano)
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.queries).encode()))
+                headers.append((b"x-db-time", f"{stats.db_time * 1000:.2f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                request_db_stats.reset(token)
+
+        endpoint = f"{scope['method']} {route_template(scope)}"
+        exceeded = self.tracker.record(endpoint, stats)
+        if exceeded:
+            if self.tracker.enforce:
+                raise QueryBudgetExceeded(exceeded)
+            print(f"Presupuesto de consultas excedido: {exceeded}")
+
+
+query_tracker = QueryTracker(
+    budgets=settings.QUERY_BUDGETS,
+    repeat_threshold=settings.QUERY_REPEAT_THRESHOLD,
+    enforce=settings.QUERY_BUDGET_ENFORCE
+)
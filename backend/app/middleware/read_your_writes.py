@@ -0,0 +1,51 @@
+import time
+from http.cookies import CookieError, SimpleCookie
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.replicas import COOKIE_PRIMARIA, ReplicaPool, primary_reads_until
+
+
+METODOS_ESCRITURA = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def _cookie_until(scope: Scope) -> float:
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            try:
+                cookie = SimpleCookie(value.decode("latin-1"))
+            except CookieError:
+                return 0.0
+            morsel = cookie.get(COOKIE_PRIMARIA)
+            if morsel is not None:
+                try:
+                    return float(morsel.value)
+                except ValueError:
+                    return 0.0
+    return 0.0
+
+
+class ReadYourWritesMiddleware:
+    """Lecturas del cliente a la primaria durante pin_seconds tras una escritura exitosa (cookie sf_primary_until)"""
+
+    def __init__(self, app: ASGIApp, pool: ReplicaPool):
+        self.app = app
+        self.pool = pool
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = primary_reads_until.set(_cookie_until(scope))
+        escritura = scope["method"] in METODOS_ESCRITURA
+
+        async def send_wrapper(message: Message) -> None:
+            if escritura and message["type"] == "http.response.start" and message["status"] < 400:
+                seconds = self.pool.pin_seconds
+                cookie = f"{COOKIE_PRIMARIA}={time.time() + seconds:.3f}; Max-Age={int(seconds) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            primary_reads_until.reset(token)
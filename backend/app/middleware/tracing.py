@@ -0,0 +1,49 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.middleware.metrics import route_template
+from app.tracing import SpanContext, Tracer
+
+
+class TracingMiddleware:
+    """Span raíz por request (continúa un traceparent entrante) y header X-Trace-Id en las trazas muestreadas"""
+
+    def __init__(self, app: ASGIApp, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = SpanContext.from_traceparent(value.decode("latin-1"))
+                break
+
+        method = scope["method"]
+        status = 500
+        # El nombre definitivo (con la plantilla de la ruta) se conoce después del enrutamiento
+        with self.tracer.span(f"{method} {scope['path']}", "server", parent, **{
+            "http.method": method,
+            "http.target": scope["path"],
+        }) as span:
+
+            async def send_wrapper(message: Message) -> None:
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if span.sampled:
+                        message = {**message, "headers": [*message.get("headers", []), (b"x-trace-id", span.trace_id.encode())]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if span.sampled:
+                    route = route_template(scope)
+                    span.name = f"{method} {route}"
+                    span.set_attribute("http.route", route)
+                    span.set_attribute("http.status_code", status)
+                    if status >= 500 and span.error is None:
+                        span.error = f"HTTP {status}"
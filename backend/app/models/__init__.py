@@ -3,6 +3,8 @@ from app.models.alerta import Alerta
 from app.models.prediccion import Prediccion
 from app.models.umbral import Umbral
 from app.models.suscripcion import Suscripcion
+from app.models.estado_modelo import EstadoModelo
+from app.models.piso import Piso
 
-__all__ = ["Lectura", "Alerta", "Prediccion", "Umbral", "Suscripcion"]
+__all__ = ["Lectura", "Alerta", "Prediccion", "Umbral", "Suscripcion", "EstadoModelo", "Piso"]
 
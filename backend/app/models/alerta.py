@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Numeric, DateTime, Text, CheckConstraint
+from sqlalchemy import Column, String, Integer, Numeric, DateTime, Text, CheckConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -10,7 +10,8 @@ class Alerta(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     timestamp = Column(DateTime(timezone=True), nullable=False, index=True)
-    piso = Column(Integer, nullable=False, index=True)
+    edificio = Column(String(10), nullable=False, default="A")
+    piso = Column(Integer, nullable=False)
     variable = Column(String(50), nullable=False)
     nivel = Column(String(20), nullable=False, index=True)
     valor_actual = Column(Numeric(8, 2))
@@ -23,8 +24,9 @@ class Alerta(Base):
     resolved_at = Column(DateTime(timezone=True), nullable=True)
     
     __table_args__ = (
-        CheckConstraint("piso IN (1, 2, 3)", name="check_piso"),
         CheckConstraint("nivel IN ('informativa', 'media', 'critica')", name="check_nivel"),
         CheckConstraint("estado IN ('activa', 'reconocida', 'resuelta')", name="check_estado"),
+        Index("idx_alertas_edificio_piso_estado", "edificio", "piso", "estado"),
+        Index("idx_alertas_edificio_timestamp", "edificio", "timestamp"),
     )
 
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class EstadoModelo(Base):
+    __tablename__ = "estados_modelo"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    edificio = Column(String(10), nullable=False, default="A")
+    piso = Column(Integer, nullable=False)
+    modelo = Column(String(50), nullable=False)
+    estado = Column(JSON, nullable=False)
+    ultima_lectura = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("edificio", "piso", "modelo", name="unique_estado_modelo"),
+    )
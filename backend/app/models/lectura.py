@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, CheckConstraint, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -6,17 +6,22 @@ from app.database import Base
 class Lectura(Base):
     __tablename__ = "lecturas"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     timestamp = Column(DateTime(timezone=True), nullable=False, index=True)
     edificio = Column(String(10), nullable=False, default="A")
-    piso = Column(Integer, nullable=False, index=True)
+    piso = Column(Integer, nullable=False)
     temp_c = Column(Numeric(5, 2), nullable=False)
     humedad_pct = Column(Numeric(5, 2), nullable=False)
     energia_kw = Column(Numeric(8, 2), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     __table_args__ = (
-        CheckConstraint("piso IN (1, 2, 3)", name="check_piso"),
         UniqueConstraint("timestamp", "edificio", "piso", name="unique_reading"),
+        # Todas las consultas por piso van con su edificio y un rango de tiempo
+        Index("idx_lecturas_edificio_piso_timestamp", "edificio", "piso", "timestamp"),
     )
+    # Identidad ORM por la clave natural: refresh y las búsquedas por identidad usan un índice
+    # tanto en esta tabla como en la vista del formato compacto (ver lectura_compacta.py),
+    # donde id no está indexado. id y created_at vuelven con RETURNING al insertar.
+    __mapper_args__ = {"primary_key": [timestamp, edificio, piso], "eager_defaults": True}
 
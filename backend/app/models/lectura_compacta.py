@@ -0,0 +1,153 @@
+"""
+Formato compacto de lecturas (READINGS_COMPACT_LAYOUT=true).
+
+Las lecturas se guardan en lecturas_compactas como enteros de punto fijo
+(centésimas: temp_c y humedad_pct en smallint, energia_kw en integer), con el
+edificio como id smallint de la tabla edificios y el piso en smallint: 24 bytes
+de datos por fila frente a unos 50 del formato normal. Solo hay dos índices: la
+clave primaria (edificio_id, piso, timestamp), que sirve a todas las consultas
+por piso y a la detección de duplicados, y el de timestamp para las ventanas
+globales; id se conserva pero no se indexa.
+
+lecturas pasa a ser una vista con las mismas columnas y tipos que la tabla del
+formato normal, así que el modelo Lectura y las consultas no cambian. Un trigger
+INSTEAD OF INSERT convierte las inserciones fila a fila del ORM y la ingesta
+columnar escribe directo en lecturas_compactas (ingest_service.py).
+
+Diferencias visibles: created_at es el timestamp de la lectura (la hora de
+ingesta no se guarda) y los valores se guardan con dos decimales, igual que
+Numeric(5, 2) / Numeric(8, 2) del formato normal.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from app.config import settings
+from app.database import Base
+from app.models import Lectura
+
+
+TABLAS_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS edificios (
+        id smallint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        codigo varchar(10) NOT NULL UNIQUE
+    )
+    """,
+    "CREATE SEQUENCE IF NOT EXISTS lecturas_compactas_id_seq AS integer",
+    # Columnas ordenadas por alineación (8, 4, 4, 2, 2, 2, 2 bytes) para no desperdiciar relleno
+    """
+    CREATE TABLE IF NOT EXISTS lecturas_compactas (
+        timestamp timestamptz NOT NULL,
+        id integer NOT NULL DEFAULT nextval('lecturas_compactas_id_seq'),
+        energia_kw integer NOT NULL,
+        edificio_id smallint NOT NULL,
+        piso smallint NOT NULL,
+        temp_c smallint NOT NULL,
+        humedad_pct smallint NOT NULL,
+        CONSTRAINT lecturas_compactas_pkey PRIMARY KEY (edificio_id, piso, timestamp)
+    )
+    """,
+    "ALTER SEQUENCE lecturas_compactas_id_seq OWNED BY lecturas_compactas.id",
+    "CREATE INDEX IF NOT EXISTS idx_lecturas_compactas_timestamp ON lecturas_compactas (timestamp)",
+]
+
+# Sin conversiones sobre edificio ni piso: los filtros de las consultas llegan a los índices
+VISTA_SQL = [
+    """
+    CREATE OR REPLACE VIEW lecturas AS
+    SELECT l.id,
+           l.timestamp,
+           e.codigo AS edificio,
+           l.piso,
+           (l.temp_c / 100.0)::numeric(5, 2) AS temp_c,
+           (l.humedad_pct / 100.0)::numeric(5, 2) AS humedad_pct,
+           (l.energia_kw / 100.0)::numeric(8, 2) AS energia_kw,
+           l.timestamp AS created_at
+    FROM lecturas_compactas l
+    JOIN edificios e ON e.id = l.edificio_id
+    """,
+    # Un duplicado (edificio, piso, timestamp) falla con unique_violation, igual que en la tabla normal
+    """
+    CREATE OR REPLACE FUNCTION lecturas_compactas_insertar() RETURNS trigger AS $$
+    DECLARE
+        id_edificio smallint;
+    BEGIN
+        NEW.edificio := COALESCE(NEW.edificio, 'A');
+        SELECT e.id INTO id_edificio FROM edificios e WHERE e.codigo = NEW.edificio;
+        IF id_edificio IS NULL THEN
+            INSERT INTO edificios (codigo) VALUES (NEW.edificio)
+            ON CONFLICT (codigo) DO UPDATE SET codigo = EXCLUDED.codigo
+            RETURNING edificios.id INTO id_edificio;
+        END IF;
+        NEW.id := nextval('lecturas_compactas_id_seq');
+        NEW.created_at := NEW.timestamp;
+        INSERT INTO lecturas_compactas (timestamp, id, energia_kw, edificio_id, piso, temp_c, humedad_pct)
+        VALUES (NEW.timestamp, NEW.id, round(NEW.energia_kw * 100), id_edificio, NEW.piso,
+                round(NEW.temp_c * 100), round(NEW.humedad_pct * 100));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS lecturas_insertar ON lecturas",
+    "CREATE TRIGGER lecturas_insertar INSTEAD OF INSERT ON lecturas FOR EACH ROW EXECUTE FUNCTION lecturas_compactas_insertar()",
+]
+
+# Copia de la tabla del formato normal (conserva los ids); la tabla queda como lecturas_formato_anterior
+COPIAR_EDIFICIOS_SQL = "INSERT INTO edificios (codigo) SELECT DISTINCT edificio FROM lecturas ORDER BY 1 ON CONFLICT (codigo) DO NOTHING"
+COPIAR_LECTURAS_SQL = """
+    INSERT INTO lecturas_compactas (timestamp, id, energia_kw, edificio_id, piso, temp_c, humedad_pct)
+    SELECT l.timestamp, l.id, round(l.energia_kw * 100), e.id, l.piso, round(l.temp_c * 100), round(l.humedad_pct * 100)
+    FROM lecturas l
+    JOIN edificios e ON e.codigo = l.edificio
+    ORDER BY l.timestamp
+    ON CONFLICT ON CONSTRAINT lecturas_compactas_pkey DO NOTHING
+"""
+CERRAR_MIGRACION_SQL = [
+    "SELECT setval('lecturas_compactas_id_seq', (SELECT COALESCE(max(id), 0) + 1 FROM lecturas_compactas), false)",
+    "ALTER TABLE lecturas RENAME TO lecturas_formato_anterior",
+]
+
+
+def lecturas_es_tabla(conn: Connection) -> bool:
+    """True si lecturas es todavía la tabla del formato normal"""
+    return conn.scalar(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('lecturas')")) == "r"
+
+
+def create_tables(bind: Engine, actualizar_vista: bool = False) -> None:
+    """Crea las tablas que falten; con READINGS_COMPACT_LAYOUT, lecturas es la vista del formato compacto.
+
+    La vista y su trigger se crean solo si faltan (varios procesos arrancan a la vez);
+    actualizar_vista los reemplaza siempre (init_db.py).
+    """
+    if not settings.READINGS_COMPACT_LAYOUT:
+        Base.metadata.create_all(bind=bind)
+        return
+
+    Base.metadata.create_all(
+        bind=bind,
+        tables=[table for table in Base.metadata.sorted_tables if table is not Lectura.__table__]
+    )
+    with bind.begin() as conn:
+        if lecturas_es_tabla(conn):
+            raise RuntimeError(
+                "READINGS_COMPACT_LAYOUT=true pero lecturas es una tabla del formato normal: "
+                "ejecuta init_db.py para migrarla"
+            )
+        for sql in TABLAS_SQL:
+            conn.execute(text(sql))
+        if actualizar_vista or conn.scalar(text("SELECT to_regclass('lecturas')")) is None:
+            for sql in VISTA_SQL:
+                conn.execute(text(sql))
+
+
+def migrate_to_compact(bind: Engine) -> int:
+    """Pasa lecturas del formato normal al compacto en una transacción; retorna las filas copiadas (0 si ya estaba)"""
+    with bind.begin() as conn:
+        if not lecturas_es_tabla(conn):
+            return 0
+        for sql in TABLAS_SQL:
+            conn.execute(text(sql))
+        conn.execute(text(COPIAR_EDIFICIOS_SQL))
+        copiadas = conn.execute(text(COPIAR_LECTURAS_SQL)).rowcount
+        for sql in CERRAR_MIGRACION_SQL + VISTA_SQL:
+            conn.execute(text(sql))
+    return copiadas
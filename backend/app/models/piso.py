@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class Piso(Base):
+    """Registro de edificios y pisos: se completa al llegar la primera lectura de cada piso"""
+    __tablename__ = "pisos"
+    
+    id = Column(Integer, primary_key=True)
+    edificio = Column(String(10), nullable=False)
+    piso = Column(Integer, nullable=False)
+    nombre = Column(String(100))
+    activo = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("edificio", "piso", name="unique_piso"),
+    )
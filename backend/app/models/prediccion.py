@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, CheckConstraint
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -9,7 +9,8 @@ class Prediccion(Base):
     id = Column(Integer, primary_key=True, index=True)
     timestamp_generacion = Column(DateTime(timezone=True), nullable=False)
     timestamp_prediccion = Column(DateTime(timezone=True), nullable=False, index=True)
-    piso = Column(Integer, nullable=False, index=True)
+    edificio = Column(String(10), nullable=False, default="A")
+    piso = Column(Integer, nullable=False)
     variable = Column(String(50), nullable=False)
     valor_predicho = Column(Numeric(8, 2), nullable=False)
     intervalo_confianza_min = Column(Numeric(8, 2))
@@ -18,6 +19,6 @@ class Prediccion(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     __table_args__ = (
-        CheckConstraint("piso IN (1, 2, 3)", name="check_piso"),
+        Index("idx_predicciones_edificio_piso_modelo_generacion", "edificio", "piso", "modelo", "timestamp_generacion"),
     )
 
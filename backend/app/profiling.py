@@ -0,0 +1,258 @@
+"""
+Perfilado en producción sin redeploy (expuesto en /admin/profiling, ver routers/admin.py).
+
+- Por request: cProfile de un request marcado con el header X-Profile (más el token
+  de administración) o muestreado con PROFILING_SAMPLE_RATE.
+- Proceso completo: muestreo de pilas de todos los hilos durante unos segundos,
+  exportado en formato "folded" (flamegraph.pl, speedscope, inferno).
+- Memoria: snapshots de tracemalloc y diferencias entre ellos.
+
+Sin captura en curso el costo es una comparación de headers por request: cProfile
+y tracemalloc solo se activan a pedido.
+"""
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import random
+import secrets
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import settings
+from app.middleware.metrics import route_template
+
+
+HEADER_PROFILE = b"x-profile"
+HEADER_ADMIN_TOKEN = b"x-admin-token"
+
+
+def admin_token_valid(token: Optional[str]) -> bool:
+    """Compara en tiempo constante con ADMIN_TOKEN (sin token configurado nada es válido)"""
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    return secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode())
+
+
+class RequestProfiler:
+    """Capturas cProfile de requests individuales (una a la vez; las más antiguas se descartan)"""
+
+    def __init__(self, sample_rate: float = 0.0, history_size: int = 20, top: int = 40):
+        self.sample_rate = sample_rate
+        self.top = top
+        self.captures: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self._ids = itertools.count(1)
+        # cProfile instala un hook global por hilo: dos capturas simultáneas se pisarían
+        self._busy = threading.Lock()
+
+    def trigger(self, scope: Scope) -> Optional[str]:
+        """Motivo para perfilar el request ("header" o "muestreo"), o None"""
+        requested = False
+        token = None
+        for name, value in scope["headers"]:
+            if name == HEADER_PROFILE:
+                requested = value not in (b"", b"0", b"false")
+            elif name == HEADER_ADMIN_TOKEN:
+                token = value.decode("latin-1")
+        if requested and admin_token_valid(token):
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "muestreo"
+        return None
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def store(
+        self,
+        capture_id: int,
+        scope: Scope,
+        profile: cProfile.Profile,
+        elapsed: float,
+        status: int,
+        motivo: str
+    ) -> Dict[str, Any]:
+        text = io.StringIO()
+        stats = pstats.Stats(profile, stream=text)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        capture = {
+            "id": capture_id,
+            "metodo": scope["method"],
+            "ruta": route_template(scope),
+            "path": scope["path"],
+            "status": status,
+            "duracion_ms": round(elapsed * 1000, 2),
+            "motivo": motivo,
+            "created_at": datetime.utcnow(),
+            "resumen": text.getvalue(),
+            # Mismo formato que pstats.dump_stats: se abre con snakeviz o pstats.Stats(archivo)
+            "pstats": marshal.dumps(stats.stats),
+        }
+        self.captures.append(capture)
+        return capture
+
+    def get(self, capture_id: int) -> Optional[Dict[str, Any]]:
+        return next((capture for capture in self.captures if capture["id"] == capture_id), None)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [
+            {key: value for key, value in capture.items() if key not in ("resumen", "pstats")}
+            for capture in reversed(self.captures)
+        ]
+
+
+class ProfilingMiddleware:
+    """Perfila con cProfile los requests marcados o muestreados y agrega X-Profile-Id a la respuesta"""
+
+    def __init__(self, app: ASGIApp, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        motivo = self.profiler.trigger(scope) if scope["type"] == "http" else None
+        if motivo is None or not self.profiler._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        # Las demás corrutinas que corran en el event loop durante el request también quedan en el perfil
+        capture_id = self.profiler.next_id()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", str(capture_id).encode())]}
+            await send(message)
+
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profile.disable()
+            self.profiler.store(capture_id, scope, profile, time.perf_counter() - start, status, motivo)
+        finally:
+            self.profiler._busy.release()
+
+
+class StackSampler:
+    """Muestreo de pilas de todos los hilos del proceso, en formato folded para flamegraphs"""
+
+    def __init__(self, interval_ms: int = 5, max_seconds: int = 60):
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, seconds: float) -> Dict[str, Any]:
+        """Bloquea `seconds` (en un hilo propio) y retorna las pilas agregadas; se llama con asyncio.to_thread"""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Ya hay un muestreo en curso")
+        try:
+            seconds = min(seconds, self.max_seconds)
+            own = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks: Dict[str, int] = {}
+            samples = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    frames = []
+                    while frame is not None:
+                        code = frame.f_code
+                        frames.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    frames.append(names.get(ident, f"hilo-{ident}"))
+                    key = ";".join(reversed(frames))
+                    stacks[key] = stacks.get(key, 0) + 1
+                samples += 1
+                time.sleep(self.interval)
+            return {
+                "segundos": seconds,
+                "muestras": samples,
+                "folded": "\n".join(f"{stack} {count}" for stack, count in sorted(stacks.items(), key=lambda item: -item[1])),
+            }
+        finally:
+            self._lock.release()
+
+
+class MemoryProfiler:
+    """Snapshots de tracemalloc numerados; tracemalloc solo corre entre start() y stop()"""
+
+    def __init__(self, frames: int = 10, history_size: int = 5):
+        self.frames = frames
+        self.snapshots: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.history_size = history_size
+        self._ids = itertools.count(1)
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self.snapshots.clear()
+
+    def snapshot(self, top: int = 25) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc no está activo")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        snapshot_id = next(self._ids)
+        current, peak = tracemalloc.get_traced_memory()
+        self.snapshots[snapshot_id] = {"snapshot": snapshot, "created_at": datetime.utcnow()}
+        while len(self.snapshots) > self.history_size:
+            self.snapshots.popitem(last=False)
+        return {
+            "id": snapshot_id,
+            "memoria_actual_kb": round(current / 1024, 1),
+            "memoria_pico_kb": round(peak / 1024, 1),
+            "top": [
+                {"origen": str(stat.traceback), "kb": round(stat.size / 1024, 1), "bloques": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ],
+        }
+
+    def diff(self, base_id: int, target_id: int, top: int = 25, group_by: str = "lineno") -> List[Dict[str, Any]]:
+        base = self.snapshots[base_id]["snapshot"]
+        target = self.snapshots[target_id]["snapshot"]
+        return [
+            {
+                "origen": str(stat.traceback),
+                "kb": round(stat.size / 1024, 1),
+                "diferencia_kb": round(stat.size_diff / 1024, 1),
+                "diferencia_bloques": stat.count_diff,
+            }
+            for stat in target.compare_to(base, group_by)[:top]
+        ]
+
+
+request_profiler = RequestProfiler(
+    sample_rate=settings.PROFILING_SAMPLE_RATE,
+    history_size=settings.PROFILING_HISTORY_SIZE
+)
+stack_sampler = StackSampler(
+    interval_ms=settings.PROFILING_SAMPLE_INTERVAL_MS,
+    max_seconds=settings.PROFILING_MAX_SECONDS
+)
+memory_profiler = MemoryProfiler()
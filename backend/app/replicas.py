@@ -0,0 +1,163 @@
+"""
+Réplicas de solo lectura.
+
+Las rutas y servicios de consulta (dashboard, listados de lecturas y alertas,
+exportaciones y predicciones) usan sesiones de lectura: los SELECT van a una
+réplica elegida por turno rotativo entre las que están al día (retraso medido
+periódicamente por debajo de REPLICA_MAX_LAG_SECONDS) y cualquier escritura,
+o toda sentencia posterior a una escritura en la misma sesión, va a la primaria.
+
+Lectura de las propias escrituras: tras un POST/PUT/PATCH/DELETE exitoso la
+respuesta fija una cookie que envía las lecturas de ese cliente a la primaria
+durante el retraso máximo admitido más un intervalo de chequeo; pasado ese
+tiempo cualquier réplica elegible ya contiene la escritura.
+"""
+import asyncio
+import contextvars
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from sqlalchemy import Select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+
+# Retraso en segundos; 0 si no está en recuperación (no es réplica) o ya aplicó todo lo recibido
+LAG_SQL = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+COOKIE_PRIMARIA = "sf_primary_until"
+
+# Instante (time.time()) hasta el que las lecturas del request en curso van a la primaria
+primary_reads_until: contextvars.ContextVar[float] = contextvars.ContextVar("primary_reads_until", default=0.0)
+
+
+def reads_pinned_to_primary() -> bool:
+    return primary_reads_until.get() > time.time()
+
+
+@dataclass
+class Replica:
+    name: str
+    engine: AsyncEngine
+    lag: Optional[float] = None  # None: sin medir o inalcanzable
+    error: Optional[str] = None
+    checked_at: Optional[float] = None
+    selected: int = 0
+
+
+@dataclass
+class ReplicaPool:
+    """Réplicas con retraso medido en segundo plano y elección por turno rotativo"""
+
+    replicas: List[Replica] = field(default_factory=list)
+    max_lag_seconds: float = 5.0
+    check_interval_seconds: float = 2.0
+    check_timeout_seconds: float = 2.0
+    primary_fallbacks: int = 0
+    _turn: Any = field(default_factory=itertools.count, repr=False)
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    @property
+    def pin_seconds(self) -> float:
+        """Ventana de lectura de las propias escrituras: retraso máximo más el desfase de la última medición"""
+        return self.max_lag_seconds + self.check_interval_seconds
+
+    def add(self, name: str, engine: AsyncEngine) -> None:
+        self.replicas.append(Replica(name, engine))
+
+    def healthy(self) -> List[Replica]:
+        return [replica for replica in self.replicas if replica.lag is not None and replica.lag <= self.max_lag_seconds]
+
+    def choose(self) -> Optional[AsyncEngine]:
+        """Siguiente réplica al día; None (usar la primaria) si no hay ninguna"""
+        if not self.replicas:
+            return None
+        candidates = self.healthy()
+        if not candidates:
+            self.primary_fallbacks += 1
+            return None
+        replica = candidates[next(self._turn) % len(candidates)]
+        replica.selected += 1
+        return replica.engine
+
+    async def _check_one(self, replica: Replica) -> None:
+        try:
+            async with replica.engine.connect() as conn:
+                lag = await asyncio.wait_for(conn.scalar(LAG_SQL), self.check_timeout_seconds)
+            replica.lag = float(lag or 0)
+            replica.error = None
+        except Exception as e:
+            replica.lag = None
+            replica.error = f"{e.__class__.__name__}: {str(e)[:200]}"
+        replica.checked_at = time.time()
+
+    async def check(self) -> None:
+        await asyncio.gather(*(self._check_one(replica) for replica in self.replicas))
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval_seconds)
+
+    async def start(self) -> None:
+        """Primera medición antes de atender requests; hasta entonces se lee de la primaria"""
+        if self.replicas and self._task is None:
+            await self.check()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "habilitado": self.enabled,
+            "max_retraso_segundos": self.max_lag_seconds,
+            "lecturas_en_primaria_por_retraso": self.primary_fallbacks,
+            "replicas": [
+                {
+                    "nombre": replica.name,
+                    "retraso_segundos": None if replica.lag is None else round(replica.lag, 3),
+                    "al_dia": replica.lag is not None and replica.lag <= self.max_lag_seconds,
+                    "error": replica.error,
+                    "medido_hace_segundos": None if replica.checked_at is None else round(time.time() - replica.checked_at, 1),
+                    "selecciones": replica.selected,
+                }
+                for replica in self.replicas
+            ],
+        }
+
+
+class RoutingSession(Session):
+    """Sesión de lectura: SELECT a la réplica de info["replica"], el resto (y todo tras escribir) a la primaria"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None and not self.info.get("escribio"):
+            if (
+                not self._flushing
+                and isinstance(clause, Select)
+                and clause._for_update_arg is None
+            ):
+                return replica.sync_engine
+            # Desde aquí la sesión lee lo que acaba de escribir
+            self.info["escribio"] = True
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
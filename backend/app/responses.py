@@ -0,0 +1,38 @@
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+import orjson
+from fastapi.responses import JSONResponse
+
+
+# Arreglos/escalares NumPy sin .tolist(); los datetimes salen como isoformat(), igual que
+# en las rutas que pasan por jsonable_encoder (sin zona si vienen sin zona, "+00:00" si es UTC)
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    """Tipos que orjson no serializa de forma nativa"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, UUID):
+        # asyncpg entrega su propia subclase de UUID
+        return str(value)
+    if hasattr(value, "isoformat"):
+        # pandas.Timestamp y similares
+        return value.isoformat()
+    raise TypeError(f"Tipo no serializable a JSON: {type(value).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    """Respuesta JSON serializada con orjson.
+
+    Es la clase por defecto de la aplicación. Las rutas de listados y
+    predicciones la retornan directamente con filas ya tipadas desde la base de
+    datos: FastAPI no vuelve a validar con Pydantic una Response, pero sigue
+    usando response_model para el esquema OpenAPI.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
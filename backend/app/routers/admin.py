@@ -0,0 +1,161 @@
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import Optional
+from app.config import settings
+from app.profiling import admin_token_valid, memory_profiler, request_profiler, stack_sampler
+from app.slow_queries import slow_query_recorder
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Valida el header X-Admin-Token; sin ADMIN_TOKEN configurado la superficie de administración no existe"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not admin_token_valid(x_admin_token):
+        raise HTTPException(status_code=401, detail="Token de administración inválido")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+# --- Perfilado por request ---
+
+@router.get("/profiling/requests")
+def list_request_profiles():
+    """Capturas cProfile recientes (por header X-Profile o muestreo)"""
+    return {
+        "sample_rate": request_profiler.sample_rate,
+        "capturas": request_profiler.list()
+    }
+
+
+@router.get("/profiling/requests/{capture_id}")
+def get_request_profile(
+    capture_id: int,
+    formato: str = Query("texto", pattern="^(texto|pstats)$")
+):
+    """Resumen de pstats ordenado por tiempo acumulado, o el archivo .pstats para snakeviz"""
+    capture = request_profiler.get(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Captura no encontrada")
+    if formato == "pstats":
+        return Response(
+            capture["pstats"],
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f"attachment; filename=request_{capture_id}.pstats"}
+        )
+    return Response(capture["resumen"], media_type="text/plain; charset=utf-8")
+
+
+@router.put("/profiling/requests/sample-rate")
+def set_request_sample_rate(rate: float = Query(..., ge=0, le=1)):
+    """Cambia la fracción de requests perfilados (0 desactiva el muestreo)"""
+    request_profiler.sample_rate = rate
+    return {"sample_rate": rate}
+
+
+# --- Perfil de proceso completo ---
+
+@router.post("/profiling/process")
+async def profile_process(seconds: float = Query(10, gt=0, le=settings.PROFILING_MAX_SECONDS)):
+    """Muestrea las pilas de todos los hilos durante `seconds`; retorna un archivo folded para flamegraphs"""
+    if stack_sampler.running:
+        raise HTTPException(status_code=409, detail="Ya hay un muestreo en curso")
+    try:
+        result = await asyncio.to_thread(stack_sampler.sample, seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(
+        result["folded"],
+        media_type="text/plain; charset=utf-8",
+        headers={
+            "Content-Disposition": "attachment; filename=proceso.folded",
+            "X-Profile-Samples": str(result["muestras"])
+        }
+    )
+
+
+# --- Memoria (tracemalloc) ---
+
+@router.get("/profiling/memory")
+def memory_status():
+    """Estado de tracemalloc y snapshots disponibles"""
+    return {
+        "activo": memory_profiler.tracing,
+        "snapshots": [
+            {"id": snapshot_id, "created_at": entry["created_at"]}
+            for snapshot_id, entry in memory_profiler.snapshots.items()
+        ]
+    }
+
+
+@router.post("/profiling/memory/start")
+def memory_start():
+    """Activa tracemalloc (agrega costo a cada asignación hasta llamar a /stop)"""
+    memory_profiler.start()
+    return {"activo": True}
+
+
+@router.post("/profiling/memory/stop")
+def memory_stop():
+    """Desactiva tracemalloc y descarta los snapshots"""
+    memory_profiler.stop()
+    return {"activo": False}
+
+
+@router.post("/profiling/memory/snapshot")
+def memory_snapshot(top: int = Query(25, ge=1, le=200)):
+    """Toma un snapshot y retorna las líneas con más memoria asignada"""
+    try:
+        return memory_profiler.snapshot(top)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/profiling/memory/diff")
+def memory_diff(
+    base: int,
+    target: int,
+    top: int = Query(25, ge=1, le=200),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$")
+):
+    """Crecimiento de memoria entre dos snapshots, de mayor a menor"""
+    if base not in memory_profiler.snapshots or target not in memory_profiler.snapshots:
+        raise HTTPException(status_code=404, detail="Snapshot no encontrado")
+    return {
+        "base": base,
+        "target": target,
+        "diferencias": memory_profiler.diff(base, target, top, group_by)
+    }
+
+
+# --- Consultas lentas ---
+
+@router.get("/slow-queries")
+def list_slow_queries(
+    limit: int = Query(50, ge=1, le=1000),
+    min_ms: float = Query(0, ge=0),
+    sentencia: Optional[str] = Query(None, description="Texto contenido en la sentencia normalizada")
+):
+    """Sentencias lentas recientes (la más nueva primero) y resumen por forma"""
+    return {
+        "umbral_ms": slow_query_recorder.threshold * 1000,
+        "capacidad": slow_query_recorder.entries.maxlen,
+        "resumen": slow_query_recorder.summary(),
+        "consultas": slow_query_recorder.list(limit, min_ms, sentencia)
+    }
+
+
+@router.get("/slow-queries/{entry_id}")
+def get_slow_query(entry_id: int):
+    """Detalle de una sentencia lenta, con pila y plan"""
+    entry = slow_query_recorder.get(entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Consulta no encontrada")
+    return entry
+
+
+@router.delete("/slow-queries")
+def clear_slow_queries():
+    """Vacía el búfer"""
+    slow_query_recorder.clear()
+    return {"message": "Búfer de consultas lentas vaciado"}
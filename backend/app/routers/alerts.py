@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from uuid import UUID
-from app.database import get_db
+from app.database import read_session, shard_map
 from app.schemas.alerta import (
     AlertaResponse,
     AlertaListResponse,
     AlertaAcknowledgeResponse
 )
 from app.services.alert_service import AlertService
+from app.responses import ORJSONResponse
+from app.sharding import merge_sorted
 from datetime import datetime
 import csv
 from fastapi.responses import StreamingResponse
@@ -16,44 +18,62 @@ from io import StringIO
 
 router = APIRouter()
 
+# Límite alto para exportación
+LIMITE_EXPORTACION = 10000
+
 
 @router.get("", response_model=AlertaListResponse)
 async def get_alerts(
-    piso: Optional[int] = Query(None, ge=1, le=3),
+    edificio: Optional[str] = Query(None, max_length=10),
+    piso: Optional[int] = Query(None),
     nivel: Optional[str] = Query(None, pattern="^(informativa|media|critica)$"),
     estado: Optional[str] = Query(None, pattern="^(activa|reconocida|resuelta)$"),
     limit: int = Query(50, ge=1, le=500),
     offset: int = Query(0, ge=0),
-    order_by: str = Query("desc", pattern="^(asc|desc)$"),
-    db: Session = Depends(get_db)
+    order_by: str = Query("desc", pattern="^(asc|desc)$")
 ):
-    """Obtiene alertas con filtros y ordenamiento por tiempo"""
-    alert_service = AlertService(db)
-    alerts, total = alert_service.get_alerts(
-        piso=piso,
-        nivel=nivel,
-        estado=estado,
-        limit=limit,
-        offset=offset,
-        order_by=order_by
-    )
+    """Obtiene alertas con filtros y ordenamiento por tiempo (sin edificio, de todos los shards)"""
+    edificio = edificio.upper() if edificio else None
     
-    return {
+    async def consulta(db: AsyncSession, limit: int, offset: int):
+        return await AlertService(db).get_alert_rows(
+            edificio=edificio,
+            piso=piso,
+            nivel=nivel,
+            estado=estado,
+            limit=limit,
+            offset=offset,
+            order_by=order_by
+        )
+    
+    if edificio or not shard_map.enabled:
+        async with (shard_map.read_session(edificio) if edificio else read_session()) as db:
+            alerts, total = await consulta(db, limit, offset)
+    else:
+        # Cada shard aporta sus primeras offset + limit alertas; se combinan por timestamp
+        partes = await shard_map.gather(lambda db: consulta(db, offset + limit, 0))
+        alerts = merge_sorted(
+            (filas for filas, _ in partes),
+            key=lambda alert: alert["timestamp"],
+            reverse=order_by == "desc",
+            offset=offset,
+            limit=limit
+        )
+        total = sum(total for _, total in partes)
+    
+    return ORJSONResponse({
         "alerts": alerts,
         "total": total,
         "limit": limit,
         "offset": offset
-    }
+    })
 
 
 @router.post("/{alert_id}/acknowledge", response_model=AlertaAcknowledgeResponse)
-async def acknowledge_alert(
-    alert_id: UUID,
-    db: Session = Depends(get_db)
-):
-    """Reconoce una alerta"""
-    alert_service = AlertService(db)
-    alert = alert_service.acknowledge_alert(str(alert_id))
+async def acknowledge_alert(alert_id: UUID):
+    """Reconoce una alerta (el id no indica el edificio: se busca en todos los shards)"""
+    encontradas = await shard_map.gather(lambda db: AlertService(db).acknowledge_alert(alert_id), read=False)
+    alert = next((alert for alert in encontradas if alert), None)
     
     if not alert:
         raise HTTPException(status_code=404, detail="Alerta no encontrada")
@@ -67,23 +87,35 @@ async def acknowledge_alert(
 
 @router.get("/export")
 async def export_alerts(
-    piso: Optional[int] = Query(None, ge=1, le=3),
+    edificio: Optional[str] = Query(None, max_length=10),
+    piso: Optional[int] = Query(None),
     nivel: Optional[str] = Query(None, pattern="^(informativa|media|critica)$"),
     estado: Optional[str] = Query(None, pattern="^(activa|reconocida|resuelta)$"),
     format: str = Query("csv", pattern="^(csv|json)$"),
-    order_by: str = Query("desc", pattern="^(asc|desc)$"),
-    db: Session = Depends(get_db)
+    order_by: str = Query("desc", pattern="^(asc|desc)$")
 ):
-    """Exporta alertas en formato CSV o JSON"""
-    alert_service = AlertService(db)
-    alerts, total = alert_service.get_alerts(
-        piso=piso,
-        nivel=nivel,
-        estado=estado,
-        limit=10000,  # Límite alto para exportación
-        offset=0,
-        order_by=order_by
+    """Exporta alertas en formato CSV o JSON (sin edificio, de todos los shards en orden de tiempo)"""
+    edificio = edificio.upper() if edificio else None
+    
+    async def consulta(db: AsyncSession):
+        return await AlertService(db).get_alerts(
+            edificio=edificio,
+            piso=piso,
+            nivel=nivel,
+            estado=estado,
+            limit=LIMITE_EXPORTACION,
+            offset=0,
+            order_by=order_by
+        )
+    
+    partes = await shard_map.gather(consulta, shard_map.indices_for([edificio]) if edificio else None)
+    alerts = merge_sorted(
+        (alerts for alerts, _ in partes),
+        key=lambda alert: alert.timestamp,
+        reverse=order_by == "desc",
+        limit=LIMITE_EXPORTACION
     )
+    total = sum(total for _, total in partes)
     
     if format == "csv":
         output = StringIO()
@@ -91,7 +123,7 @@ async def export_alerts(
         
         # Headers
         writer.writerow([
-            "ID", "Timestamp", "Piso", "Variable", "Nivel",
+            "ID", "Timestamp", "Edificio", "Piso", "Variable", "Nivel",
             "Valor Actual", "Umbral", "Recomendación", "Explicación", "Estado"
         ])
         
@@ -100,6 +132,7 @@ async def export_alerts(
             writer.writerow([
                 str(alert.id),
                 alert.timestamp.isoformat(),
+                alert.edificio,
                 alert.piso,
                 alert.variable,
                 alert.nivel,
@@ -118,12 +151,12 @@ async def export_alerts(
         )
     else:
         # JSON format
-        from fastapi.responses import JSONResponse
-        return JSONResponse(content={
+        return ORJSONResponse({
             "alerts": [
                 {
                     "id": str(alert.id),
                     "timestamp": alert.timestamp.isoformat(),
+                    "edificio": alert.edificio,
                     "piso": alert.piso,
                     "variable": alert.variable,
                     "nivel": alert.nivel,
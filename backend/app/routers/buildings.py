@@ -0,0 +1,132 @@
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional
+from app.config import settings
+from app.database import get_building_db, get_building_read_db, shard_map
+from app.schemas.alerta import AlertaListResponse
+from app.schemas.dashboard import DashboardSummary, FloorCurrentResponse
+from app.schemas.edificio import EdificioResponse, PisoRegistro, PisoUpdate
+from app.schemas.prediccion import PrediccionBatchResponse
+from app.services.alert_service import AlertService
+from app.services.dashboard_service import DashboardService
+from app.services.prediction_service import PredictionService
+from app.services.registry_service import RegistryService
+from app.routers.readings import floor_current
+from app.responses import ORJSONResponse
+from app.sharding import merge_sorted
+
+router = APIRouter()
+
+# Las rutas de un edificio solo consultan sus filas (índices por edificio y piso) en el shard que lo contiene
+EdificioPath = Path(..., max_length=10, description="Código del edificio")
+
+
+@router.get("", response_model=List[EdificioResponse])
+async def list_buildings(
+    incluir_inactivos: bool = Query(False, description="Incluir pisos desactivados")
+):
+    """Lista los edificios con sus pisos registrados (de todos los shards)"""
+    partes = await shard_map.gather(lambda db: RegistryService(db).buildings(solo_activos=not incluir_inactivos))
+    return merge_sorted(partes, key=lambda edificio: edificio["edificio"])
+
+
+@router.get("/{edificio}", response_model=EdificioResponse)
+async def get_building(
+    edificio: str = EdificioPath,
+    db: AsyncSession = Depends(get_building_read_db)
+):
+    """Obtiene un edificio y sus pisos registrados"""
+    edificio = edificio.upper()
+    buildings = await RegistryService(db).buildings(edificio, solo_activos=False)
+    if not buildings:
+        raise HTTPException(status_code=404, detail=f"Edificio {edificio} no registrado")
+    return buildings[0]
+
+
+@router.put("/{edificio}/floors/{piso}", response_model=PisoRegistro)
+async def upsert_floor(
+    update: PisoUpdate,
+    piso: int,
+    edificio: str = EdificioPath,
+    db: AsyncSession = Depends(get_building_db)
+):
+    """Registra un piso (o cambia su nombre y si está activo)"""
+    if not settings.FLOOR_MIN <= piso <= settings.FLOOR_MAX:
+        raise HTTPException(status_code=400, detail=f"Piso debe estar entre {settings.FLOOR_MIN} y {settings.FLOOR_MAX}")
+    return await RegistryService(db).upsert(edificio.upper(), piso, update.nombre, update.activo)
+
+
+@router.get("/{edificio}/dashboard", response_model=DashboardSummary)
+async def get_building_dashboard(
+    edificio: str = EdificioPath,
+    db: AsyncSession = Depends(get_building_read_db)
+):
+    """Resumen del dashboard de un edificio"""
+    return await DashboardService(db).get_summary(edificio.upper())
+
+
+@router.get("/{edificio}/alerts", response_model=AlertaListResponse)
+async def get_building_alerts(
+    edificio: str = EdificioPath,
+    piso: Optional[int] = Query(None),
+    nivel: Optional[str] = Query(None, pattern="^(informativa|media|critica)$"),
+    estado: Optional[str] = Query(None, pattern="^(activa|reconocida|resuelta)$"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    order_by: str = Query("desc", pattern="^(asc|desc)$"),
+    db: AsyncSession = Depends(get_building_read_db)
+):
+    """Alertas de un edificio con filtros y ordenamiento por tiempo"""
+    alerts, total = await AlertService(db).get_alert_rows(
+        edificio=edificio.upper(),
+        piso=piso,
+        nivel=nivel,
+        estado=estado,
+        limit=limit,
+        offset=offset,
+        order_by=order_by
+    )
+    return ORJSONResponse({
+        "alerts": alerts,
+        "total": total,
+        "limit": limit,
+        "offset": offset
+    })
+
+
+@router.get("/{edificio}/predictions", response_model=PrediccionBatchResponse)
+async def get_building_predictions(
+    edificio: str = EdificioPath,
+    pisos: Optional[List[int]] = Query(None, description="Pisos a incluir (por defecto: los activos del edificio)"),
+    horizon: int = Query(60, ge=1, le=240, description="Horizonte de predicción en minutos"),
+    format: str = Query("points", pattern="^(points|compact)$", description="points: un objeto por minuto; compact: arreglos paralelos"),
+    modelo: Optional[str] = Query(None, pattern="^(promedio_movil|ewma|holt|holt_winters|sarimax|gbr_lags)$", description="Modelo de pronóstico (por defecto: PREDICTION_MODEL)"),
+    db: AsyncSession = Depends(get_building_read_db)
+):
+    """Predicciones de los pisos de un edificio"""
+    try:
+        results = await PredictionService(db).generate_predictions_many(
+            pisos=pisos,
+            edificios=[edificio.upper()],
+            horizon_minutes=horizon,
+            formato=format,
+            modelo=modelo
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    return ORJSONResponse({
+        "pisos": results,
+        "generated_at": datetime.utcnow()
+    })
+
+
+@router.get("/{edificio}/floors/{piso}/current", response_model=FloorCurrentResponse)
+async def get_building_floor_current(
+    piso: int,
+    edificio: str = EdificioPath,
+    db: AsyncSession = Depends(get_building_read_db)
+):
+    """Lectura más reciente de un piso del edificio"""
+    return await floor_current(db, edificio.upper(), piso)
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+from fastapi import APIRouter, HTTPException
 from datetime import datetime, timedelta
-from app.database import get_db
+from app.database import shard_map
 from app.schemas.data_import import (
     DataImportRequest,
     DataImportResponse,
@@ -14,48 +14,48 @@ router = APIRouter()
 
 
 @router.post("/import", response_model=DataImportResponse, status_code=201)
-async def import_data(
-    request: DataImportRequest,
-    db: Session = Depends(get_db)
-):
-    """Importa datos desde un archivo JSON"""
+async def import_data(request: DataImportRequest):
+    """Importa datos desde un archivo JSON (cada lectura en el shard de su edificio, los shards en paralelo)"""
     if not request.readings:
         raise HTTPException(status_code=400, detail="La lista de lecturas no puede estar vacía")
     
-    generator_service = DataGeneratorService(db)
+    partes = shard_map.partition([str(reading.get("edificio", "A")).upper() for reading in request.readings])
+    
+    async def importar(indice: int, posiciones):
+        async with shard_map.session_at(indice) as db:
+            return await DataGeneratorService(db).import_from_json(
+                [request.readings[i] for i in posiciones],
+                row_numbers=[int(i) + 1 for i in posiciones]
+            )
     
     try:
-        imported, errors, error_details, created_ids = generator_service.import_from_json(
-            request.readings
-        )
+        resultados = await asyncio.gather(*(importar(indice, posiciones) for indice, posiciones in partes.items()))
         
         return DataImportResponse(
-            imported=imported,
-            errors=errors,
-            error_details=error_details,
-            created_ids=created_ids
+            imported=sum(resultado[0] for resultado in resultados),
+            errors=sum(resultado[1] for resultado in resultados),
+            error_details=[error for resultado in resultados for error in resultado[2]],
+            created_ids=[id_ for resultado in resultados for id_ in resultado[3]]
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error importing data: {str(e)}")
 
 
 @router.post("/generate", response_model=GenerateDataResponse, status_code=201)
-async def generate_sample_data(
-    request: GenerateDataRequest,
-    db: Session = Depends(get_db)
-):
-    """Genera datos de ejemplo para pruebas"""
-    generator_service = DataGeneratorService(db)
-    
+async def generate_sample_data(request: GenerateDataRequest):
+    """Genera datos de ejemplo para pruebas (en el shard del edificio)"""
     try:
         start_time = request.start_time or (datetime.utcnow() - timedelta(minutes=request.count * request.interval_minutes))
         
-        created_ids = generator_service.generate_sample_data(
-            count=request.count,
-            start_time=start_time,
-            interval_minutes=request.interval_minutes,
-            scenario=request.scenario
-        )
+        async with shard_map.session(request.edificio) as db:
+            created_ids = await DataGeneratorService(db).generate_sample_data(
+                count=request.count,
+                start_time=start_time,
+                interval_minutes=request.interval_minutes,
+                scenario=request.scenario,
+                edificio=request.edificio,
+                pisos=request.pisos
+            )
         
         end_time = start_time + timedelta(minutes=(request.count - 1) * request.interval_minutes)
         
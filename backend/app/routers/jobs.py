@@ -0,0 +1,69 @@
+from fastapi import APIRouter, HTTPException
+from datetime import datetime, timedelta
+from typing import List
+from app.config import settings
+from app.schemas.data_import import DataImportRequest
+from app.schemas.job import GenerateJobRequest, JobResponse
+from app.services.data_generator_service import iter_generated_columns, iter_import_columns
+from app.services.job_service import job_manager, JobQueueFull
+
+router = APIRouter()
+
+
+def _submit(tipo: str, total: int, blocks, parametros: dict) -> dict:
+    try:
+        return job_manager.submit(tipo, total, blocks, parametros)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+
+@router.post("/generate", response_model=JobResponse, status_code=202)
+async def submit_generate_job(request: GenerateJobRequest):
+    """Encola la generación de datos de ejemplo; retorna el trabajo para consultar su progreso"""
+    start_time = request.start_time or (datetime.utcnow() - timedelta(minutes=request.count * request.interval_minutes))
+    blocks = iter_generated_columns(
+        count=request.count,
+        start_time=start_time,
+        interval_minutes=request.interval_minutes,
+        scenario=request.scenario,
+        chunk_rows=settings.JOB_CHUNK_ROWS,
+        edificio=request.edificio,
+        pisos=request.pisos
+    )
+    parametros = {**request.model_dump(mode="json"), "start_time": start_time.isoformat()}
+    return _submit("generate", request.count * len(request.pisos), blocks, parametros)
+
+
+@router.post("/import", response_model=JobResponse, status_code=202)
+async def submit_import_job(request: DataImportRequest):
+    """Encola la importación de lecturas JSON; retorna el trabajo para consultar su progreso"""
+    if not request.readings:
+        raise HTTPException(status_code=400, detail="La lista de lecturas no puede estar vacía")
+    
+    blocks = iter_import_columns(request.readings, chunk_rows=settings.JOB_CHUNK_ROWS)
+    return _submit("import", len(request.readings), blocks, {})
+
+
+@router.get("", response_model=List[JobResponse])
+async def list_jobs():
+    """Lista los trabajos recientes (más nuevos primero)"""
+    return list(reversed(job_manager.jobs.values()))
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Obtiene estado y progreso de un trabajo"""
+    job = job_manager.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    
+    return job
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """Cancela un trabajo en cola o en curso (lo ya insertado se conserva)"""
+    if job_id not in job_manager.jobs:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    
+    return job_manager.cancel(job_id)
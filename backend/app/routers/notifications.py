@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.schemas.notification import NotificationSubscribe, NotificationSubscribeResponse
 from app.models.suscripcion import Suscripcion
@@ -10,20 +11,20 @@ router = APIRouter()
 @router.post("/subscribe", response_model=NotificationSubscribeResponse)
 async def subscribe_notifications(
     subscription: NotificationSubscribe,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Suscribe un email para recibir notificaciones"""
     # Verificar si ya existe
-    existing = db.query(Suscripcion).filter(
+    existing = await db.scalar(select(Suscripcion).filter(
         Suscripcion.email == subscription.email
-    ).first()
+    ))
     
     if existing:
         # Actualizar suscripción existente
         existing.pisos = subscription.pisos
         existing.niveles = subscription.niveles
         existing.activa = True
-        db.commit()
+        await db.commit()
         return NotificationSubscribeResponse(
             message="Suscripción actualizada",
             email=subscription.email,
@@ -39,8 +40,8 @@ async def subscribe_notifications(
     )
     
     db.add(new_subscription)
-    db.commit()
-    db.refresh(new_subscription)
+    await db.commit()
+    await db.refresh(new_subscription)
     
     return NotificationSubscribeResponse(
         message="Suscripción creada exitosamente",
@@ -1,29 +1,106 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.schemas.prediccion import PrediccionResponse, PrediccionRequest
+from fastapi import APIRouter, HTTPException, Query
+from app.database import shard_map
+from app.schemas.prediccion import (
+    PrediccionResponse,
+    PrediccionBatchResponse,
+    PrediccionRequest,
+    EntrenamientoRequest,
+    EntrenamientoResponse,
+    ModeloRegistrado
+)
 from app.services.prediction_service import PredictionService
+from app.services.model_registry import model_registry
+from app.services.registry_service import RegistryService
+from app.services.training_service import start_training, training_runs
+from app.responses import ORJSONResponse
+from app.sharding import merge_sorted
 from datetime import datetime
+from typing import Optional, List
 
 router = APIRouter()
 
 
+@router.post("/models/train", response_model=EntrenamientoResponse, status_code=202)
+async def train_models(request: EntrenamientoRequest):
+    """Lanza el entrenamiento de un modelo por piso en el pool de procesos"""
+    edificio = request.edificio.upper()
+    pisos = request.pisos
+    if not pisos:
+        async with shard_map.read_session(edificio) as db:
+            pisos = [piso for _, piso in await RegistryService(db).floors(edificio)]
+    if not pisos:
+        raise HTTPException(status_code=404, detail=f"El edificio {edificio} no tiene pisos registrados")
+    
+    return start_training(request.modelo, pisos, edificio)
+
+
+@router.get("/models/train/{run_id}", response_model=EntrenamientoResponse)
+async def get_training_run(run_id: str):
+    """Obtiene el estado de una corrida de entrenamiento"""
+    run = training_runs.get(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Corrida de entrenamiento no encontrada")
+    
+    return run
+
+
+@router.get("/models", response_model=List[ModeloRegistrado])
+async def list_models():
+    """Lista la última versión registrada de cada modelo entrenado"""
+    return model_registry.list_models()
+
+
+@router.get("", response_model=PrediccionBatchResponse)
+async def get_predictions_batch(
+    pisos: Optional[List[int]] = Query(None, description="Pisos a incluir (por defecto: todos los pisos activos del registro)"),
+    edificios: Optional[List[str]] = Query(None, description="Edificios a incluir"),
+    horizon: int = Query(60, ge=1, le=240, description="Horizonte de predicción en minutos"),
+    format: str = Query("points", pattern="^(points|compact)$", description="points: un objeto por minuto; compact: arreglos paralelos"),
+    modelo: Optional[str] = Query(None, pattern="^(promedio_movil|ewma|holt|holt_winters|sarimax|gbr_lags)$", description="Modelo de pronóstico (por defecto: PREDICTION_MODEL)")
+):
+    """Obtiene predicciones para varios pisos (y edificios) en una sola llamada, en paralelo por shard"""
+    edificios = [edificio.upper() for edificio in edificios] if edificios else None
+    try:
+        partes = await shard_map.gather(
+            lambda db: PredictionService(db).generate_predictions_many(
+                pisos=pisos,
+                edificios=edificios,
+                horizon_minutes=horizon,
+                formato=format,
+                modelo=modelo
+            ),
+            shard_map.indices_for(edificios) if edificios else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    results = merge_sorted(partes, key=lambda resultado: (resultado["edificio"], resultado["piso"]))
+    
+    return ORJSONResponse({
+        "pisos": results,
+        "generated_at": datetime.utcnow()
+    })
+
+
 @router.get("/{piso}", response_model=PrediccionResponse)
 async def get_predictions(
     piso: int,
+    edificio: str = Query("A", max_length=10),
     horizon: int = Query(60, ge=1, le=240, description="Horizonte de predicción en minutos"),
-    db: Session = Depends(get_db)
+    format: str = Query("points", pattern="^(points|compact)$", description="points: un objeto por minuto; compact: arreglos paralelos"),
+    modelo: Optional[str] = Query(None, pattern="^(promedio_movil|ewma|holt|holt_winters|sarimax|gbr_lags)$", description="Modelo de pronóstico (por defecto: PREDICTION_MODEL)")
 ):
     """Obtiene predicciones para un piso"""
-    if piso not in [1, 2, 3]:
-        raise HTTPException(status_code=400, detail="Piso debe ser 1, 2 o 3")
-    
-    prediction_service = PredictionService(db)
-    predictions = prediction_service.generate_predictions(piso, horizon)
+    edificio = edificio.upper()
+    try:
+        async with shard_map.read_session(edificio) as db:
+            predictions = await PredictionService(db).generate_predictions(piso, horizon, formato=format, modelo=modelo, edificio=edificio)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     
-    return {
+    return ORJSONResponse({
+        "edificio": edificio,
         "piso": piso,
         "predictions": predictions,
         "generated_at": datetime.utcnow()
-    }
+    })
 
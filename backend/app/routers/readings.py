@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
-from app.database import get_db
+from app.database import get_db, read_session, shard_map
 from app.models.lectura import Lectura
 from app.schemas.lectura import (
     LecturaCreate,
@@ -12,110 +13,217 @@ from app.schemas.lectura import (
 )
 from app.schemas.dashboard import FloorCurrentResponse
 from app.services.alert_service import AlertService
+from app.services.online_forecast_service import OnlineForecastService
+from app.services.registry_service import RegistryService
+from app.services.columnar import fetch_columns, rows_from_columns
+from app.responses import ORJSONResponse
+from app.sharding import merge_sorted
+from app.metrics import record_ingest
+from app.services.spool import reading_spool, ingest_or_spool, columns_from_readings
+from app.services.binary_readings import (
+    CONTENT_TYPE_STRUCT,
+    CONTENT_TYPES_MSGPACK,
+    REGISTRO_LECTURA,
+    decode_struct,
+    decode_msgpack
+)
 
 router = APIRouter()
 
+# Columnas del listado, leídas en formato columnar (sin instancias ORM por fila)
+COLUMNAS_LECTURA = {
+    "id": Lectura.id,
+    "timestamp": Lectura.timestamp,
+    "edificio": Lectura.edificio,
+    "piso": Lectura.piso,
+    "temp_c": Lectura.temp_c,
+    "humedad_pct": Lectura.humedad_pct,
+    "energia_kw": Lectura.energia_kw,
+    "created_at": Lectura.created_at,
+}
+
 
 @router.post("", response_model=LecturaResponse, status_code=201)
-async def create_reading(
-    reading: LecturaCreate,
-    db: Session = Depends(get_db)
-):
-    """Crea una nueva lectura de sensor"""
-    try:
-        db_reading = Lectura(**reading.model_dump())
-        db.add(db_reading)
-        db.commit()
-        db.refresh(db_reading)
+async def create_reading(reading: LecturaCreate):
+    """Crea una nueva lectura de sensor en el shard de su edificio (202 si la base no está disponible y queda en el spool)"""
+    shard = shard_map.shard_for(reading.edificio).name
+    if reading_spool.bypass(shard):
+        spooled = await reading_spool.store(columns_from_readings([reading]))
+        return ORJSONResponse(spooled, status_code=202)
+    
+    async with shard_map.session(reading.edificio) as db:
+        try:
+            # El plazo cubre solo la inserción: una vez confirmada, la lectura no va al spool
+            async with reading_spool.db_deadline():
+                db_reading = Lectura(**reading.model_dump())
+                db.add(db_reading)
+                await db.commit()
+                await db.refresh(db_reading)
+        except Exception as e:
+            if reading_spool.handles(e, shard):
+                spooled = await reading_spool.store(columns_from_readings([reading]))
+                return ORJSONResponse(spooled, status_code=202)
+            await db.rollback()
+            raise HTTPException(status_code=400, detail=f"Error creating reading: {str(e)}")
         
-        # Verificar alertas
-        alert_service = AlertService(db)
-        alert_service.check_reading_alerts(db_reading)
+        try:
+            await RegistryService(db).register([(db_reading.edificio, db_reading.piso)])
+            
+            # Actualizar modelos de pronóstico en línea
+            await OnlineForecastService(db).observe(db_reading)
+            
+            # Verificar alertas
+            alert_service = AlertService(db)
+            await alert_service.check_reading_alerts(db_reading)
+        except Exception as e:
+            await db.rollback()
+            print(f"Error procesando la lectura {db_reading.id} ya guardada: {e!r}")
         
+        record_ingest("api", 1)
         return db_reading
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=f"Error creating reading: {str(e)}")
 
 
 @router.post("/batch", response_model=dict, status_code=201)
 async def create_readings_batch(
     batch: LecturaBatch,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Crea múltiples lecturas en lote"""
-    created = []
-    errors = []
+    """Crea múltiples lecturas en lote, repartidas por shard, con la misma ingesta columnar
+    que la ruta binaria (202 si la base no está disponible y el lote queda en el spool)"""
+    try:
+        result = await ingest_or_spool(db, columns_from_readings(batch.readings), source="api_batch")
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Error creating readings: {str(e)}")
     
-    alert_service = AlertService(db)
+    if result.get("spooled"):
+        return ORJSONResponse(result, status_code=202)
+    return result
+
+
+@router.post(
+    "/batch/binary",
+    response_model=dict,
+    status_code=201,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "description": (
+                f"{CONTENT_TYPE_STRUCT}: registros little-endian de {REGISTRO_LECTURA.itemsize} bytes "
+                "(timestamp_ms int64, edificio char[10], piso int16, temp_c/humedad_pct/energia_kw float32). "
+                "application/msgpack: mapa columnar con las mismas claves (listas o bin empaquetados)."
+            ),
+            "content": {
+                CONTENT_TYPE_STRUCT: {"schema": {"type": "string", "format": "binary"}},
+                CONTENT_TYPES_MSGPACK[0]: {"schema": {"type": "string", "format": "binary"}},
+            }
+        }
+    }
+)
+async def create_readings_batch_binary(
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Crea múltiples lecturas en lote desde un cuerpo binario (estructura fija o msgpack), repartidas por shard"""
+    content_type = request.headers.get("content-type", "").partition(";")[0].strip().lower()
+    body = await request.body()
     
-    for reading_data in batch.readings:
-        try:
-            db_reading = Lectura(**reading_data.model_dump())
-            db.add(db_reading)
-            db.commit()
-            db.refresh(db_reading)
-            created.append(db_reading.id)
-            
-            # Verificar alertas
-            alert_service.check_reading_alerts(db_reading)
-        except Exception as e:
-            db.rollback()
-            errors.append(f"Reading {reading_data.timestamp}: {str(e)}")
+    try:
+        if content_type == CONTENT_TYPE_STRUCT:
+            columns = decode_struct(body)
+        elif content_type in CONTENT_TYPES_MSGPACK:
+            columns = decode_msgpack(body)
+        else:
+            raise HTTPException(
+                status_code=415,
+                detail=f"Content-Type no soportado; usar {CONTENT_TYPE_STRUCT} o {CONTENT_TYPES_MSGPACK[0]}"
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error decoding batch: {str(e)}")
     
-    return {
-        "created": len(created),
-        "errors": len(errors),
-        "created_ids": created,
-        "error_details": errors
-    }
+    try:
+        result = await ingest_or_spool(db, columns, source="binary")
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Error creating readings: {str(e)}")
+    
+    if result.get("spooled"):
+        return ORJSONResponse(result, status_code=202)
+    return result
 
 
 @router.get("", response_model=LecturaListResponse)
 async def get_readings(
-    piso: Optional[int] = Query(None, ge=1, le=3),
+    edificio: Optional[str] = Query(None, max_length=10),
+    piso: Optional[int] = Query(None),
     start: Optional[datetime] = Query(None),
     end: Optional[datetime] = Query(None),
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db)
+    offset: int = Query(0, ge=0)
 ):
-    """Obtiene lecturas con filtros"""
-    query = db.query(Lectura)
+    """Obtiene lecturas con filtros (con edificio, solo en su shard; sin él, en todos los shards)"""
+    criteria = []
     
-    if piso:
-        query = query.filter(Lectura.piso == piso)
+    if edificio:
+        edificio = edificio.upper()
+        criteria.append(Lectura.edificio == edificio)
+    if piso is not None:
+        criteria.append(Lectura.piso == piso)
     if start:
-        query = query.filter(Lectura.timestamp >= start)
+        criteria.append(Lectura.timestamp >= start)
     if end:
-        query = query.filter(Lectura.timestamp <= end)
+        criteria.append(Lectura.timestamp <= end)
     
-    total = query.count()
-    readings = query.order_by(Lectura.timestamp.desc()).offset(offset).limit(limit).all()
+    async def consulta(db: AsyncSession, limit: int, offset: int):
+        total = await db.scalar(select(func.count(Lectura.id)).where(*criteria))
+        readings = await fetch_columns(
+            db,
+            COLUMNAS_LECTURA,
+            *criteria,
+            order_by=[Lectura.timestamp.desc()],
+            limit=limit,
+            offset=offset
+        )
+        return rows_from_columns(readings), total
     
-    return {
-        "data": readings,
+    if edificio or not shard_map.enabled:
+        async with (shard_map.read_session(edificio) if edificio else read_session()) as db:
+            data, total = await consulta(db, limit, offset)
+    else:
+        # Cada shard aporta sus primeras offset + limit filas; se combinan por timestamp
+        partes = await shard_map.gather(lambda db: consulta(db, offset + limit, 0))
+        data = merge_sorted((filas for filas, _ in partes), key=lambda fila: fila["timestamp"], reverse=True, offset=offset, limit=limit)
+        total = sum(total for _, total in partes)
+    
+    # Filas ya tipadas por la base de datos: se serializan sin pasar por response_model
+    return ORJSONResponse({
+        "data": data,
         "total": total,
         "limit": limit,
         "offset": offset
-    }
+    })
 
 
 @router.get("/floors/{piso}/current", response_model=FloorCurrentResponse)
 async def get_floor_current(
     piso: int,
-    db: Session = Depends(get_db)
+    edificio: str = Query("A", max_length=10)
 ):
     """Obtiene la lectura más reciente de un piso"""
-    if piso not in [1, 2, 3]:
-        raise HTTPException(status_code=400, detail="Piso debe ser 1, 2 o 3")
-    
-    reading = db.query(Lectura).filter(
+    edificio = edificio.upper()
+    async with shard_map.read_session(edificio) as db:
+        return await floor_current(db, edificio, piso)
+
+
+async def floor_current(db: AsyncSession, edificio: str, piso: int) -> dict:
+    """Lectura más reciente de un piso con su estado según los umbrales"""
+    reading = await db.scalar(select(Lectura).filter(
+        Lectura.edificio == edificio,
         Lectura.piso == piso
-    ).order_by(Lectura.timestamp.desc()).first()
+    ).order_by(Lectura.timestamp.desc()).limit(1))
     
     if not reading:
-        raise HTTPException(status_code=404, detail=f"No hay lecturas para el piso {piso}")
+        raise HTTPException(status_code=404, detail=f"No hay lecturas para el piso {piso} del edificio {edificio}")
     
     # Determinar status basado en umbrales actuales
     # Temperatura: Crítica >=29.5, Media 28.0-29.4, Informativa 26.0-27.9, OK <26.0
@@ -134,6 +242,7 @@ async def get_floor_current(
         status = "OK"
     
     return {
+        "edificio": reading.edificio,
         "piso": reading.piso,
         "temp_C": float(reading.temp_c),
         "humedad_pct": float(reading.humedad_pct),
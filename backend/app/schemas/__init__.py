@@ -9,6 +9,8 @@ from app.schemas.data_import import (
     GenerateDataResponse
 )
 from app.schemas.notification import NotificationSubscribe
+from app.schemas.job import GenerateJobRequest, JobResponse
+from app.schemas.edificio import EdificioResponse, PisoRegistro, PisoUpdate
 
 __all__ = [
     "LecturaCreate",
@@ -25,5 +27,10 @@ __all__ = [
     "GenerateDataRequest",
     "GenerateDataResponse",
     "NotificationSubscribe",
+    "GenerateJobRequest",
+    "JobResponse",
+    "EdificioResponse",
+    "PisoRegistro",
+    "PisoUpdate",
 ]
 
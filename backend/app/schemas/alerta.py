@@ -7,6 +7,7 @@ from uuid import UUID
 class AlertaResponse(BaseModel):
     id: UUID
     timestamp: datetime
+    edificio: str
     piso: int
     variable: str
     nivel: str
@@ -24,7 +25,8 @@ class AlertaResponse(BaseModel):
 
 
 class AlertaFilter(BaseModel):
-    piso: Optional[int] = Field(None, ge=1, le=3)
+    edificio: Optional[str] = Field(None, max_length=10)
+    piso: Optional[int] = None
     nivel: Optional[str] = Field(None, pattern="^(informativa|media|critica)$")
     estado: Optional[str] = Field(None, pattern="^(activa|reconocida|resuelta)$")
     limit: int = Field(default=50, ge=1, le=500)
@@ -14,6 +14,7 @@ class MetricasPiso(BaseModel):
 
 
 class PisoSummary(BaseModel):
+    edificio: str
     piso: int
     estado: str
     resumen: str
@@ -29,6 +30,7 @@ class DashboardSummary(BaseModel):
 
 
 class FloorCurrentResponse(BaseModel):
+    edificio: str
     piso: int
     temp_C: float
     humedad_pct: float
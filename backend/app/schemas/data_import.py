@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 from datetime import datetime
+from app.config import settings
 
 
 class DataImportRequest(BaseModel):
@@ -38,6 +39,20 @@ class GenerateDataRequest(BaseModel):
     start_time: Optional[datetime] = Field(None, description="Tiempo inicial (por defecto: ahora - count minutos)")
     interval_minutes: int = Field(default=1, ge=1, le=60, description="Intervalo entre lecturas en minutos")
     scenario: str = Field(default="normal", pattern="^(normal|stress|mixed)$", description="Escenario de datos")
+    edificio: str = Field(default="A", max_length=10, description="Edificio de las lecturas generadas")
+    pisos: List[int] = Field(default=[1, 2, 3], min_length=1, description="Pisos a generar (una lectura por piso e instante)")
+    
+    @field_validator("edificio")
+    @classmethod
+    def validate_edificio(cls, v):
+        return v.upper()
+    
+    @field_validator("pisos")
+    @classmethod
+    def validate_pisos(cls, v):
+        if any(piso < settings.FLOOR_MIN or piso > settings.FLOOR_MAX for piso in v):
+            raise ValueError(f"Los pisos deben estar entre {settings.FLOOR_MIN} y {settings.FLOOR_MAX}")
+        return sorted(set(v))
 
 
 class GenerateDataResponse(BaseModel):
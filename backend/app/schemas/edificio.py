@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+
+class PisoRegistro(BaseModel):
+    edificio: str
+    piso: int
+    nombre: Optional[str]
+    activo: bool
+    created_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+
+class EdificioResponse(BaseModel):
+    edificio: str
+    pisos: List[PisoRegistro]
+
+
+class PisoUpdate(BaseModel):
+    nombre: Optional[str] = Field(None, max_length=100)
+    activo: bool = True
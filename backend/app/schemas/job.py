@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from app.schemas.data_import import GenerateDataRequest
+
+
+class GenerateJobRequest(GenerateDataRequest):
+    """Esquema para generar datos de ejemplo como trabajo en segundo plano (sin el tope de la ruta síncrona)"""
+    count: int = Field(default=1000, ge=1, le=10_000_000, description="Número de instantes a generar (una lectura por piso)")
+
+
+class JobResponse(BaseModel):
+    """Estado y progreso de un trabajo en segundo plano"""
+    job_id: str
+    tipo: str = Field(..., description="generate o import")
+    estado: str = Field(..., description="en_cola, en_curso, cancelando, completado, completado_con_errores, cancelado o fallido")
+    parametros: Dict[str, Any] = Field(default_factory=dict)
+    total: int = Field(..., description="Lecturas a procesar")
+    procesadas: int = Field(..., description="Lecturas procesadas hasta ahora")
+    creadas: int = Field(..., description="Lecturas insertadas")
+    errores: int = Field(..., description="Lecturas con error o duplicadas")
+    error_details: List[str] = Field(default_factory=list, description="Primeros errores")
+    filas_por_segundo: float
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
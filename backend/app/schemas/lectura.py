@@ -1,12 +1,13 @@
 from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from typing import List, Optional
+from app.config import settings
 
 
 class LecturaCreate(BaseModel):
     timestamp: datetime
     edificio: str = Field(default="A", max_length=10)
-    piso: int = Field(..., ge=1, le=3)
+    piso: int = Field(..., ge=settings.FLOOR_MIN, le=settings.FLOOR_MAX)
     temp_c: float = Field(..., ge=-50, le=50)
     humedad_pct: float = Field(..., ge=0, le=100)
     energia_kw: float = Field(..., ge=0, le=1000)
@@ -36,7 +37,8 @@ class LecturaBatch(BaseModel):
 
 
 class LecturaFilter(BaseModel):
-    piso: Optional[int] = Field(None, ge=1, le=3)
+    edificio: Optional[str] = Field(None, max_length=10)
+    piso: Optional[int] = None
     start: Optional[datetime] = None
     end: Optional[datetime] = None
     limit: int = Field(default=100, ge=1, le=1000)
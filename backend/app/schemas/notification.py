@@ -4,7 +4,7 @@ from typing import List
 
 class NotificationSubscribe(BaseModel):
     email: EmailStr
-    pisos: List[int] = Field(..., min_items=1, max_items=3)
+    pisos: List[int] = Field(..., min_items=1)
     niveles: List[str] = Field(..., min_items=1)
 
 
@@ -9,12 +9,70 @@ class PrediccionPoint(BaseModel):
     confidence_interval: List[float]
 
 
+class PrediccionSerieCompacta(BaseModel):
+    values: List[float]
+    lower: List[float]
+    upper: List[float]
+
+
+class PrediccionCompacta(BaseModel):
+    """Pronóstico en formato compacto: el timestamp del punto i es start + i * step_seconds"""
+    start: datetime
+    step_seconds: int
+    length: int
+    series: Dict[str, PrediccionSerieCompacta]
+    riesgo_termico: str
+
+
 class PrediccionResponse(BaseModel):
+    edificio: str
     piso: int
     predictions: Dict[str, Any]
     generated_at: datetime
 
 
+class PrediccionPiso(BaseModel):
+    edificio: str
+    piso: int
+    predictions: Optional[Dict[str, Any]]
+    error: Optional[str] = None
+
+
+class PrediccionBatchResponse(BaseModel):
+    pisos: List[PrediccionPiso]
+    generated_at: datetime
+
+
 class PrediccionRequest(BaseModel):
     horizon: int = Field(default=60, ge=1, le=240, description="Horizonte de predicción en minutos")
 
+
+
+class EntrenamientoRequest(BaseModel):
+    modelo: str = Field(..., pattern="^(sarimax|gbr_lags)$", description="Modelo a entrenar")
+    pisos: Optional[List[int]] = Field(default=None, min_length=1, description="Pisos a entrenar (por defecto: los registrados del edificio)")
+    edificio: str = Field(default="A", max_length=10)
+
+
+class EntrenamientoResponse(BaseModel):
+    run_id: str
+    modelo: str
+    edificio: str
+    pisos: List[int]
+    estado: str
+    resultados: List[Dict[str, Any]]
+    errores: List[str]
+    started_at: datetime
+    finished_at: Optional[datetime]
+
+
+class ModeloRegistrado(BaseModel):
+    modelo: str
+    edificio: str
+    piso: int
+    version: int
+    trained_at: datetime
+    observaciones: int
+    ventana_horas: int
+    duracion_s: float
+    detalle: Dict[str, Any]
@@ -1,6 +1,7 @@
 import httpx
 from typing import Tuple, Optional
 from app.config import settings
+from app.tracing import traced, tracer
 
 
 class AIService:
@@ -10,7 +11,8 @@ class AIService:
         self.api_key = settings.GEMINI_API_KEY
         self.base_url = "https://generativelanguage.googleapis.com/v1beta"
     
-    def generate_alert_recommendation(
+    @traced()
+    async def generate_alert_recommendation(
         self,
         piso: int,
         variable: str,
@@ -52,15 +54,19 @@ EXPLICACIÓN: [tu explicación]
 """
         
         try:
-            response = httpx.post(
-                f"{self.base_url}/models/gemini-pro:generateContent?key={self.api_key}",
-                json={
-                    "contents": [{
-                        "parts": [{"text": prompt}]
-                    }]
-                },
-                timeout=10.0
-            )
+            url = f"{self.base_url}/models/gemini-pro:generateContent"
+            # La URL del span no incluye la API key
+            with tracer.span("POST gemini generateContent", "client", **{"http.method": "POST", "http.url": url}) as span:
+                async with httpx.AsyncClient(timeout=10.0) as client:
+                    response = await client.post(
+                        f"{url}?key={self.api_key}",
+                        json={
+                            "contents": [{
+                                "parts": [{"text": prompt}]
+                            }]
+                        }
+                    )
+                span.set_attribute("http.status_code", response.status_code)
             
             if response.status_code == 200:
                 data = response.json()
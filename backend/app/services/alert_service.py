@@ -1,26 +1,43 @@
 from datetime import datetime
+from uuid import UUID
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select, func, tuple_
+from app.metrics import ALERTS_CREATED, ALERTS_UPDATED
 from app.models.alerta import Alerta
 from app.models.lectura import Lectura
 from app.models.umbral import Umbral
 from app.services.ai_service import AIService
+from app.services.columnar import fetch_columns, rows_from_columns
+from app.tracing import traced
+
+
+# Columnas del listado de alertas (mismos campos que AlertaResponse)
+COLUMNAS_ALERTA = {
+    column.key: column
+    for column in (
+        Alerta.id, Alerta.timestamp, Alerta.edificio, Alerta.piso, Alerta.variable, Alerta.nivel,
+        Alerta.valor_actual, Alerta.umbral, Alerta.recomendacion, Alerta.explicacion,
+        Alerta.estado, Alerta.created_at, Alerta.acknowledged_at, Alerta.resolved_at
+    )
+}
 
 
 class AlertService:
     """Servicio para gestionar alertas"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.ai_service = AIService()
     
-    def get_thresholds(self, variable: str) -> List[Umbral]:
+    @traced()
+    async def get_thresholds(self, variable: str) -> List[Umbral]:
         """Obtiene umbrales activos para una variable"""
-        return self.db.query(Umbral).filter(
+        result = await self.db.scalars(select(Umbral).filter(
             Umbral.variable == variable,
             Umbral.activo == True
-        ).all()
+        ))
+        return result.all()
     
     def check_threshold(self, value: float, threshold: Umbral) -> bool:
         """Verifica si un valor está dentro del rango del umbral (debe generar alerta)"""
@@ -52,15 +69,16 @@ class AlertService:
         
         return None
     
-    def check_reading_alerts(self, lectura: Lectura) -> List[Alerta]:
+    @traced()
+    async def check_reading_alerts(self, lectura: Lectura) -> List[Alerta]:
         """Verifica y genera alertas para una lectura"""
         alerts = []
         
         # Verificar temperatura
-        temp_thresholds = self.get_thresholds("temperatura")
+        temp_thresholds = await self.get_thresholds("temperatura")
         temp_threshold = self.get_threshold_level(float(lectura.temp_c), temp_thresholds)
         if temp_threshold:
-            alert = self.create_alert(
+            alert = await self.create_alert(
                 lectura=lectura,
                 variable="temperatura",
                 nivel=temp_threshold.nivel.split("_")[0],
@@ -71,10 +89,10 @@ class AlertService:
                 alerts.append(alert)
         
         # Verificar humedad
-        humedad_thresholds = self.get_thresholds("humedad")
+        humedad_thresholds = await self.get_thresholds("humedad")
         humedad_threshold = self.get_threshold_level(float(lectura.humedad_pct), humedad_thresholds)
         if humedad_threshold:
-            alert = self.create_alert(
+            alert = await self.create_alert(
                 lectura=lectura,
                 variable="humedad",
                 nivel=humedad_threshold.nivel.split("_")[0],
@@ -85,10 +103,10 @@ class AlertService:
                 alerts.append(alert)
         
         # Verificar energía
-        energia_thresholds = self.get_thresholds("energia")
+        energia_thresholds = await self.get_thresholds("energia")
         energia_threshold = self.get_threshold_level(float(lectura.energia_kw), energia_thresholds)
         if energia_threshold:
-            alert = self.create_alert(
+            alert = await self.create_alert(
                 lectura=lectura,
                 variable="energia",
                 nivel=energia_threshold.nivel.split("_")[0],
@@ -100,7 +118,72 @@ class AlertService:
         
         return alerts
     
-    def create_alert(
+    @traced()
+    async def check_readings_alerts(self, lecturas: List[Lectura]) -> List[Alerta]:
+        """Verifica un lote de lecturas con un número fijo de sentencias.
+
+        Una alerta activa se identifica por (edificio, piso, variable, nivel) y las excedencias
+        posteriores solo actualizan su timestamp y valor: dentro del lote basta con
+        procesar la primera (crea la alerta) y la última (deja el valor final) de cada clave.
+        Los umbrales y las alertas activas se leen en una consulta cada uno, y las alertas
+        nuevas y las actualizadas se guardan en un solo commit.
+        """
+        variables = [("temperatura", "temp_c"), ("humedad", "humedad_pct"), ("energia", "energia_kw")]
+        thresholds: Dict[str, List[Umbral]] = {variable: [] for variable, _ in variables}
+        for threshold in await self.db.scalars(select(Umbral).filter(Umbral.activo == True)):
+            thresholds.setdefault(threshold.variable, []).append(threshold)
+
+        excedencias: Dict[tuple, List[Dict[str, Any]]] = {}
+        for lectura in sorted(lecturas, key=lambda l: l.timestamp):
+            for variable, columna in variables:
+                valor = float(getattr(lectura, columna))
+                threshold = self.get_threshold_level(valor, thresholds[variable])
+                if not threshold:
+                    continue
+                nivel = threshold.nivel.split("_")[0]
+                excedencia = {
+                    "lectura": lectura,
+                    "variable": variable,
+                    "nivel": nivel,
+                    "valor_actual": valor,
+                    "umbral": float(threshold.valor_max or threshold.valor_min or 0)
+                }
+                extremos = excedencias.setdefault((lectura.edificio, lectura.piso, variable, nivel), [excedencia])
+                if len(extremos) == 1 and extremos[0] is not excedencia:
+                    extremos.append(excedencia)
+                elif len(extremos) == 2:
+                    extremos[1] = excedencia
+
+        if not excedencias:
+            return []
+
+        existing: Dict[tuple, Alerta] = {}
+        for alert in await self.db.scalars(select(Alerta).filter(
+            tuple_(Alerta.edificio, Alerta.piso, Alerta.variable, Alerta.nivel).in_(list(excedencias)),
+            Alerta.estado == "activa"
+        )):
+            existing.setdefault((alert.edificio, alert.piso, alert.variable, alert.nivel), alert)
+
+        alerts = []
+        for key, extremos in excedencias.items():
+            alert = existing.get(key)
+            if alert is None:
+                alert = await self.build_alert(**extremos[0])
+                self.db.add(alert)
+                ALERTS_CREATED.labels(key[2], key[3]).inc()
+                extremos = extremos[1:]
+            for excedencia in extremos:
+                # Actualizar timestamp de alerta existente
+                alert.timestamp = excedencia["lectura"].timestamp
+                alert.valor_actual = excedencia["valor_actual"]
+                ALERTS_UPDATED.labels(key[2], key[3]).inc()
+            alerts.append(alert)
+
+        await self.db.commit()
+        return alerts
+    
+    @traced()
+    async def create_alert(
         self,
         lectura: Lectura,
         variable: str,
@@ -110,22 +193,41 @@ class AlertService:
     ) -> Optional[Alerta]:
         """Crea una nueva alerta con recomendación de IA"""
         # Verificar si ya existe una alerta activa similar
-        existing = self.db.query(Alerta).filter(
+        existing = await self.db.scalar(select(Alerta).filter(
+            Alerta.edificio == lectura.edificio,
             Alerta.piso == lectura.piso,
             Alerta.variable == variable,
             Alerta.nivel == nivel,
             Alerta.estado == "activa"
-        ).first()
+        ).limit(1))
         
         if existing:
             # Actualizar timestamp de alerta existente
             existing.timestamp = lectura.timestamp
             existing.valor_actual = valor_actual
-            self.db.commit()
+            await self.db.commit()
+            ALERTS_UPDATED.labels(variable, nivel).inc()
             return existing
         
+        alert = await self.build_alert(lectura, variable, nivel, valor_actual, umbral)
+        self.db.add(alert)
+        await self.db.commit()
+        await self.db.refresh(alert)
+        ALERTS_CREATED.labels(variable, nivel).inc()
+        
+        return alert
+    
+    async def build_alert(
+        self,
+        lectura: Lectura,
+        variable: str,
+        nivel: str,
+        valor_actual: float,
+        umbral: float
+    ) -> Alerta:
+        """Alerta activa nueva (sin guardar) con recomendación de IA"""
         # Generar recomendación con IA
-        recomendacion, explicacion = self.ai_service.generate_alert_recommendation(
+        recomendacion, explicacion = await self.ai_service.generate_alert_recommendation(
             piso=lectura.piso,
             variable=variable,
             nivel=nivel,
@@ -138,6 +240,7 @@ class AlertService:
         
         alert = Alerta(
             timestamp=lectura.timestamp,
+            edificio=lectura.edificio,
             piso=lectura.piso,
             variable=variable,
             nivel=nivel,
@@ -147,15 +250,11 @@ class AlertService:
             explicacion=explicacion,
             estado="activa"
         )
-        
-        self.db.add(alert)
-        self.db.commit()
-        self.db.refresh(alert)
-        
         return alert
     
-    def get_alerts(
+    async def get_alerts(
         self,
+        edificio: Optional[str] = None,
         piso: Optional[int] = None,
         nivel: Optional[str] = None,
         estado: Optional[str] = None,
@@ -164,35 +263,66 @@ class AlertService:
         order_by: str = "desc"
     ) -> tuple[List[Alerta], int]:
         """Obtiene alertas con filtros y ordenamiento"""
-        query = self.db.query(Alerta)
-        
-        if piso:
-            query = query.filter(Alerta.piso == piso)
-        if nivel:
-            query = query.filter(Alerta.nivel == nivel)
-        if estado:
-            query = query.filter(Alerta.estado == estado)
+        query = select(Alerta).filter(*self._filters(edificio, piso, nivel, estado))
         
-        total = query.count()
+        total = await self.db.scalar(select(func.count()).select_from(query.subquery()))
         
         # Ordenar por timestamp
         if order_by == "asc":
-            alerts = query.order_by(Alerta.timestamp.asc()).offset(offset).limit(limit).all()
+            query = query.order_by(Alerta.timestamp.asc())
         else:  # desc por defecto
-            alerts = query.order_by(Alerta.timestamp.desc()).offset(offset).limit(limit).all()
+            query = query.order_by(Alerta.timestamp.desc())
+        alerts = (await self.db.scalars(query.offset(offset).limit(limit))).all()
         
         return alerts, total
     
-    def acknowledge_alert(self, alert_id: str) -> Optional[Alerta]:
+    async def get_alert_rows(
+        self,
+        edificio: Optional[str] = None,
+        piso: Optional[int] = None,
+        nivel: Optional[str] = None,
+        estado: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        order_by: str = "desc"
+    ) -> tuple[List[Dict[str, Any]], int]:
+        """Como get_alerts, pero lee en formato columnar y retorna filas listas para serializar"""
+        filters = self._filters(edificio, piso, nivel, estado)
+        total = await self.db.scalar(select(func.count(Alerta.id)).filter(*filters))
+        
+        columns = await fetch_columns(
+            self.db,
+            COLUMNAS_ALERTA,
+            *filters,
+            order_by=[Alerta.timestamp.asc() if order_by == "asc" else Alerta.timestamp.desc()],
+            limit=limit,
+            offset=offset
+        )
+        return rows_from_columns(columns), total
+    
+    def _filters(self, edificio: Optional[str], piso: Optional[int], nivel: Optional[str], estado: Optional[str]) -> list:
+        """Condiciones de filtrado comunes a los listados de alertas"""
+        filters = []
+        if edificio is not None:
+            filters.append(Alerta.edificio == edificio)
+        if piso is not None:
+            filters.append(Alerta.piso == piso)
+        if nivel:
+            filters.append(Alerta.nivel == nivel)
+        if estado:
+            filters.append(Alerta.estado == estado)
+        return filters
+    
+    async def acknowledge_alert(self, alert_id: UUID) -> Optional[Alerta]:
         """Reconoce una alerta"""
-        alert = self.db.query(Alerta).filter(Alerta.id == alert_id).first()
+        alert = await self.db.scalar(select(Alerta).filter(Alerta.id == alert_id))
         if not alert:
             return None
         
         alert.estado = "reconocida"
         alert.acknowledged_at = datetime.utcnow()
-        self.db.commit()
-        self.db.refresh(alert)
+        await self.db.commit()
+        await self.db.refresh(alert)
         
         return alert
 
@@ -0,0 +1,114 @@
+"""
+Formatos binarios para la ingesta de lecturas en lote.
+
+Estructura fija (Content-Type: application/vnd.smartfloors.lecturas): una
+secuencia de registros little-endian de 32 bytes, sin encabezado:
+
+    offset  tipo      campo
+    0       int64     timestamp_ms   (epoch en milisegundos, UTC)
+    8       char[10]  edificio       (ASCII, relleno con NUL)
+    18      int16     piso
+    20      float32   temp_c
+    24      float32   humedad_pct
+    28      float32   energia_kw
+
+MessagePack (Content-Type: application/msgpack): un mapa columnar con las
+mismas claves. Cada columna puede ser un arreglo msgpack o un bin con los
+valores little-endian empaquetados (int64 para timestamp_ms, int16 para piso,
+float32 para las variables); edificio y piso también aceptan un escalar
+común a todo el lote.
+
+Ambos se decodifican directamente a arreglos NumPy (np.frombuffer no copia).
+"""
+import numpy as np
+from typing import Dict, Any
+
+try:
+    import msgpack
+except ImportError:  # msgpack es opcional: sin él solo se acepta la estructura fija
+    msgpack = None
+
+
+CONTENT_TYPE_STRUCT = "application/vnd.smartfloors.lecturas"
+CONTENT_TYPES_MSGPACK = ("application/msgpack", "application/x-msgpack")
+
+REGISTRO_LECTURA = np.dtype([
+    ("timestamp_ms", "<i8"),
+    ("edificio", "S10"),
+    ("piso", "<i2"),
+    ("temp_c", "<f4"),
+    ("humedad_pct", "<f4"),
+    ("energia_kw", "<f4"),
+])
+
+# dtype de cada columna cuando llega empaquetada como bin en msgpack
+DTYPES_COLUMNA = {
+    "timestamp_ms": np.dtype("<i8"),
+    "piso": np.dtype("<i2"),
+    "temp_c": np.dtype("<f4"),
+    "humedad_pct": np.dtype("<f4"),
+    "energia_kw": np.dtype("<f4"),
+}
+
+
+def decode_struct(body: bytes) -> Dict[str, np.ndarray]:
+    """Decodifica registros de estructura fija en arreglos por columna (vistas sin copia)"""
+    if len(body) % REGISTRO_LECTURA.itemsize != 0:
+        raise ValueError(
+            f"El cuerpo ({len(body)} bytes) no es múltiplo del registro de {REGISTRO_LECTURA.itemsize} bytes"
+        )
+    records = np.frombuffer(body, dtype=REGISTRO_LECTURA)
+    return {name: records[name] for name in REGISTRO_LECTURA.names}
+
+
+def encode_struct(columns: Dict[str, Any]) -> bytes:
+    """Empaqueta columnas en registros de estructura fija (para gateways, pruebas y generadores de carga)"""
+    n = len(columns["timestamp_ms"])
+    records = np.empty(n, dtype=REGISTRO_LECTURA)
+    for name in REGISTRO_LECTURA.names:
+        value = columns[name]
+        if name == "edificio" and isinstance(value, str):
+            value = value.encode("ascii")
+        records[name] = value
+    return records.tobytes()
+
+
+def decode_msgpack(body: bytes) -> Dict[str, np.ndarray]:
+    """Decodifica un mapa columnar msgpack en arreglos por columna"""
+    if msgpack is None:
+        raise ValueError("Formato msgpack no disponible: instalar el paquete msgpack")
+
+    data = msgpack.unpackb(body, raw=False)
+    if not isinstance(data, dict):
+        raise ValueError("Se esperaba un mapa msgpack con una lista o bin por columna")
+
+    missing = [name for name in DTYPES_COLUMNA if name not in data]
+    if missing:
+        raise ValueError(f"Faltan columnas: {', '.join(missing)}")
+
+    columns = {}
+    for name, dtype in DTYPES_COLUMNA.items():
+        value = data[name]
+        if isinstance(value, (bytes, bytearray)):
+            if len(value) % dtype.itemsize != 0:
+                raise ValueError(f"La columna {name} no es múltiplo de {dtype.itemsize} bytes")
+            columns[name] = np.frombuffer(value, dtype=dtype)
+        elif np.isscalar(value) and name == "piso":
+            columns[name] = value
+        else:
+            columns[name] = np.asarray(value, dtype=dtype)
+
+    n = len(columns["timestamp_ms"])
+    if np.isscalar(columns["piso"]):
+        columns["piso"] = np.full(n, columns["piso"], dtype=DTYPES_COLUMNA["piso"])
+
+    edificio = data.get("edificio", "A")
+    if isinstance(edificio, str):
+        columns["edificio"] = np.full(n, edificio, dtype=object)
+    else:
+        columns["edificio"] = np.asarray(edificio, dtype=object)
+
+    lengths = {name: len(array) for name, array in columns.items()}
+    if len(set(lengths.values())) != 1:
+        raise ValueError(f"Las columnas tienen largos distintos: {lengths}")
+    return columns
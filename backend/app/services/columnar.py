@@ -0,0 +1,112 @@
+"""
+Lecturas masivas en formato columnar.
+
+En vez de materializar una instancia ORM (o una fila) por registro, cada
+columna se agrega en Postgres con array_agg y llega como un solo arreglo: la
+consulta retorna una única fila con una lista por columna, que se convierte
+directamente a NumPy. Los Numeric se castean a float8 y los timestamps a
+segundos epoch en SQL, así que no hay Decimal ni datetime por valor.
+"""
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import DateTime, Integer, Numeric, Float, cast, func, select
+from sqlalchemy.dialects.postgresql import DOUBLE_PRECISION, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def _sql_column(expr: ColumnElement) -> ColumnElement:
+    """Castea la columna a un tipo que el driver entrega sin objetos por valor"""
+    if isinstance(expr.type, DateTime):
+        return cast(func.extract("epoch", expr), DOUBLE_PRECISION)
+    if isinstance(expr.type, (Numeric, Float)) and not isinstance(expr.type, Integer):
+        return cast(expr, DOUBLE_PRECISION)
+    return expr
+
+
+def _to_array(values: Optional[list], expr: ColumnElement) -> np.ndarray:
+    """Convierte el arreglo agregado al dtype NumPy de la columna"""
+    values = values or []
+    if isinstance(expr.type, DateTime):
+        # Segundos epoch (UTC) -> datetime64[us] sin zona horaria (UTC implícito); NULL -> NaT
+        seconds = np.asarray(values, dtype=float)
+        result = np.full(len(seconds), np.datetime64("NaT"), dtype="datetime64[us]")
+        valid = ~np.isnan(seconds)
+        result[valid] = np.round(seconds[valid] * 1e6).astype("int64").view("datetime64[us]")
+        return result
+    if isinstance(expr.type, Integer):
+        return np.asarray(values, dtype="int64")
+    if isinstance(expr.type, (Numeric, Float)):
+        return np.asarray(values, dtype=float)
+    return np.asarray(values, dtype=object)
+
+
+async def fetch_columns(
+    db: AsyncSession,
+    columns: Dict[str, ColumnElement],
+    *criteria,
+    order_by: Sequence[ColumnElement] = (),
+    limit: Optional[int] = None,
+    offset: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """Ejecuta un SELECT filtrado/paginado y retorna un arreglo NumPy por columna"""
+    numbered = select(
+        *[_sql_column(expr).label(name) for name, expr in columns.items()],
+        func.row_number().over(order_by=list(order_by) or None).label("_orden")
+    ).where(*criteria)
+    if order_by:
+        numbered = numbered.order_by(*order_by)
+    if limit is not None:
+        numbered = numbered.limit(limit)
+    if offset:
+        numbered = numbered.offset(offset)
+    rows = numbered.subquery()
+
+    # Todas las columnas se agregan con el mismo orden, por lo que quedan alineadas
+    stmt = select(*[
+        func.array_agg(aggregate_order_by(rows.c[name], rows.c._orden)).label(name)
+        for name in columns
+    ])
+    result = (await db.execute(stmt)).one()
+
+    return {
+        name: _to_array(values, expr)
+        for (name, expr), values in zip(columns.items(), result)
+    }
+
+
+async def fetch_frame(
+    db: AsyncSession,
+    columns: Dict[str, ColumnElement],
+    *criteria,
+    order_by: Sequence[ColumnElement] = (),
+    limit: Optional[int] = None,
+    offset: Optional[int] = None
+) -> pd.DataFrame:
+    """Igual que fetch_columns pero retorna un DataFrame; los timestamps con zona quedan en UTC"""
+    arrays = await fetch_columns(db, columns, *criteria, order_by=order_by, limit=limit, offset=offset)
+    df = pd.DataFrame(arrays, copy=False)
+    for name, expr in columns.items():
+        if isinstance(expr.type, DateTime) and expr.type.timezone:
+            df[name] = df[name].dt.tz_localize("UTC")
+    return df
+
+
+def rows_from_columns(columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Arma las filas de una respuesta JSON a partir de arreglos ya tipados por la base de datos.
+
+    Los valores no pasan por Pydantic: los numéricos se convierten a float/int
+    de una sola vez y los datetime64 se dejan para que orjson los serialice.
+    """
+    names = list(columns)
+    values = []
+    for array in columns.values():
+        if array.dtype.kind == "M":
+            if np.isnat(array).any():
+                # orjson no representa NaT: esas posiciones se serializan como null
+                array = np.where(np.isnat(array), None, array.astype(object)).tolist()
+            values.append(array)
+        else:
+            values.append(array.tolist())
+    return [dict(zip(names, row)) for row in zip(*values)]
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.alerta import Alerta
+from app.models.lectura import Lectura
+from app.models.piso import Piso
+from app.schemas.dashboard import DashboardSummary, MetricasPiso, PisoSummary
+from app.sharding import merge_sorted
+from app.tracing import traced
+
+
+# Ventana de las métricas del resumen
+VENTANA_HORAS = 4
+
+# Alertas recientes incluidas en el resumen
+ALERTAS_RECIENTES = 10
+
+
+class DashboardService:
+    """Resumen del dashboard con un número fijo de consultas, agrupadas por (edificio, piso)"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @traced()
+    async def get_summary(self, edificio: Optional[str] = None) -> DashboardSummary:
+        """Resumen de los pisos registrados (de un edificio o de todos) y sus alertas recientes"""
+        cutoff_time = datetime.utcnow() - timedelta(hours=VENTANA_HORAS)
+
+        # Pisos del registro con su última lectura: un acceso al índice (edificio, piso, timestamp) por piso
+        ultima_lectura = (
+            select(Lectura.timestamp)
+            .where(Lectura.edificio == Piso.edificio, Lectura.piso == Piso.piso)
+            .order_by(Lectura.timestamp.desc())
+            .limit(1)
+            .correlate(Piso)
+            .scalar_subquery()
+        )
+        pisos_stmt = select(Piso.edificio, Piso.piso, ultima_lectura.label("ultima_lectura")).where(Piso.activo == True)
+        if edificio is not None:
+            pisos_stmt = pisos_stmt.where(Piso.edificio == edificio)
+        pisos = (await self.db.execute(pisos_stmt.order_by(Piso.edificio, Piso.piso))).all()
+
+        # Métricas de las últimas horas por piso
+        metrics_stmt = select(
+            Lectura.edificio,
+            Lectura.piso,
+            func.avg(Lectura.temp_c).label("temp_avg"),
+            func.max(Lectura.temp_c).label("temp_max"),
+            func.min(Lectura.temp_c).label("temp_min"),
+            func.avg(Lectura.humedad_pct).label("humedad_avg"),
+            func.avg(Lectura.energia_kw).label("energia_avg"),
+            func.sum(Lectura.energia_kw).label("energia_total")
+        ).where(Lectura.timestamp >= cutoff_time).group_by(Lectura.edificio, Lectura.piso)
+        if edificio is not None:
+            metrics_stmt = metrics_stmt.where(Lectura.edificio == edificio)
+        metrics = {(row.edificio, row.piso): row for row in (await self.db.execute(metrics_stmt)).all()}
+
+        # Alertas activas por piso y nivel
+        alerts_stmt = select(
+            Alerta.edificio, Alerta.piso, Alerta.nivel, func.count(Alerta.id)
+        ).where(Alerta.estado == "activa").group_by(Alerta.edificio, Alerta.piso, Alerta.nivel)
+        if edificio is not None:
+            alerts_stmt = alerts_stmt.where(Alerta.edificio == edificio)
+        active: Dict[Tuple[str, int], Dict[str, int]] = {}
+        for alert_edificio, alert_piso, nivel, count in (await self.db.execute(alerts_stmt)).all():
+            active.setdefault((alert_edificio, alert_piso), {})[nivel] = count
+
+        pisos_summary = []
+        for piso_edificio, piso, ultima in pisos:
+            row = metrics.get((piso_edificio, piso))
+            niveles = active.get((piso_edificio, piso), {})
+            active_alerts = sum(niveles.values())
+
+            # Determinar estado basado en umbrales actuales
+            # Temperatura: Crítica >=29.5, Media 28.0-29.4, Informativa 26.0-27.9, OK <26.0
+            estado = "OK"
+            if row and row.temp_avg:
+                temp_avg = float(row.temp_avg)
+                if temp_avg >= 29.5 or niveles.get("critica", 0) > 0:
+                    estado = "CRITICA"
+                elif temp_avg >= 28.0 or niveles.get("media", 0) > 0:
+                    estado = "MEDIA"
+                elif temp_avg >= 26.0:
+                    estado = "INFORMATIVA"
+
+            resumen = "Condiciones normales"
+            if estado != "OK":
+                resumen = f"Requiere atención - {active_alerts} alerta(s) activa(s)"
+
+            metricas = MetricasPiso(
+                temp_avg=float(row.temp_avg) if row and row.temp_avg else 0.0,
+                temp_max=float(row.temp_max) if row and row.temp_max else 0.0,
+                temp_min=float(row.temp_min) if row and row.temp_min else 0.0,
+                humedad_avg=float(row.humedad_avg) if row and row.humedad_avg else 0.0,
+                energia_avg=float(row.energia_avg) if row and row.energia_avg else 0.0,
+                energia_total=float(row.energia_total) if row and row.energia_total else 0.0
+            )
+
+            pisos_summary.append(PisoSummary(
+                edificio=piso_edificio,
+                piso=piso,
+                estado=estado,
+                resumen=resumen,
+                metricas=metricas,
+                alertas_activas=active_alerts,
+                ultima_lectura=ultima
+            ))
+
+        # Alertas recientes
+        recent_stmt = select(Alerta).order_by(Alerta.timestamp.desc()).limit(ALERTAS_RECIENTES)
+        if edificio is not None:
+            recent_stmt = recent_stmt.where(Alerta.edificio == edificio)
+        recent_alerts = (await self.db.scalars(recent_stmt)).all()
+
+        return DashboardSummary(
+            pisos=pisos_summary,
+            alertas_recientes=recent_alerts,
+            timestamp=datetime.utcnow()
+        )
+
+    @staticmethod
+    def merge(resumenes: List[DashboardSummary]) -> DashboardSummary:
+        """Combina los resúmenes de varios shards: pisos por (edificio, piso) y las alertas más recientes de todos"""
+        if len(resumenes) == 1:
+            return resumenes[0]
+        return DashboardSummary(
+            pisos=merge_sorted((resumen.pisos for resumen in resumenes), key=lambda piso: (piso.edificio, piso.piso)),
+            alertas_recientes=merge_sorted(
+                (resumen.alertas_recientes for resumen in resumenes),
+                key=lambda alerta: alerta.timestamp,
+                reverse=True,
+                limit=ALERTAS_RECIENTES
+            ),
+            timestamp=datetime.utcnow()
+        )
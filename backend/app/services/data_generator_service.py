@@ -1,78 +1,138 @@
 import random
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
-from sqlalchemy.orm import Session
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.metrics import record_ingest
 from app.models.lectura import Lectura
 from app.services.alert_service import AlertService
+from app.services.online_forecast_service import OnlineForecastService
+from app.services.registry_service import RegistryService
+
+
+# Valores base por piso (óptimos); los demás pisos repiten este patrón
+VALORES_BASE = {
+    1: {"temp": 24.0, "humedad": 55.0, "energia": 12.0},
+    2: {"temp": 24.5, "humedad": 58.0, "energia": 13.5},
+    3: {"temp": 23.5, "humedad": 52.0, "energia": 11.5}
+}
+PISOS_EJEMPLO = sorted(VALORES_BASE)
+
+
+def valores_base(piso: int) -> Dict[str, float]:
+    return VALORES_BASE[(piso - 1) % len(VALORES_BASE) + 1]
+
+# Variación uniforme (mínimo, máximo) sobre el valor base según el escenario;
+# en "mixed" cada tercera lectura usa "mixed_stress" y el resto "mixed_normal"
+VARIACIONES_ESCENARIO = {
+    "normal": {"temp": (-1.5, 1.5), "humedad": (-5, 5), "energia": (-2, 2)},
+    "stress": {"temp": (3, 6), "humedad": (-8, 8), "energia": (5, 10)},
+    "mixed_stress": {"temp": (2, 5), "humedad": (-10, 10), "energia": (3, 8)},
+    "mixed_normal": {"temp": (-1, 2), "humedad": (-5, 5), "energia": (-1, 3)},
+}
+
+# Rangos razonables a los que se limitan los valores generados
+LIMITES_GENERACION = {"temp": (18, 35), "humedad": (20, 85), "energia": (5, 50)}
+
+
+def _variaciones(scenario: str, i: int) -> Dict[str, Tuple[float, float]]:
+    if scenario in ("normal", "stress"):
+        return VARIACIONES_ESCENARIO[scenario]
+    # mixed: cada tercera lectura es de estrés
+    return VARIACIONES_ESCENARIO["mixed_stress" if i % 3 == 0 else "mixed_normal"]
+
+
+def iter_generated_columns(
+    count: int,
+    start_time: datetime,
+    interval_minutes: int = 1,
+    scenario: str = "normal",
+    chunk_rows: int = 5000,
+    edificio: str = "A",
+    pisos: Optional[List[int]] = None
+) -> Iterator[Tuple[Dict[str, np.ndarray], List[str], None]]:
+    """Genera los mismos datos que generate_sample_data en bloques columnares (para trabajos grandes)"""
+    pisos = np.array(sorted(pisos or PISOS_EJEMPLO))
+    if start_time.tzinfo is None:
+        start_time = start_time.replace(tzinfo=timezone.utc)
+    start_ms = int(start_time.timestamp() * 1000)
+    steps = max(1, chunk_rows // len(pisos))
+    rng = np.random.default_rng()
+
+    for first in range(0, count, steps):
+        n_steps = min(count, first + steps) - first
+        i = np.repeat(np.arange(first, first + n_steps), len(pisos))
+
+        columns = {
+            "timestamp_ms": start_ms + i * interval_minutes * 60_000,
+            "edificio": np.full(len(i), edificio, dtype=object),
+            "piso": np.tile(pisos, n_steps),
+        }
+        for variable, columna in (("temp", "temp_c"), ("humedad", "humedad_pct"), ("energia", "energia_kw")):
+            base = np.tile([valores_base(piso)[variable] for piso in pisos], n_steps)
+            if scenario == "mixed":
+                stress = i % 3 == 0
+                low, high = (
+                    np.where(
+                        stress,
+                        VARIACIONES_ESCENARIO["mixed_stress"][variable][k],
+                        VARIACIONES_ESCENARIO["mixed_normal"][variable][k]
+                    )
+                    for k in (0, 1)
+                )
+            else:
+                low, high = VARIACIONES_ESCENARIO[scenario][variable]
+            valores = np.clip(base + rng.uniform(low, high, size=len(i)), *LIMITES_GENERACION[variable])
+            columns[columna] = np.round(valores, 2)
+        yield columns, [], None
 
 
 class DataGeneratorService:
     """Servicio para generar datos de ejemplo"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.alert_service = AlertService(db)
+        self.forecast_service = OnlineForecastService(db)
+        self.registry = RegistryService(db)
     
-    def generate_sample_data(
+    async def generate_sample_data(
         self,
         count: int = 30,
         start_time: datetime = None,
         interval_minutes: int = 1,
-        scenario: str = "normal"
+        scenario: str = "normal",
+        edificio: str = "A",
+        pisos: Optional[List[int]] = None
     ) -> List[int]:
-        """Genera datos de ejemplo para los 3 pisos"""
+        """Genera datos de ejemplo para los pisos indicados de un edificio (por defecto 1 a 3 del edificio A)"""
         if start_time is None:
             # Por defecto, empezar desde hace 'count' minutos
             start_time = datetime.utcnow() - timedelta(minutes=count * interval_minutes)
         
         created_ids = []
         
-        # Valores base por piso (óptimos)
-        base_values = {
-            1: {"temp": 24.0, "humedad": 55.0, "energia": 12.0},
-            2: {"temp": 24.5, "humedad": 58.0, "energia": 13.5},
-            3: {"temp": 23.5, "humedad": 52.0, "energia": 11.5}
-        }
-        
         for i in range(count):
             current_time = start_time + timedelta(minutes=i * interval_minutes)
+            variaciones = _variaciones(scenario, i)
             
-            for piso in [1, 2, 3]:
-                base = base_values[piso]
-                
-                # Generar valores según escenario
-                if scenario == "normal":
-                    # Variaciones normales alrededor de valores óptimos
-                    temp = base["temp"] + random.uniform(-1.5, 1.5)
-                    humedad = base["humedad"] + random.uniform(-5, 5)
-                    energia = base["energia"] + random.uniform(-2, 2)
-                    
-                elif scenario == "stress":
-                    # Condiciones de estrés (temperatura alta, consumo alto)
-                    temp = base["temp"] + random.uniform(3, 6)
-                    humedad = base["humedad"] + random.uniform(-8, 8)
-                    energia = base["energia"] + random.uniform(5, 10)
-                    
-                else:  # mixed
-                    # Mezcla de condiciones normales y de estrés
-                    if i % 3 == 0:  # Cada tercera lectura es de estrés
-                        temp = base["temp"] + random.uniform(2, 5)
-                        humedad = base["humedad"] + random.uniform(-10, 10)
-                        energia = base["energia"] + random.uniform(3, 8)
-                    else:
-                        temp = base["temp"] + random.uniform(-1, 2)
-                        humedad = base["humedad"] + random.uniform(-5, 5)
-                        energia = base["energia"] + random.uniform(-1, 3)
+            for piso in pisos or PISOS_EJEMPLO:
+                base = valores_base(piso)
                 
-                # Limitar valores a rangos razonables
-                temp = max(18, min(35, temp))
-                humedad = max(20, min(85, humedad))
-                energia = max(5, min(50, energia))
+                # Generar valores según escenario y limitarlos a rangos razonables
+                temp, humedad, energia = (
+                    max(LIMITES_GENERACION[variable][0], min(
+                        LIMITES_GENERACION[variable][1],
+                        base[variable] + random.uniform(*variaciones[variable])
+                    ))
+                    for variable in ("temp", "humedad", "energia")
+                )
                 
                 # Crear lectura
                 lectura = Lectura(
                     timestamp=current_time,
-                    edificio="A",
+                    edificio=edificio,
                     piso=piso,
                     temp_c=round(temp, 2),
                     humedad_pct=round(humedad, 2),
@@ -81,25 +141,38 @@ class DataGeneratorService:
                 
                 try:
                     self.db.add(lectura)
-                    self.db.commit()
-                    self.db.refresh(lectura)
+                    await self.db.commit()
+                    await self.db.refresh(lectura)
                     created_ids.append(lectura.id)
+                    await self.registry.register([(lectura.edificio, lectura.piso)])
+                    await self.forecast_service.observe(lectura)
                     
                     # Verificar alertas
-                    self.alert_service.check_reading_alerts(lectura)
+                    await self.alert_service.check_reading_alerts(lectura)
                     
                 except Exception as e:
-                    self.db.rollback()
+                    await self.db.rollback()
                     print(f"Error creating reading for piso {piso} at {current_time}: {e}")
         
+        record_ingest("generator", len(created_ids))
         return created_ids
     
-    def import_from_json(self, readings_data: List[Dict[str, Any]]) -> tuple[int, int, List[str], List[int]]:
-        """Importa lecturas desde una lista de diccionarios JSON"""
+    async def import_from_json(
+        self,
+        readings_data: List[Dict[str, Any]],
+        row_numbers: Optional[List[int]] = None
+    ) -> tuple[int, int, List[str], List[int]]:
+        """Importa lecturas desde una lista de diccionarios JSON.
+
+        row_numbers permite informar los errores con la numeración del origen (p. ej. la
+        parte de una importación que corresponde a un shard); por defecto 1..n.
+        """
         imported = 0
         errors = 0
         error_details = []
         created_ids = []
+        if row_numbers is None:
+            row_numbers = list(range(1, len(readings_data) + 1))
         
         for idx, reading_data in enumerate(readings_data):
             try:
@@ -122,22 +195,69 @@ class DataGeneratorService:
                 )
                 
                 # Validar piso
-                if lectura.piso not in [1, 2, 3]:
-                    raise ValueError(f"Piso debe ser 1, 2 o 3, recibido: {lectura.piso}")
+                if not settings.FLOOR_MIN <= lectura.piso <= settings.FLOOR_MAX:
+                    raise ValueError(f"Piso debe estar entre {settings.FLOOR_MIN} y {settings.FLOOR_MAX}, recibido: {lectura.piso}")
                 
                 self.db.add(lectura)
-                self.db.commit()
-                self.db.refresh(lectura)
+                await self.db.commit()
+                await self.db.refresh(lectura)
                 created_ids.append(lectura.id)
                 imported += 1
+                await self.registry.register([(lectura.edificio, lectura.piso)])
+                await self.forecast_service.observe(lectura)
                 
                 # Verificar alertas
-                self.alert_service.check_reading_alerts(lectura)
+                await self.alert_service.check_reading_alerts(lectura)
                 
             except Exception as e:
-                self.db.rollback()
+                await self.db.rollback()
                 errors += 1
-                error_details.append(f"Lectura {idx + 1}: {str(e)}")
+                error_details.append(f"Lectura {row_numbers[idx]}: {str(e)}")
         
+        record_ingest("import", imported, errors)
         return imported, errors, error_details, created_ids
 
+
+def iter_import_columns(
+    readings_data: List[Dict[str, Any]],
+    chunk_rows: int = 5000
+) -> Iterator[Tuple[Dict[str, np.ndarray], List[str], np.ndarray]]:
+    """Convierte lecturas JSON (mismo formato que import_from_json) en bloques columnares.
+
+    Retorna por bloque las columnas, los errores de conversión y el número de lectura
+    (1..n del origen) de cada fila para informar los errores de validación.
+    """
+    for first in range(0, len(readings_data), chunk_rows):
+        rows = {name: [] for name in ("timestamp_ms", "edificio", "piso", "temp_c", "humedad_pct", "energia_kw")}
+        numbers = []
+        errors = []
+        for idx, reading_data in enumerate(readings_data[first:first + chunk_rows], start=first):
+            try:
+                timestamp = reading_data.get("timestamp")
+                if isinstance(timestamp, str):
+                    timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+                elif not isinstance(timestamp, datetime):
+                    raise ValueError("timestamp debe ser string ISO o datetime")
+                if timestamp.tzinfo is None:
+                    timestamp = timestamp.replace(tzinfo=timezone.utc)
+                row = (
+                    int(timestamp.timestamp() * 1000),
+                    str(reading_data.get("edificio", "A")),
+                    float(reading_data.get("piso", 1)),
+                    float(reading_data.get("temp_c", 0)),
+                    float(reading_data.get("humedad_pct", 0)),
+                    float(reading_data.get("energia_kw", 0)),
+                )
+            except (ValueError, TypeError, AttributeError) as e:
+                errors.append(f"Lectura {idx + 1}: {str(e)}")
+                continue
+            for name, value in zip(rows, row):
+                rows[name].append(value)
+            numbers.append(idx + 1)
+
+        columns = {
+            "timestamp_ms": np.array(rows["timestamp_ms"], dtype=np.int64),
+            "edificio": np.array(rows["edificio"], dtype=object),
+            **{name: np.array(rows[name], dtype=np.float64) for name in ("piso", "temp_c", "humedad_pct", "energia_kw")},
+        }
+        yield columns, errors, np.array(numbers, dtype=np.int64)
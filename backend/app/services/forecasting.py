@@ -0,0 +1,322 @@
+"""
+Modelos de pronóstico en línea (suavizamiento exponencial).
+
+Cada modelo mantiene un estado pequeño que se actualiza en O(1) con cada lectura
+y se serializa a JSON para persistirlo. El ajuste offline de los parámetros se
+hace con statsmodels sobre una ventana histórica, una sola vez.
+"""
+import math
+import warnings
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+from app.config import settings
+
+
+# Variables pronosticadas: columna de origen, valor por defecto sin datos,
+# banda de confianza por defecto y límites físicos (None = sin límite)
+VARIABLES_PREDICCION = {
+    "temperatura": {"columna": "temp_c", "default": 24.0, "banda": 1.0, "limites": (None, None)},
+    "humedad": {"columna": "humedad_pct", "default": 55.0, "banda": 5.0, "limites": (0.0, 100.0)},
+    "energia": {"columna": "energia_kw", "default": 12.0, "banda": 2.0, "limites": (0.0, None)},
+}
+
+# Multiplicador de la desviación estándar del error para la banda de confianza
+Z_CONFIANZA = 1.5
+# Suavizamiento de la varianza de los errores a un paso
+ALPHA_VARIANZA = 0.05
+# Mínimo de observaciones para ajustar parámetros con statsmodels
+MIN_OBSERVACIONES_AJUSTE = 10
+
+
+def _epoch(ts: datetime) -> float:
+    """Convierte un datetime (naive = UTC) a segundos epoch"""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def _damped_sum(phi: float, k: np.ndarray) -> np.ndarray:
+    """Suma phi^1 + ... + phi^k (admite k real y vectorial)"""
+    if phi >= 1.0:
+        return np.asarray(k, dtype=float)
+    return phi * (1.0 - np.power(phi, k)) / (1.0 - phi)
+
+
+class ForecastModel:
+    """Modelo base: nivel suavizado y varianza del error a un paso"""
+
+    nombre = "base"
+    default_params: Dict[str, float] = {}
+
+    def __init__(self, params: Optional[Dict[str, float]] = None, state: Optional[Dict[str, Any]] = None):
+        self.params = {**self.default_params, **(params or {})}
+        state = state or {}
+        self.level = state.get("level")
+        self.variance = state.get("variance", 0.0)
+        self.last_ts = state.get("last_ts")
+        self.last_value = state.get("last_value")
+        self.n = state.get("n", 0)
+
+    # --- Serialización ---
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "modelo": self.nombre,
+            "params": self.params,
+            "level": self.level,
+            "variance": self.variance,
+            "last_ts": self.last_ts,
+            "last_value": self.last_value,
+            "n": self.n,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "ForecastModel":
+        return cls(params=state.get("params"), state=state)
+
+    # --- Actualización en línea ---
+
+    def update(self, timestamp: datetime, value: float) -> bool:
+        """Incorpora una lectura; ignora lecturas repetidas o fuera de orden"""
+        ts = _epoch(timestamp)
+        if self.last_ts is not None and ts <= self.last_ts:
+            return False
+
+        if self.n == 0:
+            self._initialize(ts, value)
+        else:
+            dt = (ts - self.last_ts) / 60.0
+            error = self._step(ts, dt, value)
+            self.variance = (1 - ALPHA_VARIANZA) * self.variance + ALPHA_VARIANZA * error * error
+
+        self.last_ts = ts
+        self.last_value = value
+        self.n += 1
+        return True
+
+    def _initialize(self, ts: float, value: float) -> None:
+        self.level = value
+
+    def _step(self, ts: float, dt: float, value: float) -> float:
+        raise NotImplementedError
+
+    # --- Pronóstico ---
+
+    def forecast(self, base_time: datetime, horizon_minutes: int, step_minutes: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Evalúa el estado en los pasos del horizonte; retorna (valores, semiancho de banda)"""
+        offset = max((_epoch(base_time) - self.last_ts) / 60.0, 0.0)
+        k = offset + np.arange(1, horizon_minutes + 1, dtype=float) * step_minutes
+        values = self._point_forecast(k)
+        band = Z_CONFIANZA * np.sqrt(self.variance * self._variance_factor(k))
+        return values, band
+
+    def _point_forecast(self, k: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def _variance_factor(self, k: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    # --- Ajuste offline ---
+
+    @classmethod
+    def fit(cls, timestamps: np.ndarray, values: np.ndarray) -> "ForecastModel":
+        """Estima parámetros sobre el histórico y reproduce las lecturas para fijar el estado"""
+        params = cls.default_params
+        if len(values) >= MIN_OBSERVACIONES_AJUSTE and np.ptp(values) > 0:
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    params = cls._fit_params(timestamps, values)
+            except Exception as e:
+                print(f"Error ajustando {cls.nombre}, usando parámetros por defecto: {e}")
+
+        model = cls(params=params)
+        model._prepare(timestamps, values)
+        for ts, value in zip(pd.to_datetime(timestamps, utc=True), values):
+            model.update(ts.to_pydatetime(), float(value))
+        return model
+
+    @classmethod
+    def _fit_params(cls, timestamps: np.ndarray, values: np.ndarray) -> Dict[str, float]:
+        raise NotImplementedError
+
+    def _prepare(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        """Inicialización adicional antes de reproducir el histórico"""
+
+
+class EWMAModel(ForecastModel):
+    """Promedio móvil exponencial (suavizamiento exponencial simple)"""
+
+    nombre = "ewma"
+    default_params = {"alpha": 0.3}
+
+    def _step(self, ts: float, dt: float, value: float) -> float:
+        error = value - self.level
+        self.level += self.params["alpha"] * error
+        return error
+
+    def _point_forecast(self, k: np.ndarray) -> np.ndarray:
+        return np.full(k.shape, self.level, dtype=float)
+
+    def _variance_factor(self, k: np.ndarray) -> np.ndarray:
+        return 1.0 + (np.maximum(k, 1.0) - 1.0) * self.params["alpha"] ** 2
+
+    @classmethod
+    def _fit_params(cls, timestamps, values):
+        from statsmodels.tsa.holtwinters import SimpleExpSmoothing
+
+        fitted = SimpleExpSmoothing(values, initialization_method="estimated").fit()
+        return {"alpha": float(fitted.params["smoothing_level"])}
+
+
+class HoltModel(ForecastModel):
+    """Tendencia lineal de Holt amortiguada; la tendencia se expresa por minuto"""
+
+    nombre = "holt"
+    default_params = {"alpha": 0.3, "beta": 0.05, "phi": 0.98}
+
+    def __init__(self, params=None, state=None):
+        super().__init__(params, state)
+        self.trend = (state or {}).get("trend", 0.0)
+
+    def to_state(self):
+        return {**super().to_state(), "trend": self.trend}
+
+    def _seasonal(self, ts: float) -> float:
+        return 0.0
+
+    def _step(self, ts: float, dt: float, value: float) -> float:
+        alpha, beta, phi = self.params["alpha"], self.params["beta"], self.params["phi"]
+        season = self._seasonal(ts)
+        projected = self.level + self.trend * float(_damped_sum(phi, dt))
+        error = value - (projected + season)
+
+        level = alpha * (value - season) + (1 - alpha) * projected
+        self.trend = beta * (level - self.level) / max(dt, 1e-6) + (1 - beta) * self.trend * phi ** dt
+        self.level = level
+        self._update_seasonal(ts, value)
+        return error
+
+    def _update_seasonal(self, ts: float, value: float) -> None:
+        pass
+
+    def _point_forecast(self, k: np.ndarray) -> np.ndarray:
+        return self.level + self.trend * _damped_sum(self.params["phi"], k)
+
+    def _variance_factor(self, k: np.ndarray) -> np.ndarray:
+        # sigma^2 * (1 + sum_{j=1}^{h-1} (alpha * (1 + beta * j))^2), en pasos enteros
+        alpha, beta = self.params["alpha"], self.params["beta"]
+        steps = np.maximum(np.ceil(k), 1.0).astype(int)
+        j = np.arange(1, steps.max(), dtype=float)
+        cumulative = np.concatenate(([0.0], np.cumsum((alpha * (1 + beta * j)) ** 2)))
+        return 1.0 + cumulative[steps - 1]
+
+    @classmethod
+    def _fit_params(cls, timestamps, values):
+        from statsmodels.tsa.holtwinters import Holt
+
+        fitted = Holt(values, damped_trend=True, initialization_method="estimated").fit()
+        return {
+            "alpha": float(fitted.params["smoothing_level"]),
+            "beta": float(fitted.params["smoothing_trend"]),
+            "phi": float(fitted.params["damping_trend"]),
+        }
+
+
+class HoltWintersModel(HoltModel):
+    """Holt-Winters aditivo con estacionalidad diaria por franjas horarias"""
+
+    nombre = "holt_winters"
+    default_params = {"alpha": 0.3, "beta": 0.05, "phi": 0.98, "gamma": 0.01}
+
+    def __init__(self, params=None, state=None):
+        super().__init__(params, state)
+        self.bucket_minutes = settings.FORECAST_SEASON_BUCKET_MINUTES
+        periods = (24 * 60) // self.bucket_minutes
+        self.season = list((state or {}).get("season") or [0.0] * periods)
+
+    def to_state(self):
+        return {**super().to_state(), "season": self.season}
+
+    def _slot(self, ts):
+        return ((np.asarray(ts) // 60) % (24 * 60) // self.bucket_minutes).astype(int)
+
+    def _seasonal(self, ts: float) -> float:
+        return self.season[int(self._slot(ts))]
+
+    def _initialize(self, ts: float, value: float) -> None:
+        self.level = value - self._seasonal(ts)
+
+    def _update_seasonal(self, ts: float, value: float) -> None:
+        slot = int(self._slot(ts))
+        gamma = self.params["gamma"]
+        self.season[slot] = gamma * (value - self.level) + (1 - gamma) * self.season[slot]
+
+    def _point_forecast(self, k: np.ndarray) -> np.ndarray:
+        slots = self._slot(self.last_ts + k * 60.0)
+        return super()._point_forecast(k) + np.asarray(self.season)[slots]
+
+    @classmethod
+    def _seasonal_profile(cls, timestamps: np.ndarray, values: np.ndarray) -> Optional[np.ndarray]:
+        """Perfil estacional a partir de promedios por franja; requiere al menos dos días"""
+        series = pd.Series(np.asarray(values, dtype=float), index=pd.to_datetime(timestamps, utc=True))
+        if series.empty or series.index.max() - series.index.min() < pd.Timedelta(days=2):
+            return None
+
+        bucket = settings.FORECAST_SEASON_BUCKET_MINUTES
+        slots = (series.index.as_unit("s").asi8 // 60) % (24 * 60) // bucket
+        profile = series.groupby(slots).mean() - series.mean()
+        season = np.zeros((24 * 60) // bucket)
+        season[profile.index.to_numpy()] = profile.to_numpy()
+        return season
+
+    def _prepare(self, timestamps, values):
+        season = self._seasonal_profile(timestamps, values)
+        if season is not None:
+            self.season = season.tolist()
+
+    @classmethod
+    def _fit_params(cls, timestamps, values):
+        # alpha, beta y phi se ajustan sobre la serie desestacionalizada
+        season = cls._seasonal_profile(timestamps, values)
+        if season is None:
+            params = HoltModel._fit_params(timestamps, values)
+            params["gamma"] = cls.default_params["gamma"]
+            return params
+
+        bucket = settings.FORECAST_SEASON_BUCKET_MINUTES
+        series = pd.Series(np.asarray(values, dtype=float), index=pd.to_datetime(timestamps, utc=True))
+        slots = (series.index.as_unit("s").asi8 // 60) % (24 * 60) // bucket
+        params = HoltModel._fit_params(timestamps, series.to_numpy() - season[slots])
+
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+        periods = len(season)
+        buckets = series.resample(f"{bucket}min").mean().interpolate()
+        fitted = ExponentialSmoothing(
+            buckets.to_numpy(),
+            trend="add",
+            damped_trend=True,
+            seasonal="add",
+            seasonal_periods=periods,
+            initialization_method="estimated"
+        ).fit()
+        # gamma se ajusta por franja; se reparte entre las lecturas que caen en cada franja
+        per_bucket = max(len(series) / len(buckets), 1.0)
+        gamma = float(fitted.params["smoothing_seasonal"])
+        params["gamma"] = 1.0 - math.pow(1.0 - gamma, 1.0 / per_bucket)
+        return params
+
+
+MODELOS_ONLINE = {
+    EWMAModel.nombre: EWMAModel,
+    HoltModel.nombre: HoltModel,
+    HoltWintersModel.nombre: HoltWintersModel,
+}
+
+
+def model_from_state(state: Dict[str, Any]) -> ForecastModel:
+    """Reconstruye un modelo a partir de su estado serializado"""
+    return MODELOS_ONLINE[state["modelo"]].from_state(state)
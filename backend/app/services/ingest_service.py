@@ -0,0 +1,308 @@
+import asyncio
+import contextlib
+import numpy as np
+from typing import AsyncContextManager, Callable, Dict, List, Any, Optional, Tuple
+from sqlalchemy import Row, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import shard_map
+from app.metrics import record_ingest
+from app.schemas.lectura import LecturaCreate
+from app.services.alert_service import AlertService
+from app.services.online_forecast_service import OnlineForecastService
+from app.services.registry_service import RegistryService
+from app.tracing import traced
+
+
+def _restricciones_lectura() -> Tuple[Dict[str, Tuple[float, float]], int]:
+    """Lee los rangos (ge/le) y el largo máximo de edificio desde LecturaCreate para no duplicarlos"""
+    rangos = {}
+    max_edificio = None
+    for name, field in LecturaCreate.model_fields.items():
+        ge = next((m.ge for m in field.metadata if hasattr(m, "ge")), None)
+        le = next((m.le for m in field.metadata if hasattr(m, "le")), None)
+        if ge is not None or le is not None:
+            rangos[name] = (ge if ge is not None else -np.inf, le if le is not None else np.inf)
+        if name == "edificio":
+            max_edificio = next((m.max_length for m in field.metadata if hasattr(m, "max_length")), None)
+    return rangos, max_edificio
+
+
+RANGOS_LECTURA, MAX_LARGO_EDIFICIO = _restricciones_lectura()
+CAMPOS_ENTEROS = {name for name, field in LecturaCreate.model_fields.items() if field.annotation is int}
+
+# Rango representable de timestamps (años 1970-9999) en milisegundos epoch
+TIMESTAMP_MS_MIN = 0
+TIMESTAMP_MS_MAX = 253402300799999
+
+# Inserción columnar: un arreglo por columna y una sola sentencia para todo el lote
+INSERT_LECTURAS = text("""
+    INSERT INTO lecturas (timestamp, edificio, piso, temp_c, humedad_pct, energia_kw)
+    SELECT timestamptz 'epoch' + u.timestamp_ms * interval '1 millisecond',
+           u.edificio, u.piso, u.temp_c, u.humedad_pct, u.energia_kw
+    FROM unnest(
+        CAST(:timestamp_ms AS bigint[]),
+        CAST(:edificio AS varchar[]),
+        CAST(:piso AS integer[]),
+        CAST(:temp_c AS float8[]),
+        CAST(:humedad_pct AS float8[]),
+        CAST(:energia_kw AS float8[])
+    ) AS u(timestamp_ms, edificio, piso, temp_c, humedad_pct, energia_kw)
+    ON CONFLICT ON CONSTRAINT unique_reading DO NOTHING
+    RETURNING id, timestamp, edificio, piso, temp_c, humedad_pct, energia_kw
+""")
+
+# Formato compacto (READINGS_COMPACT_LAYOUT): la vista lecturas solo admite el trigger fila a fila,
+# así que el lote va directo a lecturas_compactas. Los edificios nuevos se registran en la misma
+# sentencia (DO UPDATE para obtener también el id de uno que otra sesión acaba de insertar) y
+# RETURNING entrega las filas con la forma de la vista.
+INSERT_LECTURAS_COMPACTAS = text("""
+    WITH u AS (
+        SELECT timestamptz 'epoch' + u.timestamp_ms * interval '1 millisecond' AS timestamp,
+               u.edificio, u.piso, u.temp_c, u.humedad_pct, u.energia_kw
+        FROM unnest(
+            CAST(:timestamp_ms AS bigint[]),
+            CAST(:edificio AS varchar[]),
+            CAST(:piso AS integer[]),
+            CAST(:temp_c AS float8[]),
+            CAST(:humedad_pct AS float8[]),
+            CAST(:energia_kw AS float8[])
+        ) AS u(timestamp_ms, edificio, piso, temp_c, humedad_pct, energia_kw)
+    ),
+    nuevos AS (
+        INSERT INTO edificios (codigo)
+        SELECT DISTINCT u.edificio FROM u
+        WHERE NOT EXISTS (SELECT 1 FROM edificios e WHERE e.codigo = u.edificio)
+        ON CONFLICT (codigo) DO UPDATE SET codigo = EXCLUDED.codigo
+        RETURNING id, codigo
+    ),
+    codigos AS (
+        SELECT id, codigo FROM edificios
+        UNION ALL
+        SELECT id, codigo FROM nuevos
+    ),
+    insertadas AS (
+        INSERT INTO lecturas_compactas (timestamp, energia_kw, edificio_id, piso, temp_c, humedad_pct)
+        SELECT u.timestamp, round(u.energia_kw * 100), c.id, u.piso, round(u.temp_c * 100), round(u.humedad_pct * 100)
+        FROM u
+        JOIN codigos c ON c.codigo = u.edificio
+        ON CONFLICT ON CONSTRAINT lecturas_compactas_pkey DO NOTHING
+        RETURNING id, timestamp, edificio_id, piso, temp_c, humedad_pct, energia_kw
+    )
+    SELECT i.id, i.timestamp, c.codigo AS edificio, i.piso,
+           (i.temp_c / 100.0)::numeric(5, 2) AS temp_c,
+           (i.humedad_pct / 100.0)::numeric(5, 2) AS humedad_pct,
+           (i.energia_kw / 100.0)::numeric(8, 2) AS energia_kw
+    FROM insertadas i
+    JOIN codigos c ON c.id = i.edificio_id
+""")
+
+
+def normalize_edificios(values: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """Códigos de edificio sin espacios y en mayúsculas ("A" si vienen vacíos).
+
+    Un lote trae pocos edificios distintos: retorna los valores únicos normalizados
+    y, por fila, su posición en esa lista.
+    """
+    unique, inverse = np.unique(values, return_inverse=True)
+    nombres = [
+        (value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)).strip().upper() or "A"
+        for value in unique.tolist()
+    ]
+    return nombres, inverse
+
+
+def validate_readings(
+    columns: Dict[str, np.ndarray],
+    row_numbers: Optional[np.ndarray] = None
+) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """Valida en bloque las mismas restricciones que LecturaCreate; retorna las columnas válidas y los errores.
+
+    row_numbers permite informar los errores con la numeración del origen (p. ej. un
+    trabajo de importación procesado por partes); por defecto 1..n.
+    """
+    timestamp_ms = np.asarray(columns["timestamp_ms"], dtype=np.int64)
+    n = len(timestamp_ms)
+    valid = np.ones(n, dtype=bool)
+    errors = []
+    if row_numbers is None:
+        row_numbers = np.arange(1, n + 1)
+
+    def reject(mask: np.ndarray, message: str) -> None:
+        nonlocal valid
+        for i in np.flatnonzero(mask & valid):
+            errors.append(f"Lectura {row_numbers[i]}: {message}")
+        valid &= ~mask
+
+    reject((timestamp_ms < TIMESTAMP_MS_MIN) | (timestamp_ms > TIMESTAMP_MS_MAX), "timestamp fuera de rango")
+
+    nombres, inverse = normalize_edificios(columns["edificio"])
+    edificio = np.asarray(nombres, dtype=object)[inverse]
+    if MAX_LARGO_EDIFICIO is not None:
+        largos = np.array([len(nombre) for nombre in nombres], dtype=np.int64)
+        reject(largos[inverse] > MAX_LARGO_EDIFICIO, f"edificio supera {MAX_LARGO_EDIFICIO} caracteres")
+
+    values = {}
+    for name, (low, high) in RANGOS_LECTURA.items():
+        array = np.asarray(columns[name], dtype=np.float64)
+        # Las comparaciones con NaN son falsas: NaN queda rechazado igual que en Pydantic
+        reject(~((array >= low) & (array <= high)), f"{name} fuera de rango [{low}, {high}]")
+        if name in CAMPOS_ENTEROS:
+            reject(array != np.floor(array), f"{name} debe ser entero")
+        values[name] = array
+
+    clean = {
+        "timestamp_ms": timestamp_ms[valid],
+        "edificio": edificio[valid],
+        "piso": values["piso"][valid].astype(np.int64),
+        "temp_c": values["temp_c"][valid],
+        "humedad_pct": values["humedad_pct"][valid],
+        "energia_kw": values["energia_kw"][valid],
+    }
+    return clean, errors
+
+
+class IngestService:
+    """Servicio para insertar lotes de lecturas ya decodificados en arreglos"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.alert_service = AlertService(db)
+        self.forecast_service = OnlineForecastService(db)
+        self.registry = RegistryService(db)
+
+    @traced()
+    async def insert_columns(self, columns: Dict[str, np.ndarray]) -> List[Row]:
+        """Inserta columnas ya validadas con una sola sentencia; retorna las lecturas creadas.
+
+        Las filas de RETURNING exponen los mismos atributos que Lectura y se usan tal cual
+        en los modelos en línea y las alertas (sin construir instancias del ORM).
+        """
+        if len(columns["timestamp_ms"]) == 0:
+            return []
+
+        result = await self.db.execute(
+            INSERT_LECTURAS_COMPACTAS if settings.READINGS_COMPACT_LAYOUT else INSERT_LECTURAS,
+            {name: array.tolist() for name, array in columns.items()}
+        )
+        rows = result.all()
+        await self.db.commit()
+        return rows
+
+    async def process(self, lecturas: List[Row]) -> None:
+        """Registro de pisos, modelos en línea y alertas de lecturas ya confirmadas"""
+        await self.registry.register({(lectura.edificio, lectura.piso) for lectura in lecturas})
+        await self.forecast_service.observe_many(lecturas)
+        await self.alert_service.check_readings_alerts(lecturas)
+
+    @traced()
+    async def ingest_columns(
+        self,
+        columns: Dict[str, np.ndarray],
+        row_numbers: Optional[np.ndarray] = None,
+        source: str = "api",
+        deadline: Callable[[], AsyncContextManager] = contextlib.nullcontext
+    ) -> Dict[str, Any]:
+        """Valida, inserta y procesa (modelos en línea y alertas) un lote columnar.
+
+        source solo etiqueta las métricas de ingesta (api, line_protocol, job, spool_replay...).
+        deadline acota solo la inserción (el spool la usa para detectar una base lenta); un
+        error en el procesamiento posterior no deshace lecturas ya confirmadas: se informa
+        en error_details.
+        """
+        clean, errors = validate_readings(columns, row_numbers)
+        async with deadline():
+            lecturas = await self.insert_columns(clean)
+
+        duplicates = len(clean["timestamp_ms"]) - len(lecturas)
+        if duplicates:
+            errors.append(f"{duplicates} lectura(s) duplicada(s) omitida(s)")
+
+        if lecturas:
+            try:
+                await self.process(lecturas)
+            except Exception as e:
+                await self.db.rollback()
+                print(f"Error procesando lecturas ya guardadas: {e!r}")
+                errors.append(f"Lecturas guardadas, pero falló el procesamiento posterior: {e}")
+
+        rejected = len(columns["timestamp_ms"]) - len(lecturas)
+        record_ingest(source, len(lecturas), rejected)
+        return {
+            "created": len(lecturas),
+            "errors": rejected,
+            "created_ids": [lectura.id for lectura in lecturas],
+            "error_details": errors
+        }
+
+
+@traced()
+def split_by_shard(
+    columns: Dict[str, np.ndarray],
+    row_numbers: Optional[np.ndarray] = None
+) -> Dict[int, Tuple[Dict[str, np.ndarray], Optional[np.ndarray]]]:
+    """Partes de un lote por el shard del edificio de cada fila, con su numeración en el lote"""
+    n = len(columns["timestamp_ms"])
+    if not shard_map.enabled or n == 0:
+        return {0: (columns, row_numbers)}
+
+    if row_numbers is None:
+        row_numbers = np.arange(1, n + 1)
+    nombres, inverse = normalize_edificios(columns["edificio"])
+    por_fila = np.array([shard_map.index_for(nombre) for nombre in nombres], dtype=np.int64)[inverse]
+    partes = {}
+    for indice in np.unique(por_fila).tolist():
+        filas = np.flatnonzero(por_fila == indice)
+        partes[indice] = ({name: np.asarray(array)[filas] for name, array in columns.items()}, row_numbers[filas])
+    return partes
+
+
+async def ingest_part(
+    db: AsyncSession,
+    indice: int,
+    columns: Dict[str, np.ndarray],
+    row_numbers: Optional[np.ndarray] = None,
+    source: str = "api",
+    deadline: Callable[[], AsyncContextManager] = contextlib.nullcontext
+) -> Dict[str, Any]:
+    """Inserta la parte de un shard: en db si es el shard 0, si no en una sesión propia"""
+    if indice == 0:
+        return await IngestService(db).ingest_columns(columns, row_numbers, source=source, deadline=deadline)
+    async with shard_map.session_at(indice) as shard_db:
+        return await IngestService(shard_db).ingest_columns(columns, row_numbers, source=source, deadline=deadline)
+
+
+def merge_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combina los resúmenes de ingesta de varias partes de un lote"""
+    if len(results) == 1:
+        return results[0]
+    merged = {
+        "created": sum(result["created"] for result in results),
+        "errors": sum(result["errors"] for result in results),
+        "created_ids": [id_ for result in results for id_ in result["created_ids"]],
+        "error_details": [error for result in results for error in result["error_details"]]
+    }
+    spooled = sum(result.get("spooled", 0) for result in results)
+    if spooled:
+        merged["spooled"] = spooled
+    return merged
+
+
+async def ingest_sharded(
+    db: AsyncSession,
+    columns: Dict[str, np.ndarray],
+    row_numbers: Optional[np.ndarray] = None,
+    source: str = "api",
+    deadline: Callable[[], AsyncContextManager] = contextlib.nullcontext
+) -> Dict[str, Any]:
+    """Como IngestService.ingest_columns, pero reparte el lote por el shard de cada edificio.
+
+    Cada parte se valida, inserta y procesa en su shard en paralelo; db atiende la del
+    shard 0. Con un solo shard es exactamente ingest_columns sobre db.
+    """
+    partes = split_by_shard(columns, row_numbers)
+    results = await asyncio.gather(*(
+        ingest_part(db, indice, subset, filas, source=source, deadline=deadline)
+        for indice, (subset, filas) in partes.items()
+    ))
+    return merge_results(list(results))
@@ -0,0 +1,171 @@
+import asyncio
+import time
+import uuid
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.services.ingest_service import ingest_sharded
+from app.tracing import tracer
+
+
+# Máximo de mensajes de error guardados por trabajo (el contador sigue sumando)
+MAX_ERROR_DETAILS = 100
+
+ESTADOS_FINALES = ("completado", "completado_con_errores", "cancelado", "fallido")
+
+# Un bloque: columnas, errores previos a la validación y (opcional) número de fila en el origen
+Bloque = Tuple[Dict[str, np.ndarray], List[str], Optional[np.ndarray]]
+
+
+class JobQueueFull(Exception):
+    """La cola de trabajos alcanzó JOB_MAX_QUEUED"""
+
+
+class JobManager:
+    """Trabajos de ingesta en segundo plano (generación e importación) con un pool de workers.
+
+    Cada trabajo entrega bloques columnares que se insertan con la ruta de ingesta
+    en bloque; el progreso se actualiza por bloque y la cancelación se aplica entre
+    bloques (lo ya insertado se conserva). El estado vive en memoria del proceso,
+    igual que las corridas de entrenamiento.
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 100, history_size: int = 200):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.history_size = history_size
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._blocks: Dict[str, Iterator[Bloque]] = {}
+        # Traza del request que encoló cada trabajo (el worker corre fuera de ese contexto)
+        self._trace_contexts: Dict[str, Any] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def submit(self, tipo: str, total: int, blocks: Iterator[Bloque], parametros: Dict[str, Any]) -> Dict[str, Any]:
+        """Encola un trabajo y retorna su estado inicial"""
+        if self._queue is None:
+            self.start()
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"Hay {self.max_queued} trabajos en cola")
+
+        job_id = str(uuid.uuid4())
+        job = {
+            "job_id": job_id,
+            "tipo": tipo,
+            "estado": "en_cola",
+            "parametros": parametros,
+            "total": total,
+            "procesadas": 0,
+            "creadas": 0,
+            "errores": 0,
+            "error_details": [],
+            "filas_por_segundo": 0.0,
+            "created_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        self.jobs[job_id] = job
+        self._blocks[job_id] = blocks
+        self._trace_contexts[job_id] = tracer.current_context()
+        self._queue.put_nowait(job_id)
+        self._trim_history()
+        return job
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Marca un trabajo para cancelación (inmediata si aún está en cola)"""
+        job = self.jobs[job_id]
+        if job["estado"] == "en_cola":
+            self._finish(job, "cancelado")
+            self._blocks.pop(job_id, None)
+            self._trace_contexts.pop(job_id, None)
+        elif job["estado"] == "en_curso":
+            job["estado"] = "cancelando"
+        return job
+
+    def _trim_history(self) -> None:
+        """Descarta los trabajos terminados más antiguos por sobre history_size"""
+        excess = len(self.jobs) - self.history_size
+        for job_id in [job_id for job_id, job in self.jobs.items() if job["estado"] in ESTADOS_FINALES][:max(excess, 0)]:
+            del self.jobs[job_id]
+
+    def _finish(self, job: Dict[str, Any], estado: str) -> None:
+        job["estado"] = estado
+        job["finished_at"] = datetime.utcnow()
+
+    def _record_errors(self, job: Dict[str, Any], errors: List[str], count: int) -> None:
+        job["errores"] += count
+        room = MAX_ERROR_DETAILS - len(job["error_details"])
+        if room > 0:
+            job["error_details"].extend(errors[:room])
+
+    async def _run(self, job: Dict[str, Any], blocks: Iterator[Bloque]) -> None:
+        job["estado"] = "en_curso"
+        job["started_at"] = datetime.utcnow()
+        started = time.perf_counter()
+
+        try:
+            while True:
+                if job["estado"] == "cancelando":
+                    self._finish(job, "cancelado")
+                    return
+                # Preparar el bloque (CPU) fuera del event loop
+                block = await asyncio.to_thread(next, blocks, None)
+                if block is None:
+                    break
+                columns, errors, row_numbers = block
+
+                async with AsyncSessionLocal() as db:
+                    result = await ingest_sharded(
+                        db, columns, row_numbers, source=f"job_{job['tipo']}"
+                    )
+
+                job["procesadas"] += len(columns["timestamp_ms"]) + len(errors)
+                job["creadas"] += result["created"]
+                self._record_errors(job, errors + result["error_details"], len(errors) + result["errors"])
+                job["filas_por_segundo"] = round(job["procesadas"] / max(time.perf_counter() - started, 1e-9), 1)
+        except Exception as e:
+            job["error_details"].append(f"Error del trabajo: {str(e)}")
+            self._finish(job, "fallido")
+            return
+
+        self._finish(job, "completado" if not job["errores"] else "completado_con_errores")
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            blocks = self._blocks.pop(job_id, None)
+            trace_context = self._trace_contexts.pop(job_id, None)
+            job = self.jobs.get(job_id)
+            if job is not None and blocks is not None and job["estado"] == "en_cola":
+                with tracer.span(f"job {job['tipo']}", "consumer", trace_context, **{"job.id": job_id, "job.total": job["total"]}):
+                    await self._run(job, blocks)
+            self._queue.task_done()
+
+    def start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._queue = None
+        for job in self.jobs.values():
+            if job["estado"] not in ESTADOS_FINALES:
+                self._finish(job, "cancelado")
+
+
+job_manager = JobManager(
+    workers=settings.JOB_WORKERS,
+    max_queued=settings.JOB_MAX_QUEUED,
+    history_size=settings.JOB_HISTORY_SIZE
+)
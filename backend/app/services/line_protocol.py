@@ -0,0 +1,120 @@
+"""
+Parser del protocolo de líneas estilo InfluxDB para lecturas de sensores.
+
+Formato (una lectura por línea, timestamp opcional):
+
+    lectura,edificio=A,piso=2 temp_c=24.1,humedad_pct=55,energia_kw=12 1731405600000000000
+
+Las líneas solo se separan en tokens en Python; los valores numéricos se
+acumulan como bytes y se convierten a NumPy en bloque al final del lote.
+"""
+import time
+import numpy as np
+from typing import Dict, List, Tuple
+
+
+MEDICIONES = (b"lectura", b"lecturas")
+CAMPOS = (b"temp_c", b"humedad_pct", b"energia_kw")
+
+# Divisor para llevar el timestamp de la precisión indicada a milisegundos
+DIVISOR_MS = {"ns": 1_000_000, "us": 1_000, "ms": 1}
+
+INT64_MAX = np.iinfo(np.int64).max
+
+
+def _to_int64(value: bytes) -> int:
+    """Entero de un timestamp; -1 si no es numérico o no cabe en int64 (se rechaza al validar)"""
+    try:
+        parsed = int(value)
+    except ValueError:
+        return -1
+    return parsed if -INT64_MAX <= parsed <= INT64_MAX else -1
+
+
+def _to_float(values: List[bytes]) -> np.ndarray:
+    """Conversión en bloque; si algún valor es inválido se convierte uno a uno y queda como NaN"""
+    try:
+        return np.array(values, dtype=bytes).astype(np.float64)
+    except ValueError:
+        result = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            try:
+                result[i] = float(value)
+            except ValueError:
+                result[i] = np.nan
+        return result
+
+
+def _to_timestamp_ms(values: List[bytes], precision: str) -> np.ndarray:
+    """Timestamps enteros en la precisión indicada a epoch ms; los ausentes usan la hora actual"""
+    now_ms = int(time.time() * 1000)
+    if not values:
+        return np.empty(0, dtype=np.int64)
+
+    raw = np.array(values, dtype=bytes)
+    missing = raw == b""
+    raw[missing] = b"0"
+    try:
+        parsed = raw.astype(np.int64)
+    except (ValueError, OverflowError):
+        # Valor por valor: solo los inválidos quedan en -1, el resto del lote se conserva
+        parsed = np.array([_to_int64(v) for v in raw.tolist()], dtype=np.int64)
+
+    if precision == "s":
+        # Segundos que desbordarían int64 al pasar a ms
+        parsed[parsed > INT64_MAX // 1000] = -1
+        timestamp_ms = parsed * 1000
+    else:
+        timestamp_ms = parsed // DIVISOR_MS[precision]
+    timestamp_ms[missing] = now_ms
+    timestamp_ms[parsed < 0] = -1
+    return timestamp_ms
+
+
+def parse_lines(data: bytes, precision: str = "ns") -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """Convierte un bloque de líneas en columnas (mismo formato que la ingesta binaria) y errores"""
+    timestamps: List[bytes] = []
+    edificios: List[bytes] = []
+    pisos: List[bytes] = []
+    valores: Dict[bytes, List[bytes]] = {campo: [] for campo in CAMPOS}
+    errors: List[str] = []
+
+    for n, line in enumerate(data.split(b"\n")):
+        line = line.strip()
+        if not line or line.startswith(b"#"):
+            continue
+        try:
+            parts = line.split(b" ")
+            if len(parts) not in (2, 3):
+                raise ValueError("se esperaba 'medición,tags campos [timestamp]'")
+
+            key = parts[0].split(b",")
+            if key[0] not in MEDICIONES:
+                raise ValueError(f"medición desconocida {key[0].decode(errors='replace')}")
+            tags = dict(tag.split(b"=", 1) for tag in key[1:])
+            fields = dict(field.split(b"=", 1) for field in parts[1].split(b","))
+
+            row = [fields[campo].rstrip(b"i") for campo in CAMPOS]
+            piso = tags[b"piso"]
+        except KeyError as e:
+            errors.append(f"Línea {n + 1}: falta {e.args[0].decode(errors='replace')}")
+            continue
+        except ValueError as e:
+            errors.append(f"Línea {n + 1}: {e}")
+            continue
+
+        for campo, value in zip(CAMPOS, row):
+            valores[campo].append(value)
+        pisos.append(piso)
+        edificios.append(tags.get(b"edificio", b"A"))
+        timestamps.append(parts[2] if len(parts) == 3 else b"")
+
+    columns = {
+        "timestamp_ms": _to_timestamp_ms(timestamps, precision),
+        "edificio": np.array(edificios, dtype="S"),
+        "piso": _to_float(pisos),
+        **{campo.decode(): _to_float(valores[campo]) for campo in CAMPOS},
+    }
+    if not edificios:
+        columns["edificio"] = np.empty(0, dtype="S1")
+    return columns, errors
@@ -0,0 +1,220 @@
+"""
+Listener TCP/UDP para lecturas en protocolo de líneas (ver line_protocol.py).
+
+Las líneas recibidas se acumulan en un búfer y se insertan en micro-lotes
+(por tamaño o cada LINE_PROTOCOL_FLUSH_MS) con la misma ruta que la ingesta
+binaria: validación vectorizada, un INSERT por lote, modelos en línea y alertas
+(o el spool local si la base no está disponible).
+
+Se inicia junto a la API con LINE_PROTOCOL_ENABLED=True o como proceso propio:
+
+    python -m app.services.line_protocol_listener
+"""
+import asyncio
+from typing import Dict, List, Optional
+from app.config import settings
+from app.database import AsyncSessionLocal, async_engine
+from app.services.line_protocol import parse_lines
+from app.services.spool import ingest_or_spool, reading_spool, spool_replayer
+
+
+class _UDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener: "LineProtocolListener"):
+        self.listener = listener
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        # Cada datagrama trae líneas completas; sin cupo en el búfer se descarta (UDP no tiene contrapresión)
+        if not self.listener.accept(data):
+            self.listener.stats["datagramas_descartados"] += 1
+
+
+class LineProtocolListener:
+    """Recibe lecturas por TCP y UDP y las inserta en micro-lotes"""
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        tcp_port: Optional[int] = 8094,
+        udp_port: Optional[int] = 8094,
+        precision: str = "ns",
+        batch_size: int = 5000,
+        flush_ms: int = 200,
+        max_pending_lines: int = 100000
+    ):
+        self.host = host
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.precision = precision
+        self.batch_size = batch_size
+        self.flush_seconds = flush_ms / 1000
+        self.max_pending_lines = max_pending_lines
+
+        self._buffer: List[bytes] = []
+        self._pending_lines = 0
+        self._batch_ready = asyncio.Event()
+        self._tcp_server: Optional[asyncio.base_events.Server] = None
+        self._udp_transport: Optional[asyncio.DatagramTransport] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.stats: Dict[str, int] = {
+            "lineas_recibidas": 0,
+            "lecturas_insertadas": 0,
+            "lecturas_en_spool": 0,
+            "lineas_rechazadas": 0,
+            "lotes": 0,
+            "datagramas_descartados": 0,
+        }
+
+    def accept(self, chunk: bytes) -> bool:
+        """Agrega líneas completas al búfer; retorna False si el búfer está lleno"""
+        if self._pending_lines >= self.max_pending_lines:
+            return False
+        if not chunk.endswith(b"\n"):
+            chunk += b"\n"
+        lines = chunk.count(b"\n")
+        self._buffer.append(chunk)
+        self._pending_lines += lines
+        self.stats["lineas_recibidas"] += lines
+        if self._pending_lines >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        partial = b""
+        try:
+            while data := await reader.read(65536):
+                data = partial + data
+                cut = data.rfind(b"\n")
+                if cut < 0:
+                    partial = data
+                    continue
+                partial = data[cut + 1:]
+                # Contrapresión: con el búfer lleno se deja de leer del socket hasta el próximo lote
+                while not self.accept(data[:cut + 1]):
+                    await asyncio.sleep(self.flush_seconds)
+            if partial:
+                while not self.accept(partial):
+                    await asyncio.sleep(self.flush_seconds)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def flush(self) -> int:
+        """Inserta el contenido actual del búfer; retorna las lecturas insertadas"""
+        if not self._buffer:
+            return 0
+        chunks, lines = self._buffer, self._pending_lines
+        self._buffer = []
+        self._pending_lines = 0
+        self._batch_ready.clear()
+
+        columns = None
+        try:
+            columns, parse_errors = await asyncio.to_thread(parse_lines, b"".join(chunks), self.precision)
+            async with AsyncSessionLocal() as db:
+                result = await ingest_or_spool(db, columns, source="line_protocol")
+        except Exception as e:
+            # El lote no se pierde: va al spool (el replayer lo reintenta) o vuelve al inicio del búfer
+            if columns is None or not reading_spool.enabled:
+                self._requeue(chunks, lines)
+                raise
+            try:
+                result = await reading_spool.store(columns)
+            except Exception:
+                self._requeue(chunks, lines)
+                raise
+            print(f"Error insertando lote de protocolo de líneas, guardado en el spool: {e!r}")
+
+        errors = parse_errors + result["error_details"]
+        self.stats["lotes"] += 1
+        self.stats["lecturas_insertadas"] += result["created"]
+        self.stats["lecturas_en_spool"] += result.get("spooled", 0)
+        self.stats["lineas_rechazadas"] += len(parse_errors) + result["errors"]
+        if errors:
+            print(f"Protocolo de líneas: {len(errors)} error(es) en el lote, p. ej. {errors[0]}")
+        return result["created"]
+
+    def _requeue(self, chunks: List[bytes], lines: int) -> None:
+        self._buffer[:0] = chunks
+        self._pending_lines += lines
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error insertando lote de protocolo de líneas: {e}")
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.tcp_port is not None:
+            self._tcp_server = await asyncio.start_server(self._handle_tcp, self.host, self.tcp_port)
+        if self.udp_port is not None:
+            self._udp_transport, _ = await loop.create_datagram_endpoint(
+                lambda: _UDPProtocol(self),
+                local_addr=(self.host, self.udp_port)
+            )
+        self._stopping = False
+        self._flush_task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._tcp_server is not None:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+            self._tcp_server = None
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+            self._udp_transport = None
+        if self._flush_task is not None:
+            # Sin cancelar: el lote en curso termina y el ciclo sale después de un último flush
+            self._stopping = True
+            self._batch_ready.set()
+            await self._flush_task
+            self._flush_task = None
+        # Lo que haya quedado en el búfer (p. ej. un lote devuelto por un error)
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Error insertando el último lote de protocolo de líneas: {e!r}")
+
+
+line_protocol_listener = LineProtocolListener(
+    host=settings.LINE_PROTOCOL_HOST,
+    tcp_port=settings.LINE_PROTOCOL_TCP_PORT,
+    udp_port=settings.LINE_PROTOCOL_UDP_PORT,
+    precision=settings.LINE_PROTOCOL_PRECISION,
+    batch_size=settings.LINE_PROTOCOL_BATCH_SIZE,
+    flush_ms=settings.LINE_PROTOCOL_FLUSH_MS,
+    max_pending_lines=settings.LINE_PROTOCOL_MAX_PENDING_LINES
+)
+
+
+async def serve() -> None:
+    """Ejecuta solo el listener, sin la API HTTP"""
+    reading_spool.start()
+    spool_replayer.start()
+    await line_protocol_listener.start()
+    print(
+        f"Protocolo de líneas escuchando en {settings.LINE_PROTOCOL_HOST} "
+        f"(TCP {settings.LINE_PROTOCOL_TCP_PORT}, UDP {settings.LINE_PROTOCOL_UDP_PORT})"
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await line_protocol_listener.stop()
+        await spool_replayer.stop()
+        await reading_spool.stop()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import joblib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
+from app.config import settings
+from app.metrics import record_cache
+
+
+class ModelRegistry:
+    """Registro versionado en disco de modelos entrenados, con LRU en memoria de los cargados"""
+
+    def __init__(self, base_dir: str, cache_size: int = 16):
+        self.base_dir = base_dir
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str, int, int], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _floor_dir(self, modelo: str, edificio: str, piso: int) -> str:
+        return os.path.join(self.base_dir, modelo, f"{edificio}_{piso}")
+
+    def _manifest_path(self, modelo: str, edificio: str, piso: int) -> str:
+        return os.path.join(self._floor_dir(modelo, edificio, piso), "latest.json")
+
+    def latest(self, modelo: str, edificio: str, piso: int) -> Optional[Dict[str, Any]]:
+        """Metadatos de la última versión registrada, o None si el piso no tiene modelo"""
+        try:
+            with open(self._manifest_path(modelo, edificio, piso)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, modelo: str, edificio: str, piso: int, models: Dict[str, Any], metadata: Dict[str, Any]) -> int:
+        """Guarda una nueva versión y la marca como la última (escrituras atómicas)"""
+        floor_dir = self._floor_dir(modelo, edificio, piso)
+        os.makedirs(floor_dir, exist_ok=True)
+
+        with self._lock:
+            current = self.latest(modelo, edificio, piso)
+            version = (current["version"] + 1) if current else 1
+
+            path = os.path.join(floor_dir, f"v{version:04d}.joblib")
+            joblib.dump(models, path + ".tmp")
+            os.replace(path + ".tmp", path)
+
+            manifest = {
+                "modelo": modelo,
+                "edificio": edificio,
+                "piso": piso,
+                "version": version,
+                "trained_at": datetime.utcnow().isoformat(),
+                **metadata,
+            }
+            manifest_path = self._manifest_path(modelo, edificio, piso)
+            with open(manifest_path + ".tmp", "w") as f:
+                json.dump(manifest, f)
+            os.replace(manifest_path + ".tmp", manifest_path)
+
+        return version
+
+    def load(self, modelo: str, edificio: str, piso: int, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Carga una versión (por defecto la última) reutilizando los modelos ya cargados"""
+        if version is None:
+            manifest = self.latest(modelo, edificio, piso)
+            if manifest is None:
+                return None
+            version = manifest["version"]
+
+        key = (modelo, edificio, piso, version)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                record_cache("modelos_entrenados", True)
+                return self._cache[key]
+        record_cache("modelos_entrenados", False)
+
+        path = os.path.join(self._floor_dir(modelo, edificio, piso), f"v{version:04d}.joblib")
+        if not os.path.exists(path):
+            return None
+        models = joblib.load(path)
+
+        with self._lock:
+            self._cache[key] = models
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return models
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """Lista la última versión de cada modelo y piso registrados"""
+        entries = []
+        if not os.path.isdir(self.base_dir):
+            return entries
+
+        for modelo in sorted(os.listdir(self.base_dir)):
+            modelo_dir = os.path.join(self.base_dir, modelo)
+            if not os.path.isdir(modelo_dir):
+                continue
+            for floor in sorted(os.listdir(modelo_dir)):
+                manifest_path = os.path.join(modelo_dir, floor, "latest.json")
+                if os.path.exists(manifest_path):
+                    with open(manifest_path) as f:
+                        entries.append(json.load(f))
+        return entries
+
+
+model_registry = ModelRegistry(settings.MODEL_REGISTRY_DIR, settings.MODEL_REGISTRY_CACHE_SIZE)
@@ -0,0 +1,304 @@
+import asyncio
+import contextvars
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from app.config import settings
+from app.database import shard_map
+from app.metrics import record_cache
+from app.models.lectura import Lectura
+from app.models.estado_modelo import EstadoModelo
+from app.services.columnar import fetch_frame
+from app.services.forecasting import (
+    VARIABLES_PREDICCION,
+    MODELOS_ONLINE,
+    ForecastModel,
+    model_from_state
+)
+from app.tracing import traced
+
+
+# Modelos en memoria por (edificio, piso, modelo), con el updated_at de la fila de
+# estados_modelo de la que salieron. La tabla es la fuente de verdad: con varios
+# workers, una copia cuyo updated_at ya no coincide se vuelve a cargar
+Clave = Tuple[str, int, str]
+_modelos_cache: Dict[Clave, Tuple[datetime, Dict[str, ForecastModel]]] = {}
+_cache_lock = threading.Lock()
+
+# Ajustes iniciales en segundo plano (fuera de la ingesta); se guardan las tareas
+# para que el recolector no las descarte antes de terminar
+_ajustes_pendientes: Set[Clave] = set()
+_tareas: Set[asyncio.Task] = set()
+
+
+def schedule_fit(edificio: str, piso: int, modelo: str) -> None:
+    """Programa el ajuste inicial de un piso en segundo plano (una vez por clave y proceso)"""
+    key = (edificio, piso, modelo)
+    if key in _ajustes_pendientes:
+        return
+    _ajustes_pendientes.add(key)
+    # Contexto vacío: el ajuste no se suma a las sentencias ni a la traza del request en curso
+    task = asyncio.get_running_loop().create_task(_fit_in_background(key), context=contextvars.Context())
+    _tareas.add(task)
+    task.add_done_callback(_tareas.discard)
+
+
+async def _fit_in_background(key: Clave) -> None:
+    edificio, piso, modelo = key
+    try:
+        async with shard_map.session(edificio) as db:
+            await OnlineForecastService(db).fit(edificio, piso, modelo)
+    except Exception as e:
+        print(f"Error ajustando el modelo {modelo} del piso {edificio}/{piso}: {e!r}")
+    finally:
+        _ajustes_pendientes.discard(key)
+
+
+def _evict(keys: Iterable[Clave]) -> None:
+    with _cache_lock:
+        for key in keys:
+            _modelos_cache.pop(key, None)
+
+
+class OnlineForecastService:
+    """Servicio para mantener y evaluar los modelos de pronóstico en línea"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @traced()
+    async def load_models(
+        self,
+        keys: Sequence[Clave],
+        for_update: bool = False
+    ) -> Dict[Clave, Dict[str, ForecastModel]]:
+        """Modelos persistidos de varias claves: una consulta de versiones y otra solo para los desactualizados.
+
+        Las claves sin estado no aparecen en el resultado. Con for_update las filas quedan
+        bloqueadas hasta el commit, así los workers que observan el mismo piso se turnan.
+        """
+        if not keys:
+            return {}
+        clave = tuple_(EstadoModelo.edificio, EstadoModelo.piso, EstadoModelo.modelo)
+        query = select(EstadoModelo.edificio, EstadoModelo.piso, EstadoModelo.modelo, EstadoModelo.updated_at).where(
+            clave.in_(keys)
+        )
+        if for_update:
+            query = query.order_by(EstadoModelo.edificio, EstadoModelo.piso, EstadoModelo.modelo).with_for_update()
+        versions = {(edificio, piso, modelo): updated_at for edificio, piso, modelo, updated_at in (await self.db.execute(query)).all()}
+
+        stale = []
+        for key, updated_at in versions.items():
+            cached = _modelos_cache.get(key)
+            fresh = cached is not None and cached[0] == updated_at
+            record_cache("modelos_en_linea", fresh)
+            if not fresh:
+                stale.append(key)
+        _evict(key for key in keys if key not in versions)
+
+        if stale:
+            rows = await self.db.execute(
+                select(EstadoModelo.edificio, EstadoModelo.piso, EstadoModelo.modelo, EstadoModelo.estado, EstadoModelo.updated_at)
+                .where(clave.in_(stale))
+            )
+            with _cache_lock:
+                for edificio, piso, modelo, estado, updated_at in rows.all():
+                    models = {variable: model_from_state(state) for variable, state in estado.items()}
+                    _modelos_cache[(edificio, piso, modelo)] = (updated_at, models)
+
+        result = {}
+        for key in versions:
+            cached = _modelos_cache.get(key)
+            if cached is not None:
+                result[key] = cached[1]
+        return result
+
+    @traced()
+    async def get_models(
+        self,
+        edificio: str,
+        piso: int,
+        modelo: str,
+        fit_missing: bool = True
+    ) -> Optional[Dict[str, ForecastModel]]:
+        """Obtiene los modelos de un piso desde su estado persistido; sin estado, lo ajusta
+        (fit_missing) o programa el ajuste en segundo plano y retorna None"""
+        key = (edificio, piso, modelo)
+        models = (await self.load_models([key])).get(key)
+        if models is not None:
+            return models
+        if fit_missing:
+            return await self.fit(edificio, piso, modelo)
+        schedule_fit(edificio, piso, modelo)
+        return None
+
+    async def fit(self, edificio: str, piso: int, modelo: str) -> Optional[Dict[str, ForecastModel]]:
+        """Ajusta los parámetros sobre la ventana histórica y persiste el estado resultante.
+
+        Si otro proceso ya guardó un estado para el piso, se conserva ese (y se retorna).
+        """
+        cutoff_time = datetime.utcnow() - timedelta(hours=settings.FORECAST_FIT_WINDOW_HOURS)
+
+        df = await fetch_frame(
+            self.db,
+            {
+                "timestamp": Lectura.timestamp,
+                "temp_c": Lectura.temp_c,
+                "humedad_pct": Lectura.humedad_pct,
+                "energia_kw": Lectura.energia_kw,
+            },
+            Lectura.edificio == edificio,
+            Lectura.piso == piso,
+            Lectura.timestamp >= cutoff_time,
+            order_by=[Lectura.timestamp.asc()]
+        )
+
+        if df.empty:
+            return None
+
+        timestamps = pd.to_datetime(df["timestamp"], utc=True).to_numpy()
+        model_class = MODELOS_ONLINE[modelo]
+
+        # El ajuste con statsmodels es CPU: fuera del event loop
+        models = await asyncio.to_thread(lambda: {
+            variable: model_class.fit(timestamps, df[config["columna"]].to_numpy(dtype=float))
+            for variable, config in VARIABLES_PREDICCION.items()
+        })
+
+        key = (edificio, piso, modelo)
+        stmt = insert(EstadoModelo).values(self._row(key, models)).on_conflict_do_nothing(
+            constraint="unique_estado_modelo"
+        ).returning(EstadoModelo.updated_at)
+        updated_at = await self.db.scalar(stmt)
+        await self.db.commit()
+        if updated_at is None:
+            return (await self.load_models([key])).get(key)
+
+        with _cache_lock:
+            _modelos_cache[key] = (updated_at, models)
+        return models
+
+    @traced()
+    async def observe(self, lectura: Lectura) -> None:
+        """Actualiza en O(1) el estado de cada modelo en línea con una nueva lectura"""
+        await self.observe_many([lectura])
+
+    @traced()
+    async def observe_many(self, lecturas: List[Lectura]) -> None:
+        """Actualiza los modelos con un lote de lecturas: una consulta de estados y un upsert para todo el lote.
+
+        Los pisos sin estado se ajustan en segundo plano; sus lecturas ya quedan en la
+        ventana histórica de ese ajuste.
+        """
+        por_piso: Dict[Tuple[str, int], List[Lectura]] = {}
+        for lectura in lecturas:
+            por_piso.setdefault((lectura.edificio, lectura.piso), []).append(lectura)
+        keys = sorted(
+            (edificio, piso, modelo)
+            for edificio, piso in por_piso
+            for modelo in settings.ONLINE_FORECAST_MODELS
+        )
+        if not keys:
+            return
+
+        try:
+            models_by_key = await self.load_models(keys, for_update=True)
+            for key in keys:
+                if key not in models_by_key:
+                    schedule_fit(*key)
+
+            updated_models = {}
+            for key, models in models_by_key.items():
+                grupo = sorted(por_piso[key[:2]], key=lambda lectura: lectura.timestamp)
+                updated = False
+                for lectura in grupo:
+                    for variable, config in VARIABLES_PREDICCION.items():
+                        value = float(getattr(lectura, config["columna"]))
+                        updated = models[variable].update(lectura.timestamp, value) or updated
+                if updated:
+                    updated_models[key] = models
+
+            await self._save_many(updated_models)
+        except Exception as e:
+            await self.db.rollback()
+            # Los modelos en memoria pudieron avanzar sin persistirse: se recargan de la tabla
+            _evict(keys)
+            print(f"Error actualizando modelos en línea para {len(por_piso)} piso(s): {e}")
+
+    async def forecast(
+        self,
+        edificio: str,
+        piso: int,
+        modelo: str,
+        base_time: datetime,
+        horizon_minutes: int,
+        fit_missing: bool = False
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Evalúa el estado de los modelos: (valores, semiancho de banda) por variable y paso.
+
+        Sin estado guardado retorna None y el ajuste queda programado en segundo plano
+        (con fit_missing, se ajusta antes de evaluar).
+        """
+        models = await self.get_models(edificio, piso, modelo, fit_missing=fit_missing)
+        if models is None:
+            return None
+        return self.evaluate(models, base_time, horizon_minutes)
+
+    def evaluate(
+        self,
+        models: Dict[str, ForecastModel],
+        base_time: datetime,
+        horizon_minutes: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(valores, semiancho de banda) por variable y paso de modelos ya cargados"""
+        values = []
+        bands = []
+        for variable in VARIABLES_PREDICCION:
+            predicted, band = models[variable].forecast(base_time, horizon_minutes)
+            values.append(predicted)
+            bands.append(band)
+
+        return np.vstack(values), np.vstack(bands)
+
+    def _row(self, key: Clave, models: Dict[str, ForecastModel]) -> Dict[str, Any]:
+        edificio, piso, modelo = key
+        last_ts = max((m.last_ts for m in models.values() if m.last_ts is not None), default=None)
+        return {
+            "edificio": edificio,
+            "piso": piso,
+            "modelo": modelo,
+            "estado": {variable: model.to_state() for variable, model in models.items()},
+            "ultima_lectura": datetime.utcfromtimestamp(last_ts) if last_ts is not None else None,
+        }
+
+    async def _save_many(self, updated_models: Dict[Clave, Dict[str, ForecastModel]]) -> None:
+        """Persiste los estados de varios pisos con un solo upsert y confirma (libera los bloqueos)"""
+        if not updated_models:
+            await self.db.commit()
+            return
+
+        stmt = insert(EstadoModelo).values([self._row(key, models) for key, models in updated_models.items()])
+        stmt = stmt.on_conflict_do_update(
+            constraint="unique_estado_modelo",
+            set_={
+                "estado": stmt.excluded.estado,
+                "ultima_lectura": stmt.excluded.ultima_lectura,
+                # Distinto en cada escritura, aun dentro de la misma transacción
+                "updated_at": func.clock_timestamp()
+            }
+        ).returning(EstadoModelo.edificio, EstadoModelo.piso, EstadoModelo.modelo, EstadoModelo.updated_at)
+        versions = (await self.db.execute(stmt)).all()
+        await self.db.commit()
+
+        with _cache_lock:
+            for edificio, piso, modelo, updated_at in versions:
+                key = (edificio, piso, modelo)
+                cached = _modelos_cache.get(key)
+                # Otra sesión pudo recargar la clave mientras tanto: solo se actualiza la copia propia
+                if cached is not None and cached[1] is updated_models.get(key):
+                    _modelos_cache[key] = (updated_at, cached[1])
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Optional
+from app.config import settings
+from app.database import shard_map
+from app.services.prediction_service import PredictionService
+
+
+class PredictionScheduler:
+    """Regenera periódicamente las predicciones de todos los pisos en la tabla predicciones"""
+    
+    def __init__(self, interval_seconds: int = 60):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+    
+    async def run_once(self) -> int:
+        """Ejecuta una regeneración completa, en paralelo en cada shard con su propia sesión (y su lock)"""
+        return sum(await shard_map.gather(lambda db: PredictionService(db).precompute_all(), read=False))
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Error regenerando predicciones: {e}")
+            await asyncio.sleep(self.interval_seconds)
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+prediction_scheduler = PredictionScheduler(settings.PREDICTION_REFRESH_SECONDS)
@@ -1,134 +1,266 @@
+import asyncio
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, select, insert, text, tuple_
 from app.models.lectura import Lectura
+from app.models.prediccion import Prediccion
 from app.config import settings
+from app.metrics import record_cache
+from app.services.columnar import fetch_frame
+from app.services.forecasting import VARIABLES_PREDICCION, MODELOS_ONLINE
+from app.services.online_forecast_service import OnlineForecastService, schedule_fit
+from app.services.registry_service import RegistryService
+from app.services.trained_models import MODELOS_ENTRENADOS
+from app.services.model_registry import model_registry
+from app.tracing import traced
+
+
+MODELO_PROMEDIO_MOVIL = "promedio_movil"
+
+# Parámetros del promedio móvil
+VENTANA_PROMEDIO = 5
+FACTOR_CONFIANZA = 1.5
+PASO_MINUTOS = 1
+
+# Clave del advisory lock de Postgres para la regeneración periódica
+LOCK_PRECALCULO = 280001
 
 
 class PredictionService:
-    """Servicio para generar predicciones de temperatura y humedad"""
-    
-    def __init__(self, db: Session):
+    """Servicio para generar predicciones de temperatura, humedad y energía"""
+
+    def __init__(self, db: AsyncSession):
         self.db = db
-    
-    def get_historical_data(self, piso: int, hours: int = 4) -> pd.DataFrame:
+        self.variables = list(VARIABLES_PREDICCION.keys())
+        self.columnas = [VARIABLES_PREDICCION[v]["columna"] for v in self.variables]
+        self.columnas_historico = {
+            "timestamp": Lectura.timestamp,
+            **{columna: getattr(Lectura, columna) for columna in self.columnas}
+        }
+        # Límites físicos como vectores para recortar todas las variables a la vez
+        self.limite_inferior = np.array(
+            [VARIABLES_PREDICCION[v]["limites"][0] if VARIABLES_PREDICCION[v]["limites"][0] is not None else -np.inf
+             for v in self.variables]
+        )
+        self.limite_superior = np.array(
+            [VARIABLES_PREDICCION[v]["limites"][1] if VARIABLES_PREDICCION[v]["limites"][1] is not None else np.inf
+             for v in self.variables]
+        )
+
+    @traced()
+    async def get_historical_data(self, piso: int, hours: int = 4, edificio: str = "A") -> pd.DataFrame:
         """Obtiene datos históricos para un piso"""
         cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-        
-        readings = self.db.query(Lectura).filter(
+
+        df = await fetch_frame(
+            self.db,
+            self.columnas_historico,
+            Lectura.edificio == edificio,
             Lectura.piso == piso,
-            Lectura.timestamp >= cutoff_time
-        ).order_by(Lectura.timestamp.asc()).all()
-        
-        if not readings:
+            Lectura.timestamp >= cutoff_time,
+            order_by=[Lectura.timestamp.asc()]
+        )
+
+        if df.empty:
             return pd.DataFrame()
-        
-        data = {
-            "timestamp": [r.timestamp for r in readings],
-            "temp_c": [float(r.temp_c) for r in readings],
-            "humedad_pct": [float(r.humedad_pct) for r in readings],
-            "energia_kw": [float(r.energia_kw) for r in readings],
+
+        return df
+
+    @traced()
+    def forecast(
+        self,
+        df: pd.DataFrame,
+        horizon_minutes: int = 60,
+        base_time: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Pronostica todas las variables para todo el horizonte en una sola pasada vectorizada"""
+        base_time = base_time or datetime.utcnow()
+
+        if df.empty or len(df) < 2:
+            # Sin datos suficientes: valores óptimos según umbrales, sin tendencia
+            level = np.array([VARIABLES_PREDICCION[v]["default"] for v in self.variables])
+            trend = np.zeros(len(self.variables))
+            band = np.array([VARIABLES_PREDICCION[v]["banda"] for v in self.variables])
+        else:
+            # Promedio móvil de las últimas lecturas y tendencia de las dos últimas
+            values = df[self.columnas].to_numpy(dtype=float)
+            window = values[-VENTANA_PROMEDIO:]
+            level = window.mean(axis=0)
+            band = window.std(axis=0) * FACTOR_CONFIANZA
+            trend = (values[-1] - values[-2]) / 2.0
+
+        return self._project(level, trend, band, horizon_minutes, base_time)
+
+    @traced()
+    async def get_historical_data_many(
+        self,
+        pisos: Optional[List[int]] = None,
+        edificios: Optional[List[str]] = None,
+        hours: int = 4
+    ) -> pd.DataFrame:
+        """Obtiene en una sola consulta el histórico de varios pisos y edificios"""
+        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+
+        criteria = [Lectura.timestamp >= cutoff_time]
+        if pisos:
+            criteria.append(Lectura.piso.in_(pisos))
+        if edificios:
+            criteria.append(Lectura.edificio.in_(edificios))
+
+        return await fetch_frame(
+            self.db,
+            {"edificio": Lectura.edificio, "piso": Lectura.piso, **self.columnas_historico},
+            *criteria,
+            order_by=[Lectura.edificio, Lectura.piso, Lectura.timestamp]
+        )
+
+    @traced()
+    def forecast_many(
+        self,
+        df: pd.DataFrame,
+        targets: List[Tuple[str, int]],
+        horizon_minutes: int = 60,
+        base_time: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Pronostica varios pisos en una sola pasada vectorizada (pisos x variables x pasos)"""
+        base_time = base_time or datetime.utcnow()
+        n_targets = len(targets)
+
+        # Valores por defecto para pisos sin datos suficientes
+        level = np.tile([VARIABLES_PREDICCION[v]["default"] for v in self.variables], (n_targets, 1)).astype(float)
+        band = np.tile([VARIABLES_PREDICCION[v]["banda"] for v in self.variables], (n_targets, 1)).astype(float)
+        trend = np.zeros((n_targets, len(self.variables)))
+
+        if not df.empty and n_targets:
+            keys = ["edificio", "piso"]
+            groups = df.groupby(keys, sort=False)
+            window = groups.tail(VENTANA_PROMEDIO).groupby(keys, sort=False)[self.columnas]
+            last_two = groups.tail(2).groupby(keys, sort=False)[self.columnas]
+
+            index = pd.MultiIndex.from_tuples(targets, names=keys)
+            valid = groups.size().reindex(index, fill_value=0).to_numpy() >= 2
+            level[valid] = window.mean().reindex(index).to_numpy()[valid]
+            band[valid] = window.std(ddof=0).reindex(index).to_numpy()[valid] * FACTOR_CONFIANZA
+            trend[valid] = ((last_two.last() - last_two.first()) / 2.0).reindex(index).to_numpy()[valid]
+
+        steps = np.arange(1, horizon_minutes + 1, dtype=float)
+        predicted = level[:, :, None] + trend[:, :, None] * steps / 60.0
+        band = np.broadcast_to(band[:, :, None], predicted.shape)
+
+        return self._package_many(predicted, band, horizon_minutes, base_time)
+
+    def _project(
+        self,
+        level: np.ndarray,
+        trend: np.ndarray,
+        band: np.ndarray,
+        horizon_minutes: int,
+        base_time: datetime
+    ) -> Dict[str, Any]:
+        """Proyecta nivel + tendencia a todos los pasos del horizonte (variables x pasos)"""
+        steps = np.arange(1, horizon_minutes + 1, dtype=float)
+        predicted = level[:, None] + trend[:, None] * steps[None, :] / 60.0
+        band = np.broadcast_to(band[:, None], predicted.shape)
+
+        return self._package(predicted, band, horizon_minutes, base_time)
+
+    def _package(
+        self,
+        predicted: np.ndarray,
+        band: np.ndarray,
+        horizon_minutes: int,
+        base_time: datetime
+    ) -> Dict[str, Any]:
+        """Aplica límites físicos y redondeo a una matriz de pronósticos (variables x pasos)"""
+        return self._package_many(predicted[None], band[None], horizon_minutes, base_time)[0]
+
+    def _package_many(
+        self,
+        predicted: np.ndarray,
+        band: np.ndarray,
+        horizon_minutes: int,
+        base_time: datetime
+    ) -> List[Dict[str, Any]]:
+        """Aplica límites físicos y redondeo a un bloque de pronósticos (pisos x variables x pasos)"""
+        low, high = self.limite_inferior[:, None], self.limite_superior[:, None]
+        predicted = np.clip(predicted, low, high)
+        lower = np.round(np.clip(predicted - band, low, high), 2)
+        upper = np.round(np.clip(predicted + band, low, high), 2)
+        predicted = np.round(predicted, 2)
+
+        return [
+            {
+                "base_time": base_time,
+                "step_minutes": PASO_MINUTOS,
+                "horizon": horizon_minutes,
+                "variables": {
+                    variable: {
+                        "values": predicted[g, i],
+                        "lower": lower[g, i],
+                        "upper": upper[g, i],
+                    }
+                    for i, variable in enumerate(self.variables)
+                }
+            }
+            for g in range(predicted.shape[0])
+        ]
+
+    def _timestamps(self, forecast: Dict[str, Any]) -> List[str]:
+        """Genera los timestamps ISO del horizonte sin iterar en Python"""
+        start = np.datetime64(forecast["base_time"].replace(tzinfo=None), "us")
+        offsets = np.arange(1, forecast["horizon"] + 1) * np.timedelta64(forecast["step_minutes"], "m")
+        return np.datetime_as_string(start + offsets, unit="us").tolist()
+
+    def to_points(self, forecast: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """Convierte un pronóstico al formato de puntos (un objeto por minuto)"""
+        timestamps = self._timestamps(forecast)
+        points = {}
+
+        for variable, serie in forecast["variables"].items():
+            points[variable] = [
+                {"timestamp": ts, "value": value, "confidence_interval": [low, high]}
+                for ts, value, low, high in zip(
+                    timestamps,
+                    serie["values"].tolist(),
+                    serie["lower"].tolist(),
+                    serie["upper"].tolist()
+                )
+            ]
+
+        return points
+
+    def to_compact(self, forecast: Dict[str, Any]) -> Dict[str, Any]:
+        """Convierte un pronóstico al formato compacto (inicio, paso y arreglos paralelos).
+
+        Las series quedan como arreglos NumPy: ORJSONResponse los serializa sin convertirlos a listas.
+        """
+        start = forecast["base_time"] + timedelta(minutes=forecast["step_minutes"])
+
+        return {
+            "start": start.isoformat(),
+            "step_seconds": forecast["step_minutes"] * 60,
+            "length": forecast["horizon"],
+            "series": {
+                variable: {
+                    "values": serie["values"],
+                    "lower": serie["lower"],
+                    "upper": serie["upper"],
+                }
+                for variable, serie in forecast["variables"].items()
+            }
         }
-        
-        return pd.DataFrame(data)
-    
+
     def predict_temperature(self, df: pd.DataFrame, horizon_minutes: int = 60) -> List[Dict[str, Any]]:
         """Predice temperatura usando promedio móvil simple"""
-        if df.empty or len(df) < 2:
-            # Si no hay datos, retornar predicción basada en valor óptimo
-            last_temp = 24.0  # Temperatura óptima según umbrales (<26°C)
-            predictions = []
-            base_time = datetime.utcnow()
-            for i in range(horizon_minutes):
-                pred_time = base_time + timedelta(minutes=i+1)
-                predictions.append({
-                    "timestamp": pred_time.isoformat(),
-                    "value": last_temp,
-                    "confidence_interval": [last_temp - 1.0, last_temp + 1.0]
-                })
-            return predictions
-        
-        # Usar promedio móvil de las últimas 5 lecturas
-        window_size = min(5, len(df))
-        last_temps = df["temp_c"].tail(window_size).values
-        avg_temp = np.mean(last_temps)
-        std_temp = np.std(last_temps) if len(last_temps) > 1 else 1.0
-        
-        # Calcular tendencia
-        if len(df) >= 2:
-            trend = (df["temp_c"].iloc[-1] - df["temp_c"].iloc[-2]) / 2.0
-        else:
-            trend = 0.0
-        
-        predictions = []
-        base_time = datetime.utcnow()
-        
-        for i in range(horizon_minutes):
-            pred_time = base_time + timedelta(minutes=i+1)
-            # Predicción con ligera tendencia
-            pred_value = avg_temp + (trend * (i + 1) / 60.0)
-            confidence_range = std_temp * 1.5
-            
-            predictions.append({
-                "timestamp": pred_time.isoformat(),
-                "value": round(pred_value, 2),
-                "confidence_interval": [
-                    round(pred_value - confidence_range, 2),
-                    round(pred_value + confidence_range, 2)
-                ]
-            })
-        
-        return predictions
-    
+        return self.to_points(self.forecast(df, horizon_minutes))["temperatura"]
+
     def predict_humidity(self, df: pd.DataFrame, horizon_minutes: int = 60) -> List[Dict[str, Any]]:
         """Predice humedad usando promedio móvil simple"""
-        if df.empty or len(df) < 2:
-            last_humidity = 55.0  # Humedad óptima (centro del rango 50-60%, según umbrales OK: 25-70%)
-            predictions = []
-            base_time = datetime.utcnow()
-            for i in range(horizon_minutes):
-                pred_time = base_time + timedelta(minutes=i+1)
-                predictions.append({
-                    "timestamp": pred_time.isoformat(),
-                    "value": last_humidity,
-                    "confidence_interval": [last_humidity - 5.0, last_humidity + 5.0]
-                })
-            return predictions
-        
-        window_size = min(5, len(df))
-        last_humidity = df["humedad_pct"].tail(window_size).values
-        avg_humidity = np.mean(last_humidity)
-        std_humidity = np.std(last_humidity) if len(last_humidity) > 1 else 5.0
-        
-        if len(df) >= 2:
-            trend = (df["humedad_pct"].iloc[-1] - df["humedad_pct"].iloc[-2]) / 2.0
-        else:
-            trend = 0.0
-        
-        predictions = []
-        base_time = datetime.utcnow()
-        
-        for i in range(horizon_minutes):
-            pred_time = base_time + timedelta(minutes=i+1)
-            pred_value = avg_humidity + (trend * (i + 1) / 60.0)
-            # Limitar entre 0 y 100
-            pred_value = max(0, min(100, pred_value))
-            confidence_range = std_humidity * 1.5
-            
-            predictions.append({
-                "timestamp": pred_time.isoformat(),
-                "value": round(pred_value, 2),
-                "confidence_interval": [
-                    round(max(0, pred_value - confidence_range), 2),
-                    round(min(100, pred_value + confidence_range), 2)
-                ]
-            })
-        
-        return predictions
-    
+        return self.to_points(self.forecast(df, horizon_minutes))["humedad"]
+
     def calculate_thermal_risk(self, temp_pred: float, energia_actual: float) -> str:
         """Calcula riesgo térmico combinado basado en los umbrales actuales"""
         # Temperatura: Crítica >=29.5, Media 28.0-29.4, Informativa 26.0-27.9, OK <26.0
@@ -141,27 +273,437 @@ class PredictionService:
             return "bajo"
         else:
             return "normal"
-    
-    def generate_predictions(self, piso: int, horizon_minutes: int = 60) -> Dict[str, Any]:
-        """Genera todas las predicciones para un piso"""
-        df = self.get_historical_data(piso, hours=settings.PREDICTION_WINDOW_HOURS)
-        
-        temp_predictions = self.predict_temperature(df, horizon_minutes)
-        humidity_predictions = self.predict_humidity(df, horizon_minutes)
-        
-        # Calcular riesgo térmico basado en última lectura
-        if not df.empty:
-            last_energia = float(df["energia_kw"].iloc[-1])
-            first_temp_pred = temp_predictions[0]["value"] if temp_predictions else 24.0
-        else:
-            last_energia = 12.0  # Valor por defecto OK (<15kW)
-            first_temp_pred = 24.0  # Temperatura óptima
-        
-        riesgo_termico = self.calculate_thermal_risk(first_temp_pred, last_energia)
-        
+
+    @traced()
+    async def forecast_online(
+        self,
+        piso: int,
+        modelo: str,
+        horizon_minutes: int = 60,
+        edificio: str = "A",
+        base_time: Optional[datetime] = None,
+        fit_missing: bool = False
+    ) -> Dict[str, Any]:
+        """Pronostica evaluando el estado de un modelo en línea, sin consultar el histórico.
+
+        Un piso sin estado usa el promedio móvil (marcado en "modelo") mientras su ajuste
+        corre en segundo plano; con fit_missing se ajusta antes (planificador).
+        """
+        base_time = base_time or datetime.utcnow()
+        result = await OnlineForecastService(self.db).forecast(
+            edificio, piso, modelo, base_time, horizon_minutes, fit_missing=fit_missing
+        )
+
+        if result is None:
+            df = await self.get_historical_data(piso, hours=settings.PREDICTION_WINDOW_HOURS, edificio=edificio)
+            return {**self.forecast(df, horizon_minutes, base_time), "modelo": MODELO_PROMEDIO_MOVIL}
+
+        predicted, band = result
+        return self._package(predicted, band, horizon_minutes, base_time)
+
+    @traced()
+    async def forecast_trained(
+        self,
+        piso: int,
+        modelo: str,
+        horizon_minutes: int = 60,
+        edificio: str = "A",
+        base_time: Optional[datetime] = None,
+        df: Optional[pd.DataFrame] = None
+    ) -> Dict[str, Any]:
+        """Pronostica con un modelo entrenado del registro, condicionado en la ventana reciente"""
+        base_time = base_time or datetime.utcnow()
+        models = await asyncio.to_thread(model_registry.load, modelo, edificio, piso)
+        if models is None:
+            raise ValueError(f"El modelo {modelo} no está entrenado para el piso {piso}")
+
+        if df is None:
+            df = await self.get_historical_data(piso, hours=settings.PREDICTION_WINDOW_HOURS, edificio=edificio)
+        if df.empty:
+            return self.forecast(df, horizon_minutes, base_time)
+
+        # La inferencia (filtro de Kalman, árboles) es CPU: fuera del event loop
+        return await asyncio.to_thread(self._forecast_with_models, models, df, horizon_minutes, base_time)
+
+    def _forecast_with_models(
+        self,
+        models: Dict[str, Any],
+        df: pd.DataFrame,
+        horizon_minutes: int,
+        base_time: datetime
+    ) -> Dict[str, Any]:
+        """Evalúa los modelos entrenados de cada variable sobre la ventana reciente"""
+        timestamps = pd.to_datetime(df["timestamp"], utc=True).to_numpy()
+        values = []
+        bands = []
+        for variable, columna in zip(self.variables, self.columnas):
+            predicted, band = models[variable].forecast(
+                base_time, horizon_minutes, timestamps, df[columna].to_numpy(dtype=float)
+            )
+            values.append(predicted)
+            bands.append(band)
+
+        return self._package(np.vstack(values), np.vstack(bands), horizon_minutes, base_time)
+
+    @traced()
+    async def compute_forecast(
+        self,
+        piso: int,
+        modelo: str,
+        horizon_minutes: int,
+        base_time: Optional[datetime] = None,
+        edificio: str = "A",
+        fit_missing: bool = False
+    ) -> Dict[str, Any]:
+        """Calcula un pronóstico con el modelo indicado (fit_missing: ver forecast_online)"""
+        if modelo in MODELOS_ONLINE:
+            return await self.forecast_online(piso, modelo, horizon_minutes, edificio, base_time, fit_missing)
+        if modelo in MODELOS_ENTRENADOS:
+            return await self.forecast_trained(piso, modelo, horizon_minutes, edificio, base_time)
+
+        df = await self.get_historical_data(piso, hours=settings.PREDICTION_WINDOW_HOURS, edificio=edificio)
+        return self.forecast(df, horizon_minutes, base_time)
+
+    @traced()
+    async def store_forecast(self, piso: int, modelo: str, forecast: Dict[str, Any], edificio: str = "A") -> int:
+        """Guarda un pronóstico en la tabla predicciones con una sola inserción masiva"""
+        base_time = forecast["base_time"]
+        timestamps = [
+            base_time + timedelta(minutes=forecast["step_minutes"] * (i + 1))
+            for i in range(forecast["horizon"])
+        ]
+
+        rows = []
+        for variable, serie in forecast["variables"].items():
+            rows.extend(
+                {
+                    "timestamp_generacion": base_time,
+                    "timestamp_prediccion": ts,
+                    "edificio": edificio,
+                    "piso": piso,
+                    "variable": variable,
+                    "valor_predicho": value,
+                    "intervalo_confianza_min": low,
+                    "intervalo_confianza_max": high,
+                    "modelo": modelo,
+                }
+                for ts, value, low, high in zip(
+                    timestamps,
+                    serie["values"].tolist(),
+                    serie["lower"].tolist(),
+                    serie["upper"].tolist()
+                )
+            )
+
+        if rows:
+            await self.db.execute(insert(Prediccion), rows)
+            await self.delete_old_runs(piso, modelo, edificio)
+            await self.db.commit()
+        return len(rows)
+
+    async def delete_old_runs(self, piso: int, modelo: str, edificio: str = "A") -> None:
+        """Borra las corridas de un piso y modelo anteriores a las últimas PREDICTION_RUNS_KEPT (sin commit)"""
+        corrida_limite = (
+            select(Prediccion.timestamp_generacion)
+            .where(Prediccion.edificio == edificio, Prediccion.piso == piso, Prediccion.modelo == modelo)
+            .distinct()
+            .order_by(Prediccion.timestamp_generacion.desc())
+            .offset(max(settings.PREDICTION_RUNS_KEPT, 1) - 1)
+            .limit(1)
+            .scalar_subquery()
+        )
+        # Con menos corridas que el límite la subconsulta es NULL y no se borra nada
+        await self.db.execute(
+            delete(Prediccion).where(
+                Prediccion.edificio == edificio,
+                Prediccion.piso == piso,
+                Prediccion.modelo == modelo,
+                Prediccion.timestamp_generacion < corrida_limite
+            )
+        )
+
+    @traced()
+    async def get_latest_forecast(
+        self,
+        piso: int,
+        modelo: str,
+        horizon_minutes: int,
+        edificio: str = "A"
+    ) -> Optional[Dict[str, Any]]:
+        """Obtiene la última corrida precalculada si está vigente y cubre el horizonte pedido"""
+        forecasts = await self.get_latest_forecasts([(edificio, piso)], modelo, horizon_minutes)
+        return forecasts.get((edificio, piso))
+
+    @traced()
+    async def get_latest_forecasts(
+        self,
+        targets: List[Tuple[str, int]],
+        modelo: str,
+        horizon_minutes: int
+    ) -> Dict[Tuple[str, int], Dict[str, Any]]:
+        """Últimas corridas precalculadas vigentes de varios pisos, con una sola consulta.
+
+        Los pisos sin corrida vigente, o cuya corrida no cubre el horizonte, no aparecen.
+        """
+        if not targets:
+            return {}
+        now = datetime.utcnow()
+        latest_runs = select(
+            Prediccion.edificio,
+            Prediccion.piso,
+            func.max(Prediccion.timestamp_generacion)
+        ).where(
+            Prediccion.modelo == modelo,
+            tuple_(Prediccion.edificio, Prediccion.piso).in_(targets),
+            Prediccion.timestamp_generacion >= now - timedelta(seconds=settings.PREDICTION_MAX_AGE_SECONDS)
+        ).group_by(Prediccion.edificio, Prediccion.piso)
+
+        df = await fetch_frame(
+            self.db,
+            {
+                "edificio": Prediccion.edificio,
+                "piso": Prediccion.piso,
+                "generacion": Prediccion.timestamp_generacion,
+                "variable": Prediccion.variable,
+                "value": Prediccion.valor_predicho,
+                "lower": Prediccion.intervalo_confianza_min,
+                "upper": Prediccion.intervalo_confianza_max,
+            },
+            Prediccion.modelo == modelo,
+            tuple_(Prediccion.edificio, Prediccion.piso, Prediccion.timestamp_generacion).in_(latest_runs),
+            order_by=[Prediccion.edificio, Prediccion.piso, Prediccion.variable, Prediccion.timestamp_prediccion]
+        )
+
+        forecasts = {}
+        for (edificio, piso), run in df.groupby(["edificio", "piso"], sort=False):
+            forecast = self._run_window(run, now, horizon_minutes)
+            if forecast is not None:
+                forecasts[(edificio, int(piso))] = forecast
+        return forecasts
+
+    def _run_window(self, run: pd.DataFrame, now: datetime, horizon_minutes: int) -> Optional[Dict[str, Any]]:
+        """Recorta una corrida a los pasos desde ahora; None si no cubre el horizonte"""
+        generacion = pd.Timestamp(run["generacion"].iloc[0]).tz_convert(None).to_pydatetime()
+
+        # Descartar los pasos que ya quedaron en el pasado
+        elapsed_steps = int((now - generacion).total_seconds() // (60 * PASO_MINUTOS))
+        variables = {}
+        for variable in self.variables:
+            serie = run[run["variable"] == variable]
+            if len(serie) - elapsed_steps < horizon_minutes:
+                return None
+            window = slice(elapsed_steps, elapsed_steps + horizon_minutes)
+            variables[variable] = {
+                "values": serie["value"].to_numpy(dtype=float)[window],
+                "lower": serie["lower"].to_numpy(dtype=float)[window],
+                "upper": serie["upper"].to_numpy(dtype=float)[window],
+            }
+
+        return {
+            "base_time": generacion + timedelta(minutes=elapsed_steps * PASO_MINUTOS),
+            "step_minutes": PASO_MINUTOS,
+            "horizon": horizon_minutes,
+            "variables": variables,
+        }
+
+    async def precompute(
+        self,
+        piso: int,
+        modelo: str,
+        horizon_minutes: Optional[int] = None,
+        edificio: str = "A",
+        fit_missing: bool = False
+    ) -> Dict[str, Any]:
+        """Calcula y guarda una corrida completa de predicciones para un piso.
+
+        Un pronóstico de respaldo (promedio móvil de un modelo en línea aún sin ajustar)
+        no se guarda como corrida del modelo pedido.
+        """
+        horizon_minutes = horizon_minutes or settings.PREDICTION_PRECOMPUTE_HORIZON_MINUTES
+        forecast = await self.compute_forecast(piso, modelo, horizon_minutes, edificio=edificio, fit_missing=fit_missing)
+        if forecast.get("modelo", modelo) == modelo:
+            await self.store_forecast(piso, modelo, forecast, edificio)
+        return forecast
+
+    @traced()
+    async def precompute_all(self, modelo: Optional[str] = None) -> int:
+        """Regenera las predicciones de todos los pisos registrados; solo un proceso a la vez"""
+        modelo = modelo or settings.PREDICTION_MODEL
+
+        # Con varios workers, solo quien obtiene el lock regenera en este ciclo. El lock
+        # es de sesión: se toma en una conexión propia porque la sesión ORM devuelve la
+        # suya al pool en cada commit y el unlock podría ir a otra conexión. Va en la
+        # base del shard de la sesión: cada shard regenera sus pisos bajo su propio lock.
+        async with self.db.bind.connect() as lock_conn:
+            acquired = await lock_conn.scalar(
+                text("SELECT pg_try_advisory_lock(:key)"),
+                {"key": LOCK_PRECALCULO}
+            )
+            if not acquired:
+                return 0
+
+            try:
+                pisos = await RegistryService(self.db).floors()
+                for edificio, piso in pisos:
+                    await self.precompute(piso, modelo, edificio=edificio, fit_missing=True)
+
+                # Corridas que ya nadie regenera (otro modelo, pisos desactivados)
+                cutoff_time = datetime.utcnow() - timedelta(hours=settings.PREDICTION_RETENTION_HOURS)
+                await self.db.execute(delete(Prediccion).where(Prediccion.timestamp_generacion < cutoff_time))
+                await self.db.commit()
+            finally:
+                await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_PRECALCULO})
+                await lock_conn.commit()
+        return len(pisos)
+
+    def _slice(self, forecast: Dict[str, Any], horizon_minutes: int) -> Dict[str, Any]:
+        """Recorta un pronóstico a los primeros pasos del horizonte"""
         return {
-            "temperatura": temp_predictions,
-            "humedad": humidity_predictions,
-            "riesgo_termico": riesgo_termico
+            **forecast,
+            "horizon": horizon_minutes,
+            "variables": {
+                variable: {key: values[:horizon_minutes] for key, values in serie.items()}
+                for variable, serie in forecast["variables"].items()
+            }
         }
 
+    @traced()
+    async def generate_predictions(
+        self,
+        piso: int,
+        horizon_minutes: int = 60,
+        formato: str = "points",
+        modelo: Optional[str] = None,
+        edificio: str = "A"
+    ) -> Dict[str, Any]:
+        """Genera todas las predicciones para un piso (última corrida precalculada o cálculo en línea)"""
+        modelo = modelo or settings.PREDICTION_MODEL
+
+        forecast = await self.get_latest_forecast(piso, modelo, horizon_minutes, edificio)
+        record_cache("predicciones", forecast is not None)
+        if forecast is None:
+            # Corrida vencida o inexistente: calcular, guardar para próximas lecturas y recortar
+            precompute_horizon = max(horizon_minutes, settings.PREDICTION_PRECOMPUTE_HORIZON_MINUTES)
+            forecast = self._slice(await self.precompute(piso, modelo, precompute_horizon, edificio), horizon_minutes)
+
+        # Riesgo térmico según la predicción inmediata de temperatura y energía
+        first_temp_pred = float(forecast["variables"]["temperatura"]["values"][0]) if horizon_minutes else 24.0
+        first_energia_pred = float(forecast["variables"]["energia"]["values"][0]) if horizon_minutes else 12.0
+        riesgo_termico = self.calculate_thermal_risk(first_temp_pred, first_energia_pred)
+
+        if formato == "compact":
+            predictions = self.to_compact(forecast)
+        else:
+            predictions = self.to_points(forecast)
+        predictions["riesgo_termico"] = riesgo_termico
+        predictions["modelo"] = forecast.get("modelo", modelo)
+
+        return predictions
+
+    async def _targets(
+        self,
+        pisos: Optional[List[int]],
+        edificios: Optional[List[str]]
+    ) -> List[Tuple[str, int]]:
+        """Pisos a pronosticar: los pedidos explícitamente o los activos del registro (de los edificios pedidos)"""
+        if pisos and edificios:
+            return [(edificio, piso) for edificio in edificios for piso in pisos]
+        registry = RegistryService(self.db)
+        if edificios and len(edificios) == 1:
+            targets = await registry.floors(edificios[0])
+        else:
+            targets = await registry.floors()
+            if edificios:
+                targets = [target for target in targets if target[0] in edificios]
+        if pisos:
+            targets = [target for target in targets if target[1] in pisos]
+        return targets
+
+    async def _history(self, targets: List[Tuple[str, int]]) -> pd.DataFrame:
+        """Histórico reciente de varios pisos en una consulta"""
+        return await self.get_historical_data_many(
+            sorted({piso for _, piso in targets}),
+            sorted({edificio for edificio, _ in targets}),
+            hours=settings.PREDICTION_WINDOW_HOURS
+        )
+
+    @traced()
+    async def generate_predictions_many(
+        self,
+        pisos: Optional[List[int]] = None,
+        edificios: Optional[List[str]] = None,
+        horizon_minutes: int = 60,
+        formato: str = "points",
+        modelo: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Genera predicciones para varios pisos con un número fijo de consultas.
+
+        Usa las corridas precalculadas vigentes y calcula el resto en bloque: los modelos
+        en línea con una carga de estados (los pisos aún sin estado se ajustan en segundo
+        plano y, mientras, usan el promedio móvil), los entrenados con una consulta de
+        histórico. Un piso sin modelo entrenado lleva "error" en vez de fallar el lote.
+        """
+        modelo = modelo or settings.PREDICTION_MODEL
+        base_time = datetime.utcnow()
+
+        targets = await self._targets(pisos, edificios)
+        if not targets:
+            return []
+
+        forecasts = await self.get_latest_forecasts(targets, modelo, horizon_minutes)
+        for target in targets:
+            record_cache("predicciones", target in forecasts)
+        modelos = {target: modelo for target in targets}
+        errors: Dict[Tuple[str, int], str] = {}
+        pending = [target for target in targets if target not in forecasts]
+
+        if pending and modelo in MODELOS_ONLINE:
+            online = OnlineForecastService(self.db)
+            states = await online.load_models([(edificio, piso, modelo) for edificio, piso in pending])
+            for edificio, piso in pending:
+                models = states.get((edificio, piso, modelo))
+                if models is None:
+                    schedule_fit(edificio, piso, modelo)
+                    modelos[(edificio, piso)] = MODELO_PROMEDIO_MOVIL
+                    continue
+                predicted, band = online.evaluate(models, base_time, horizon_minutes)
+                forecasts[(edificio, piso)] = self._package(predicted, band, horizon_minutes, base_time)
+            pending = [target for target in pending if target not in forecasts]
+
+        elif pending and modelo in MODELOS_ENTRENADOS:
+            loaded = await asyncio.to_thread(
+                lambda: {(edificio, piso): model_registry.load(modelo, edificio, piso) for edificio, piso in pending}
+            )
+            for target, models in loaded.items():
+                if models is None:
+                    errors[target] = f"El modelo {modelo} no está entrenado para el piso {target[1]}"
+            trained = [target for target in pending if target not in errors]
+            if trained:
+                df = await self._history(trained)
+                groups = dict(tuple(df.groupby(["edificio", "piso"], sort=False)))
+                # La inferencia (filtro de Kalman, árboles) es CPU: fuera del event loop
+                forecasts.update(await asyncio.to_thread(lambda: {
+                    target: self._forecast_with_models(loaded[target], groups[target], horizon_minutes, base_time)
+                    if target in groups else self.forecast(df.iloc[0:0], horizon_minutes, base_time)
+                    for target in trained
+                }))
+            pending = []
+
+        if pending:
+            df = await self._history(pending)
+            forecasts.update(zip(pending, self.forecast_many(df, pending, horizon_minutes, base_time)))
+
+        results = []
+        for edificio, piso in targets:
+            if (edificio, piso) in errors:
+                results.append({"edificio": edificio, "piso": piso, "predictions": None, "error": errors[(edificio, piso)]})
+                continue
+            forecast = forecasts[(edificio, piso)]
+            first_temp_pred = float(forecast["variables"]["temperatura"]["values"][0])
+            first_energia_pred = float(forecast["variables"]["energia"]["values"][0])
+            predictions = self.to_compact(forecast) if formato == "compact" else self.to_points(forecast)
+            predictions["riesgo_termico"] = self.calculate_thermal_risk(first_temp_pred, first_energia_pred)
+            predictions["modelo"] = modelos[(edificio, piso)]
+            results.append({"edificio": edificio, "piso": piso, "predictions": predictions})
+
+        return results
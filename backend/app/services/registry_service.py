@@ -0,0 +1,71 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.piso import Piso
+from app.tracing import traced
+
+
+
+class RegistryService:
+    """Registro de edificios y pisos (tabla pisos)"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @traced()
+    async def register(self, pares: Iterable[Tuple[str, int]]) -> int:
+        """Registra los pisos que aún no están en el registro (una sentencia por llamada); retorna cuántos eran nuevos"""
+        pares = sorted({(str(edificio), int(piso)) for edificio, piso in pares})
+        if not pares:
+            return 0
+
+        # Sin caché en memoria: ON CONFLICT DO NOTHING ya descarta los registrados y
+        # un piso borrado o movido de shard vuelve a registrarse
+        result = await self.db.execute(
+            pg_insert(Piso)
+            .values([{"edificio": edificio, "piso": piso} for edificio, piso in pares])
+            .on_conflict_do_nothing(constraint="unique_piso")
+            .returning(Piso.id)
+        )
+        nuevos = len(result.all())
+        await self.db.commit()
+        return nuevos
+
+    async def floors(self, edificio: Optional[str] = None, solo_activos: bool = True) -> List[Tuple[str, int]]:
+        """Pisos registrados (de un edificio o de todos), ordenados por edificio y piso"""
+        stmt = select(Piso.edificio, Piso.piso).order_by(Piso.edificio, Piso.piso)
+        if edificio is not None:
+            stmt = stmt.where(Piso.edificio == edificio)
+        if solo_activos:
+            stmt = stmt.where(Piso.activo == True)
+        result = await self.db.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+    async def get(self, edificio: str, piso: int) -> Optional[Piso]:
+        return await self.db.scalar(select(Piso).where(Piso.edificio == edificio, Piso.piso == piso))
+
+    async def buildings(self, edificio: Optional[str] = None, solo_activos: bool = True) -> List[Dict[str, Any]]:
+        """Edificios (o uno solo) con sus pisos registrados"""
+        stmt = select(Piso).order_by(Piso.edificio, Piso.piso)
+        if edificio is not None:
+            stmt = stmt.where(Piso.edificio == edificio)
+        if solo_activos:
+            stmt = stmt.where(Piso.activo == True)
+        edificios: Dict[str, Dict[str, Any]] = {}
+        for piso in (await self.db.scalars(stmt)).all():
+            grupo = edificios.setdefault(piso.edificio, {"edificio": piso.edificio, "pisos": []})
+            grupo["pisos"].append(piso)
+        return list(edificios.values())
+
+    async def upsert(self, edificio: str, piso: int, nombre: Optional[str], activo: bool) -> Piso:
+        """Registra un piso o actualiza su nombre y estado"""
+        registro = await self.get(edificio, piso)
+        if registro is None:
+            registro = Piso(edificio=edificio, piso=piso)
+            self.db.add(registro)
+        registro.nombre = nombre
+        registro.activo = activo
+        await self.db.commit()
+        await self.db.refresh(registro)
+        return registro
@@ -0,0 +1,468 @@
+"""
+Spool local y durable para la ingesta de lecturas durante caídas de la base de datos.
+
+Si la base de un shard no responde (error de conexión o más de
+SPOOL_DB_TIMEOUT_SECONDS), las lecturas ya validadas de sus edificios se agregan a
+archivos de segmento en SPOOL_DIR y la ingesta sigue respondiendo 202 sin volver a
+intentar ese shard en cada request; los edificios de los demás shards siguen por la
+ruta directa. Una tarea de reproducción verifica periódicamente los shards caídos y
+vacía los segmentos con inserciones en bloque; al terminar, la ingesta vuelve a la
+ruta directa.
+
+Cada segmento es una secuencia de registros con encabezado `<II` (largo y CRC32 del
+contenido) seguido de lecturas con estructura fija REGISTRO_SPOOL. Las escrituras se
+confirman con un fsync agrupado cada SPOOL_FSYNC_INTERVAL_MS (las requests esperan
+el fsync que cubre su registro) y el segmento rota al superar SPOOL_SEGMENT_BYTES.
+Una cola truncada o con CRC inválido (escritura interrumpida) se descarta al leer.
+La reproducción es idempotente: las lecturas ya insertadas se omiten por unique_reading.
+
+Cada proceso (workers de uvicorn, listener de protocolo de líneas) escribe en su propio
+subdirectorio de SPOOL_DIR y lo mantiene con un lock exclusivo (flock) mientras vive:
+nadie más agrega a sus segmentos ni los borra. El replayer de un proceso vacía los
+suyos y adopta los directorios cuyo lock está libre (procesos terminados).
+"""
+import asyncio
+import contextlib
+import fcntl
+import itertools
+import os
+import struct
+import zlib
+from datetime import timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from app.config import settings
+from app.database import shard_map
+from app.metrics import INGEST_SPOOLED
+from app.schemas.lectura import LecturaCreate
+from app.services.ingest_service import ingest_part, ingest_sharded, merge_results, split_by_shard, validate_readings
+
+
+ENCABEZADO_REGISTRO = struct.Struct("<II")
+
+# Mismas columnas que la ingesta binaria, con variables en float64 para no perder precisión
+REGISTRO_SPOOL = np.dtype([
+    ("timestamp_ms", "<i8"),
+    ("edificio", "S40"),  # UTF-8, hasta 10 caracteres
+    ("piso", "<i2"),
+    ("temp_c", "<f8"),
+    ("humedad_pct", "<f8"),
+    ("energia_kw", "<f8"),
+])
+
+
+def is_db_unavailable(exc: BaseException) -> bool:
+    """Errores que indican base caída o lenta (no errores de datos como duplicados o restricciones)"""
+    if isinstance(exc, (TimeoutError, OSError, OperationalError, InterfaceError)):
+        return True
+    return isinstance(exc, DBAPIError) and exc.connection_invalidated
+
+
+def columns_from_readings(readings: List[LecturaCreate]) -> Dict[str, np.ndarray]:
+    """Convierte lecturas validadas por Pydantic al formato columnar de la ingesta (timestamps en ms)"""
+    timestamps = [
+        reading.timestamp if reading.timestamp.tzinfo else reading.timestamp.replace(tzinfo=timezone.utc)
+        for reading in readings
+    ]
+    return {
+        "timestamp_ms": np.array([int(ts.timestamp() * 1000) for ts in timestamps], dtype=np.int64),
+        "edificio": np.array([reading.edificio for reading in readings], dtype=object),
+        "piso": np.array([reading.piso for reading in readings], dtype=np.int64),
+        "temp_c": np.array([reading.temp_c for reading in readings], dtype=np.float64),
+        "humedad_pct": np.array([reading.humedad_pct for reading in readings], dtype=np.float64),
+        "energia_kw": np.array([reading.energia_kw for reading in readings], dtype=np.float64),
+    }
+
+
+def _fsync(file) -> None:
+    os.fsync(file.fileno())
+
+
+def _fsync_close(file) -> None:
+    os.fsync(file.fileno())
+    file.close()
+
+
+class ReadingSpool:
+    """Archivo de spool segmentado, append-only, con fsync agrupado"""
+
+    def __init__(
+        self,
+        directory: str = "spool",
+        segment_bytes: int = 64 * 1024 * 1024,
+        fsync_interval_ms: int = 50,
+        db_timeout: float = 2.0,
+        enabled: bool = True
+    ):
+        self.root = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.fsync_seconds = fsync_interval_ms / 1000
+        self.db_timeout = db_timeout
+        self.enabled = enabled
+
+        # Shards (por nombre) que la ingesta considera caídos, con su último error
+        self.unavailable: Dict[str, str] = {}
+        self.last_error: Optional[str] = None
+
+        self._directory: Optional[Path] = None
+        self._lock_file = None
+        self._pid: Optional[int] = None
+        self._file = None
+        self._dirty = False
+        self._waiters: List[asyncio.Future] = []
+        self._sync_lock = asyncio.Lock()
+        self._sync_task: Optional[asyncio.Task] = None
+
+        self.stats: Dict[str, int] = {
+            "lecturas_en_spool": 0,
+            "lecturas_reproducidas": 0,
+            "registros_corruptos": 0,
+            "fsyncs": 0,
+        }
+
+    # --- Estado de la base ---
+
+    @property
+    def db_available(self) -> bool:
+        """True si ningún shard se considera caído"""
+        return not self.unavailable
+
+    def bypass(self, shard: str) -> bool:
+        """True mientras el shard se considera caído: la ingesta de sus edificios va directo al spool"""
+        return self.enabled and shard in self.unavailable
+
+    def db_deadline(self):
+        """Plazo para la ruta directa; al vencer se trata como base no disponible"""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return asyncio.timeout(self.db_timeout)
+
+    def handles(self, exc: BaseException, shard: str) -> bool:
+        """Si el error es de disponibilidad, marca el shard como caído y retorna True"""
+        if not self.enabled or not is_db_unavailable(exc):
+            return False
+        if shard not in self.unavailable:
+            print(f"Base de datos de {shard} no disponible, su ingesta va al spool: {exc!r}")
+        self.unavailable[shard] = self.last_error = repr(exc)
+        return True
+
+    # --- Directorios ---
+
+    @property
+    def directory(self) -> Path:
+        """Subdirectorio de este proceso; se toma al primer uso (después de un fork, uno nuevo)"""
+        if self._directory is None or self._pid != os.getpid():
+            self._claim_directory()
+        return self._directory
+
+    def _claim_directory(self) -> None:
+        pid = os.getpid()
+        for intento in itertools.count():
+            directory = self.root / (f"proceso-{pid}" if intento == 0 else f"proceso-{pid}-{intento}")
+            directory.mkdir(parents=True, exist_ok=True)
+            lock_file = open(directory / ".lock", "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # pid reutilizado y su directorio anterior se está reproduciendo
+                lock_file.close()
+                continue
+            self._directory, self._lock_file, self._pid = directory, lock_file, pid
+            return
+
+    def other_directories(self) -> List[Path]:
+        """Subdirectorios de otros procesos, más la raíz si tiene segmentos (spools sin subdirectorio)"""
+        if not self.root.is_dir():
+            return []
+        own = self._directory if self._pid == os.getpid() else None
+        directories = [self.root] if any(self.root.glob("*.spool")) else []
+        return directories + sorted(path for path in self.root.iterdir() if path.is_dir() and path != own)
+
+    @contextlib.contextmanager
+    def adopt(self, directory: Path) -> Iterator[bool]:
+        """Toma el lock de otro directorio sin esperar; False si su proceso sigue vivo"""
+        with open(directory / ".lock", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # --- Escritura ---
+
+    def segments(self, directory: Optional[Path] = None) -> List[Path]:
+        """Segmentos de un directorio (por defecto, el de este proceso)"""
+        return sorted((directory or self.directory).glob("*.spool"))
+
+    def pending_segments(self) -> List[Path]:
+        """Segmentos de todos los procesos pendientes de reproducir"""
+        return sorted(self.root.glob("*.spool")) + sorted(self.root.glob("*/*.spool"))
+
+    def sealed_segments(self) -> List[Path]:
+        """Segmentos cerrados (excluye el que está recibiendo escrituras)"""
+        current = Path(self._file.name) if self._file is not None else None
+        return [path for path in self.segments() if path != current]
+
+    def _open_segment(self) -> None:
+        existing = self.segments()
+        seq = int(existing[-1].stem) + 1 if existing else 1
+        self._file = open(self.directory / f"{seq:020d}.spool", "ab")
+
+    async def append(self, records: np.ndarray) -> None:
+        """Agrega un registro y espera el fsync que lo cubre"""
+        if self._file is None:
+            self._open_segment()
+        payload = records.tobytes()
+        self._file.write(ENCABEZADO_REGISTRO.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._dirty = True
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        if self._sync_task is None:
+            # Sin tarea de fsync (uso fuera de la aplicación): confirmar en el momento
+            await self.sync()
+        await future
+
+    async def sync(self, seal: bool = False) -> None:
+        """fsync del segmento actual; lo cierra si alcanzó el tamaño máximo o si seal=True"""
+        async with self._sync_lock:
+            waiters, self._waiters = self._waiters, []
+            file = self._file
+            self._dirty = False
+            try:
+                if file is not None:
+                    file.flush()
+                    rotate = seal or file.tell() >= self.segment_bytes
+                    if rotate:
+                        # Las escrituras siguientes abren un segmento nuevo
+                        self._file = None
+                    await asyncio.to_thread(_fsync_close if rotate else _fsync, file)
+                    self.stats["fsyncs"] += 1
+            except OSError as e:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                raise
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def store(self, columns: Dict[str, np.ndarray], row_numbers: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """Valida y guarda un lote en el spool; retorna el mismo resumen que la ingesta directa"""
+        clean, errors = validate_readings(columns, row_numbers)
+        n = len(clean["timestamp_ms"])
+        if n:
+            records = np.empty(n, dtype=REGISTRO_SPOOL)
+            for name in REGISTRO_SPOOL.names:
+                if name != "edificio":
+                    records[name] = clean[name]
+            records["edificio"] = [nombre.encode("utf-8") for nombre in clean["edificio"].tolist()]
+            await self.append(records)
+            self.stats["lecturas_en_spool"] += n
+            INGEST_SPOOLED.inc(n)
+        return {
+            "created": 0,
+            "spooled": n,
+            "errors": len(errors),
+            "created_ids": [],
+            "error_details": errors
+        }
+
+    async def _run_sync(self) -> None:
+        while True:
+            await asyncio.sleep(self.fsync_seconds)
+            if self._dirty or self._waiters:
+                try:
+                    await self.sync()
+                except OSError as e:
+                    print(f"Error sincronizando spool: {e}")
+
+    def start(self) -> None:
+        if self.enabled and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._run_sync())
+
+    async def stop(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        if self._file is not None:
+            await self.sync(seal=True)
+
+    # --- Lectura ---
+
+    def has_own_data(self) -> bool:
+        return self._file is not None or bool(self.segments())
+
+    def has_data(self) -> bool:
+        return self._file is not None or bool(self.pending_segments())
+
+    def read_segment(self, path: Path) -> Iterator[np.ndarray]:
+        """Registros válidos de un segmento; se detiene en la primera cola truncada o corrupta"""
+        with open(path, "rb") as file:
+            data = file.read()
+        offset = 0
+        while offset + ENCABEZADO_REGISTRO.size <= len(data):
+            length, crc = ENCABEZADO_REGISTRO.unpack_from(data, offset)
+            start = offset + ENCABEZADO_REGISTRO.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc or length % REGISTRO_SPOOL.itemsize:
+                self.stats["registros_corruptos"] += 1
+                print(f"Spool {path.name}: registro inválido en offset {offset}, se descarta el resto")
+                return
+            yield np.frombuffer(payload, dtype=REGISTRO_SPOOL)
+            offset = start + length
+        if offset < len(data):
+            self.stats["registros_corruptos"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        segments = self.pending_segments()
+        return {
+            "habilitado": self.enabled,
+            "base_disponible": self.db_available,
+            "shards_no_disponibles": sorted(self.unavailable),
+            "ultimo_error": self.last_error,
+            "segmentos": len(segments),
+            "bytes_pendientes": sum(path.stat().st_size for path in segments),
+            **self.stats,
+        }
+
+
+class SpoolReplayer:
+    """Vacía el spool en bloque cuando la base vuelve a estar disponible"""
+
+    def __init__(self, spool: ReadingSpool, interval_seconds: int = 5, batch_rows: int = 50000):
+        self.spool = spool
+        self.interval_seconds = interval_seconds
+        self.batch_rows = batch_rows
+        self._task: Optional[asyncio.Task] = None
+
+    async def _ingest(self, chunks: List[np.ndarray]) -> int:
+        records = np.concatenate(chunks)
+        columns = {name: records[name] for name in REGISTRO_SPOOL.names}
+        async with shard_map.session_at(0) as db:
+            result = await ingest_sharded(db, columns, source="spool_replay")
+        self.spool.stats["lecturas_reproducidas"] += len(records)
+        return result["created"]
+
+    async def replay_segment(self, path: Path) -> int:
+        created = 0
+        chunks, rows = [], 0
+        for records in self.spool.read_segment(path):
+            chunks.append(records)
+            rows += len(records)
+            if rows >= self.batch_rows:
+                created += await self._ingest(chunks)
+                chunks, rows = [], 0
+        if chunks:
+            created += await self._ingest(chunks)
+        path.unlink()
+        return created
+
+    async def replay_orphans(self) -> int:
+        """Reproduce y borra los directorios de procesos terminados; los de procesos vivos los vacía su dueño"""
+        created = 0
+        for directory in self.spool.other_directories():
+            with self.spool.adopt(directory) as adopted:
+                if not adopted:
+                    continue
+                for path in self.spool.segments(directory):
+                    created += await self.replay_segment(path)
+                if directory != self.spool.root:
+                    with contextlib.suppress(OSError):
+                        (directory / ".lock").unlink()
+                        directory.rmdir()
+        return created
+
+    async def run_once(self) -> int:
+        """Reproduce todos los segmentos; retorna las lecturas insertadas"""
+        if not self.spool.has_data():
+            self.spool.unavailable.clear()
+            return 0
+
+        # Los shards caídos (o el principal, si el spool viene de un proceso anterior) deben responder
+        caidos = [i for i, shard in enumerate(shard_map.shards) if shard.name in self.spool.unavailable] or [0]
+        for indice in caidos:
+            async with shard_map.session_at(indice) as db:
+                await db.execute(text("SELECT 1"))
+
+        created = 0
+        # Lo que llegue durante la reproducción sigue yendo al spool hasta vaciarlo por completo
+        while self.spool.has_own_data():
+            if self.spool._file is not None:
+                await self.spool.sync(seal=True)
+            for path in self.spool.sealed_segments():
+                created += await self.replay_segment(path)
+        created += await self.replay_orphans()
+        self.spool.unavailable.clear()
+        if created:
+            print(f"Spool reproducido: {created} lectura(s) insertada(s)")
+        return created
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.spool.last_error = repr(e)
+
+    def start(self):
+        if self.spool.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+async def ingest_or_spool(db, columns: Dict[str, np.ndarray], source: str = "api") -> Dict[str, Any]:
+    """Ingesta directa de un lote columnar por shard; las partes de shards no disponibles van al spool"""
+
+    async def parte(indice: int, subset: Dict[str, np.ndarray], filas: Optional[np.ndarray]) -> Dict[str, Any]:
+        shard = shard_map.shards[indice].name
+        if reading_spool.bypass(shard):
+            return await reading_spool.store(subset, filas)
+        try:
+            # El plazo cubre solo la inserción: modelos y alertas corren después, sin él
+            return await ingest_part(db, indice, subset, filas, source=source, deadline=reading_spool.db_deadline)
+        except Exception as e:
+            if not reading_spool.handles(e, shard):
+                raise
+            if indice == 0:
+                with contextlib.suppress(Exception):
+                    await db.rollback()
+            return await reading_spool.store(subset, filas)
+
+    partes = split_by_shard(columns)
+    results = await asyncio.gather(*(parte(indice, subset, filas) for indice, (subset, filas) in partes.items()))
+    return merge_results(list(results))
+
+
+reading_spool = ReadingSpool(
+    directory=settings.SPOOL_DIR,
+    segment_bytes=settings.SPOOL_SEGMENT_BYTES,
+    fsync_interval_ms=settings.SPOOL_FSYNC_INTERVAL_MS,
+    db_timeout=settings.SPOOL_DB_TIMEOUT_SECONDS,
+    enabled=settings.SPOOL_ENABLED
+)
+spool_replayer = SpoolReplayer(
+    reading_spool,
+    interval_seconds=settings.SPOOL_REPLAY_INTERVAL_SECONDS,
+    batch_rows=settings.SPOOL_REPLAY_BATCH_ROWS
+)
@@ -0,0 +1,150 @@
+"""
+Modelos de pronóstico entrenados fuera de línea (SARIMAX y gradient boosting sobre rezagos).
+
+El entrenamiento es costoso y se ejecuta en procesos de trabajo; los modelos
+ajustados se guardan en el registro de modelos y en inferencia solo se
+condicionan sobre la ventana reciente de lecturas.
+"""
+import warnings
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Any, Tuple
+from app.services.forecasting import Z_CONFIANZA, _epoch
+
+
+class TrainedModel:
+    """Modelo base entrenado sobre una serie a paso de un minuto"""
+
+    nombre = "base"
+
+    @classmethod
+    def fit(cls, timestamps: np.ndarray, values: np.ndarray) -> "TrainedModel":
+        raise NotImplementedError
+
+    def forecast(
+        self,
+        base_time: datetime,
+        horizon_minutes: int,
+        timestamps: np.ndarray,
+        values: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Pronostica a partir de la ventana reciente; retorna (valores, semiancho de banda)"""
+        last_ts = pd.Timestamp(timestamps[-1])
+        last_ts = last_ts.tz_localize("UTC") if last_ts.tzinfo is None else last_ts
+        offset = max(int(round((_epoch(base_time) - last_ts.timestamp()) / 60.0)), 0)
+        predicted, band = self._forecast_steps(np.asarray(values, dtype=float), offset + horizon_minutes)
+        return predicted[offset:], band[offset:]
+
+    def _forecast_steps(self, values: np.ndarray, steps: int) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+    def describe(self) -> Dict[str, Any]:
+        return {"modelo": self.nombre}
+
+
+class SarimaxModel(TrainedModel):
+    """SARIMAX(p, d, q); solo se guardan orden y parámetros, el filtro se reaplica en inferencia"""
+
+    nombre = "sarimax"
+    order = (1, 1, 1)
+
+    def __init__(self, order: Tuple[int, int, int], params: np.ndarray):
+        self.order = tuple(order)
+        self.params = np.asarray(params, dtype=float)
+
+    @classmethod
+    def fit(cls, timestamps, values):
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            fitted = SARIMAX(np.asarray(values, dtype=float), order=cls.order).fit(disp=False)
+        return cls(cls.order, fitted.params)
+
+    def _forecast_steps(self, values, steps):
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            filtered = SARIMAX(values, order=self.order).filter(self.params)
+            result = filtered.get_forecast(steps)
+        return np.asarray(result.predicted_mean), Z_CONFIANZA * np.asarray(result.se_mean)
+
+    def describe(self):
+        return {"modelo": self.nombre, "order": list(self.order), "params": self.params.round(4).tolist()}
+
+
+class GradientBoostingLagModel(TrainedModel):
+    """Gradient boosting directo sobre rezagos: un regresor por horizonte ancla, interpolado entre anclas"""
+
+    nombre = "gbr_lags"
+    lags = 30
+    anchors = (1, 5, 15, 30, 60, 120, 240)
+    holdout_fraction = 0.2
+
+    def __init__(self, regressors: Dict[int, Any], residual_std: Dict[int, float]):
+        self.regressors = regressors
+        self.residual_std = residual_std
+
+    @classmethod
+    def _features(cls, values: np.ndarray) -> np.ndarray:
+        """Rezagos relativos al último valor para cada origen posible (orígenes x rezagos)"""
+        windows = np.lib.stride_tricks.sliding_window_view(values, cls.lags)
+        return windows - windows[:, -1:]
+
+    @classmethod
+    def fit(cls, timestamps, values):
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        values = np.asarray(values, dtype=float)
+        features = cls._features(values)
+        regressors = {}
+        residual_std = {}
+
+        for anchor in cls.anchors:
+            # Origen i usa values[i:i+lags]; su objetivo es el valor anchor pasos después del último rezago
+            n = len(values) - cls.lags - anchor + 1
+            if n < 20:
+                break
+            X = features[:n]
+            y = values[cls.lags - 1 + anchor:cls.lags - 1 + anchor + n] - values[cls.lags - 1:cls.lags - 1 + n]
+
+            split = int(n * (1 - cls.holdout_fraction))
+            holdout_model = HistGradientBoostingRegressor(max_iter=100, max_depth=3).fit(X[:split], y[:split])
+            residuals = y[split:] - holdout_model.predict(X[split:])
+            residual_std[anchor] = float(np.std(residuals)) if len(residuals) else 0.0
+            regressors[anchor] = HistGradientBoostingRegressor(max_iter=100, max_depth=3).fit(X, y)
+
+        if not regressors:
+            raise ValueError(f"Se requieren al menos {cls.lags + 20} lecturas para entrenar {cls.nombre}")
+        return cls(regressors, residual_std)
+
+    def _forecast_steps(self, values, steps):
+        if len(values) < self.lags:
+            values = np.concatenate([np.full(self.lags - len(values), values[0]), values])
+        x = self._features(values[-self.lags:])
+
+        anchors = np.array(sorted(self.regressors))
+        deltas = np.array([self.regressors[a].predict(x)[0] for a in anchors])
+        stds = np.array([self.residual_std[a] for a in anchors])
+
+        # Interpolación lineal entre anclas; más allá de la última ancla se mantiene constante
+        k = np.arange(1, steps + 1, dtype=float)
+        predicted = values[-1] + np.interp(k, anchors, deltas)
+        band = Z_CONFIANZA * np.interp(k, anchors, stds)
+        return predicted, band
+
+    def describe(self):
+        return {
+            "modelo": self.nombre,
+            "lags": self.lags,
+            "anchors": sorted(self.regressors),
+            "residual_std": {str(k): round(v, 4) for k, v in self.residual_std.items()},
+        }
+
+
+MODELOS_ENTRENADOS = {
+    SarimaxModel.nombre: SarimaxModel,
+    GradientBoostingLagModel.nombre: GradientBoostingLagModel,
+}
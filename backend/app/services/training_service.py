@@ -0,0 +1,145 @@
+import asyncio
+import multiprocessing
+import uuid
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Set, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import shard_map
+from app.models.lectura import Lectura
+from app.services.columnar import fetch_frame
+from app.services.forecasting import VARIABLES_PREDICCION
+from app.services.model_registry import model_registry
+from app.services.trained_models import MODELOS_ENTRENADOS
+from app.tracing import traced, tracer
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+# Estado de las corridas de entrenamiento lanzadas desde este proceso (las últimas
+# TRAINING_HISTORY_SIZE terminadas). Vive en memoria: con varios workers de uvicorn,
+# GET /models/train/{run_id} responde 404 si el request cae en otro proceso.
+training_runs: Dict[str, Dict[str, Any]] = {}
+
+# Referencias a las tareas en curso (el loop solo guarda referencias débiles)
+_tareas: Set[asyncio.Task] = set()
+
+ESTADOS_FINALES = ("completado", "completado_con_errores")
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Pool de procesos para entrenamiento (spawn: los workers no heredan conexiones ni hilos)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.TRAINING_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def fit_floor_models(modelo: str, timestamps: np.ndarray, matrix: np.ndarray) -> Dict[str, Any]:
+    """Entrena un modelo por variable; se ejecuta dentro de un proceso de trabajo"""
+    model_class = MODELOS_ENTRENADOS[modelo]
+    return {
+        variable: model_class.fit(timestamps, matrix[:, i])
+        for i, variable in enumerate(VARIABLES_PREDICCION)
+    }
+
+
+async def load_training_data(edificio: str, piso: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Lee la ventana de entrenamiento y la lleva a una grilla regular de un minuto"""
+    cutoff_time = datetime.utcnow() - timedelta(hours=settings.TRAINING_WINDOW_HOURS)
+    columnas = [config["columna"] for config in VARIABLES_PREDICCION.values()]
+
+    async with shard_map.read_session(edificio) as db:
+        df = await fetch_frame(
+            db,
+            {"timestamp": Lectura.timestamp, **{columna: getattr(Lectura, columna) for columna in columnas}},
+            Lectura.edificio == edificio,
+            Lectura.piso == piso,
+            Lectura.timestamp >= cutoff_time,
+            order_by=[Lectura.timestamp.asc()]
+        )
+
+    if df.empty:
+        return np.array([], dtype="datetime64[ns]"), np.empty((0, len(columnas)))
+
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    grid = df.set_index("timestamp")[columnas].resample("1min").mean().interpolate(limit_area="inside").dropna()
+    return grid.index.to_numpy(), grid.to_numpy()
+
+
+@traced()
+async def train_floors(run_id: str, modelo: str, pisos: List[int], edificio: str = "A") -> None:
+    """Entrena los pisos indicados en el pool de procesos y registra cada modelo ajustado"""
+    loop = asyncio.get_running_loop()
+    run = training_runs[run_id]
+
+    for piso in pisos:
+        try:
+            timestamps, matrix = await load_training_data(edificio, piso)
+            if len(timestamps) == 0:
+                raise ValueError(f"Sin lecturas en las últimas {settings.TRAINING_WINDOW_HOURS} horas")
+
+            started = datetime.utcnow()
+            # El pool de procesos no hereda el contexto: el ajuste completo queda como un span
+            with tracer.span("fit_floor_models", **{"modelo": modelo, "piso": piso, "observaciones": int(len(timestamps))}):
+                models = await loop.run_in_executor(get_executor(), fit_floor_models, modelo, timestamps, matrix)
+            metadata = {
+                "observaciones": int(len(timestamps)),
+                "ventana_horas": settings.TRAINING_WINDOW_HOURS,
+                "duracion_s": round((datetime.utcnow() - started).total_seconds(), 2),
+                "detalle": {variable: model.describe() for variable, model in models.items()},
+            }
+            version = await run_in_threadpool(model_registry.save, modelo, edificio, piso, models, metadata)
+            run["resultados"].append({"piso": piso, "version": version})
+        except BrokenProcessPool as e:
+            # Un worker murió (p. ej. sin memoria): descartar el pool para recrearlo en el siguiente uso
+            shutdown_executor()
+            run["errores"].append(f"Piso {piso}: {str(e)}")
+        except Exception as e:
+            run["errores"].append(f"Piso {piso}: {str(e)}")
+
+    run["estado"] = "completado" if not run["errores"] else "completado_con_errores"
+    run["finished_at"] = datetime.utcnow()
+
+
+def _trim_history() -> None:
+    """Descarta las corridas terminadas más antiguas por sobre TRAINING_HISTORY_SIZE"""
+    excess = len(training_runs) - settings.TRAINING_HISTORY_SIZE
+    for run_id in [run_id for run_id, run in training_runs.items() if run["estado"] in ESTADOS_FINALES][:max(excess, 0)]:
+        del training_runs[run_id]
+
+
+def start_training(modelo: str, pisos: List[int], edificio: str = "A") -> Dict[str, Any]:
+    """Lanza una corrida de entrenamiento en segundo plano y retorna su estado inicial"""
+    run_id = str(uuid.uuid4())
+    training_runs[run_id] = {
+        "run_id": run_id,
+        "modelo": modelo,
+        "edificio": edificio,
+        "pisos": pisos,
+        "estado": "en_curso",
+        "resultados": [],
+        "errores": [],
+        "started_at": datetime.utcnow(),
+        "finished_at": None,
+    }
+    task = asyncio.create_task(train_floors(run_id, modelo, pisos, edificio))
+    _tareas.add(task)
+    task.add_done_callback(_tareas.discard)
+    run = training_runs[run_id]
+    _trim_history()
+    return run
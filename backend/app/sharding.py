@@ -0,0 +1,147 @@
+"""
+Particionado horizontal por edificio (shards).
+
+Cada edificio vive completo en una sola base: sus lecturas, alertas, predicciones,
+estados de modelos y su registro de pisos. El shard 0 es DATABASE_URL (con sus
+réplicas de lectura) y SHARD_DATABASE_URLS agrega los demás. SHARD_MAP fija el
+shard de un edificio; el resto se asigna por un hash estable del código, así que
+agregar un shard mueve edificios no fijados: fíjalos en SHARD_MAP antes de crecer.
+
+Las rutas de un edificio abren la sesión en su shard y la ingesta reparte cada
+lote por edificio e inserta las partes en paralelo, una por shard; las consultas
+de varios edificios (listados globales, exportaciones, resumen del dashboard)
+se ejecutan en todos los shards a la vez y se combinan en orden (merge_sorted).
+Las tablas sin edificio (umbrales, suscripciones) existen en todos los shards;
+init_db.py los inicializa a todos.
+"""
+import asyncio
+import heapq
+import itertools
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from app.metrics import request_db_stats
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class Shard:
+    name: str
+    engine: AsyncEngine
+    session: Callable[[], AsyncSession]       # escrituras
+    read_session: Callable[[], AsyncSession]  # consultas (réplicas en el shard 0)
+    sessions: int = 0
+
+
+@dataclass
+class ShardMap:
+    """Asignación edificio -> shard y ejecución de consultas en todos los shards"""
+
+    assignments: Dict[str, int] = field(default_factory=dict)
+    shards: List[Shard] = field(default_factory=list)
+    scatter_gathers: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.shards) > 1
+
+    def add(
+        self,
+        name: str,
+        engine: AsyncEngine,
+        session: Callable[[], AsyncSession],
+        read_session: Optional[Callable[[], AsyncSession]] = None
+    ) -> None:
+        self.shards.append(Shard(name, engine, session, read_session or session))
+
+    def check_assignments(self) -> None:
+        fuera = {edificio: i for edificio, i in self.assignments.items() if not 0 <= i < len(self.shards)}
+        if fuera:
+            raise ValueError(f"SHARD_MAP asigna edificios a shards inexistentes ({len(self.shards)} configurados): {fuera}")
+
+    def index_for(self, edificio: str) -> int:
+        """Shard de un edificio (código ya normalizado): SHARD_MAP o hash estable (crc32)"""
+        if edificio in self.assignments:
+            return self.assignments[edificio]
+        return zlib.crc32(edificio.encode("utf-8")) % len(self.shards)
+
+    def shard_for(self, edificio: str) -> Shard:
+        return self.shards[self.index_for(edificio)]
+
+    def indices_for(self, edificios: Iterable[str]) -> List[int]:
+        return sorted({self.index_for(edificio) for edificio in edificios})
+
+    def partition(self, edificios: Sequence[str]) -> Dict[int, np.ndarray]:
+        """Posiciones de cada shard dentro de una secuencia de códigos de edificio"""
+        unique, inverse = np.unique(np.asarray(edificios, dtype=object), return_inverse=True)
+        por_fila = np.array([self.index_for(edificio) for edificio in unique.tolist()], dtype=np.int64)[inverse]
+        return {i: np.flatnonzero(por_fila == i) for i in np.unique(por_fila).tolist()}
+
+    def session_at(self, indice: int, read: bool = False) -> AsyncSession:
+        shard = self.shards[indice]
+        shard.sessions += 1
+        return shard.read_session() if read else shard.session()
+
+    def session(self, edificio: str) -> AsyncSession:
+        """Sesión de escritura en el shard del edificio"""
+        return self.session_at(self.index_for(edificio))
+
+    def read_session(self, edificio: str) -> AsyncSession:
+        """Sesión de consulta en el shard del edificio"""
+        return self.session_at(self.index_for(edificio), read=True)
+
+    async def gather(
+        self,
+        consulta: Callable[[AsyncSession], Awaitable[T]],
+        indices: Optional[Iterable[int]] = None,
+        read: bool = True
+    ) -> List[T]:
+        """Ejecuta consulta en cada shard (o en los indicados), cada uno con su sesión, en paralelo"""
+        indices = range(len(self.shards)) if indices is None else list(indices)
+
+        async def run(indice: int) -> T:
+            async with self.session_at(indice, read=read) as db:
+                return await consulta(db)
+
+        if len(indices) > 1:
+            self.scatter_gathers += 1
+            # Presupuesto de sentencias del request por shard consultado
+            stats = request_db_stats.get()
+            if stats is not None:
+                stats.shards = max(stats.shards, len(indices))
+        return list(await asyncio.gather(*(run(indice) for indice in indices)))
+
+    async def stop(self) -> None:
+        """Cierra los pools de los shards adicionales (el shard 0 es el engine principal)"""
+        for shard in self.shards[1:]:
+            await shard.engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "habilitado": self.enabled,
+            "consultas_en_todos_los_shards": self.scatter_gathers,
+            "edificios_fijados": len(self.assignments),
+            "shards": [
+                {"nombre": shard.name, "indice": i, "sesiones": shard.sessions}
+                for i, shard in enumerate(self.shards)
+            ],
+        }
+
+
+def merge_sorted(
+    partes: Iterable[Iterable[T]],
+    key: Callable[[T], Any],
+    reverse: bool = False,
+    offset: int = 0,
+    limit: Optional[int] = None
+) -> List[T]:
+    """Combina resultados ya ordenados de cada shard en un solo orden y aplica offset/limit.
+
+    Cada shard debe devolver sus primeras offset + limit filas en ese orden.
+    """
+    merged = heapq.merge(*partes, key=key, reverse=reverse)
+    return list(itertools.islice(merged, offset, None if limit is None else offset + limit))
@@ -0,0 +1,253 @@
+"""
+Registro de sentencias SQL lentas (consultado en /admin/slow-queries).
+
+Las sentencias que superan SLOW_QUERY_THRESHOLD_MS se guardan en un búfer
+circular con su forma normalizada, parámetros, la pila de llamadas dentro de
+app/ y un plan EXPLAIN (ANALYZE, BUFFERS) capturado en segundo plano. ANALYZE
+vuelve a ejecutar la sentencia, por lo que solo se aplica a lecturas puras (SELECT/WITH
+sin INSERT/UPDATE/DELETE/MERGE, bloqueos de fila ni funciones con efectos como
+nextval o los advisory locks; el resto lleva un EXPLAIN sin ejecutar), dentro de una
+transacción que se revierte, con statement_timeout y a lo sumo una vez por forma
+cada SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS.
+"""
+import asyncio
+import contextvars
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set, Union
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.config import settings
+from app.middleware.query_budget import normalize_statement
+
+try:
+    import greenlet
+except ImportError:  # sin greenlet no hay engine asíncrono; la pila se toma solo del hilo actual
+    greenlet = None
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Instrumentación y middlewares: no aportan a la pila del llamador
+_ARCHIVOS_OMITIDOS = {
+    os.path.abspath(__file__),
+    os.path.join(APP_DIR, "metrics.py"),
+    os.path.join(APP_DIR, "profiling.py"),
+}
+_DIRECTORIO_MIDDLEWARE = os.path.join(APP_DIR, "middleware")
+
+MAX_PARAM_CHARS = 200
+MAX_PARAMS = 20
+MAX_SQL_CHARS = 4000
+
+
+def _caller_stack(limit: int) -> List[str]:
+    """Marcos de app/ que llevaron a la sentencia, del más interno al más externo.
+
+    Con el engine asíncrono el cursor corre en un greenlet hijo: se continúa por el
+    marco suspendido del greenlet padre, que contiene las corrutinas de la ruta.
+    """
+    stack = []
+    frame = sys._getframe(2)
+    current = greenlet.getcurrent() if greenlet is not None else None
+    while frame is not None and len(stack) < limit:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(APP_DIR)
+            and filename not in _ARCHIVOS_OMITIDOS
+            and not filename.startswith(_DIRECTORIO_MIDDLEWARE)
+        ):
+            stack.append(f"{os.path.relpath(filename, os.path.dirname(APP_DIR))}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+        if frame is None and current is not None and current.parent is not None:
+            current = current.parent
+            frame = current.gr_frame
+    return stack
+
+
+def _format_params(parameters: Any) -> Any:
+    """Parámetros recortados (los lotes unnest pueden traer miles de valores)"""
+    def short(value: Any) -> str:
+        text = repr(value)
+        return text if len(text) <= MAX_PARAM_CHARS else f"{text[:MAX_PARAM_CHARS]}... ({len(text)} caracteres)"
+
+    if isinstance(parameters, dict):
+        return {key: short(value) for key, value in list(parameters.items())[:MAX_PARAMS]}
+    if isinstance(parameters, (list, tuple)):
+        return [short(value) for value in list(parameters)[:MAX_PARAMS]]
+    return short(parameters)
+
+
+# Escrituras dentro de un SELECT/WITH (CTE que modifican datos, FOR UPDATE/SHARE) y
+# funciones cuyo efecto no deshace el rollback (secuencias, advisory locks, NOTIFY)
+_EFECTOS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|NEXTVAL|SETVAL|PG_NOTIFY)\b|\bPG_(TRY_)?ADVISORY_|\bFOR\s+(KEY\s+)?SHARE\b",
+    re.IGNORECASE
+)
+
+
+def _is_read(statement: str) -> bool:
+    """True si la sentencia es una lectura pura que EXPLAIN ANALYZE puede volver a ejecutar"""
+    head = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return head in ("SELECT", "WITH") and _EFECTOS.search(statement) is None
+
+
+class SlowQueryRecorder:
+    """Búfer circular de sentencias lentas con planes capturados en segundo plano"""
+
+    def __init__(
+        self,
+        threshold_ms: float = 200,
+        capacity: int = 200,
+        explain: bool = True,
+        explain_interval_seconds: int = 60,
+        explain_timeout_ms: int = 5000,
+        stack_depth: int = 12
+    ):
+        self.threshold = threshold_ms / 1000
+        self.entries: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self.explain = explain
+        self.explain_interval = explain_interval_seconds
+        self.explain_timeout_ms = explain_timeout_ms
+        self.stack_depth = stack_depth
+        self._ids = itertools.count(1)
+        self._last_explain: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def instrument(self, engine: Engine, name: str, explain_engine: Union[Engine, AsyncEngine, None] = None) -> None:
+        """Registra los eventos en un engine (para async: engine.sync_engine, con el AsyncEngine para los planes)"""
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._slow_query_start = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - context._slow_query_start
+            if elapsed < self.threshold or context.execution_options.get("slow_query_explain"):
+                return
+            entry = self.record(name, statement, parameters, elapsed, executemany)
+            if explain_engine is not None:
+                self._schedule_explain(explain_engine, entry, statement, parameters, executemany)
+
+    def record(self, engine_name: str, statement: str, parameters: Any, elapsed: float, executemany: bool = False) -> Dict[str, Any]:
+        shape = normalize_statement(statement)
+        entry = {
+            "id": next(self._ids),
+            "timestamp": datetime.utcnow(),
+            "engine": engine_name,
+            "duracion_ms": round(elapsed * 1000, 2),
+            "sentencia": shape,
+            "sql": statement[:MAX_SQL_CHARS],
+            "parametros": _format_params(parameters),
+            "executemany": executemany,
+            "pila": _caller_stack(self.stack_depth),
+            "plan": None,
+            "estado_plan": "pendiente",
+        }
+        self.entries.append(entry)
+        origin = entry["pila"][0] if entry["pila"] else "?"
+        print(f"Consulta lenta ({entry['duracion_ms']} ms) desde {origin}: {shape[:200]}")
+        return entry
+
+    def _schedule_explain(self, explain_engine, entry: Dict[str, Any], statement: str, parameters: Any, executemany: bool) -> None:
+        now = time.monotonic()
+        if not self.explain or executemany or explain_engine.dialect.name != "postgresql":
+            entry["estado_plan"] = "omitido"
+            return
+        if now - self._last_explain.get(entry["sentencia"], -self.explain_interval) < self.explain_interval:
+            entry["estado_plan"] = "omitido (forma explicada recientemente)"
+            return
+        self._last_explain[entry["sentencia"]] = now
+        if len(self._last_explain) > 10 * (self.entries.maxlen or 1):
+            self._last_explain.clear()
+        # Una lista se interpretaría como executemany
+        if isinstance(parameters, list):
+            parameters = tuple(parameters)
+
+        if isinstance(explain_engine, AsyncEngine):
+            # Contexto vacío: el EXPLAIN no se suma a las sentencias del request en curso
+            task = asyncio.get_running_loop().create_task(
+                self._explain_async(explain_engine, entry, statement, parameters),
+                context=contextvars.Context()
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            threading.Thread(
+                target=self._explain_sync,
+                args=(explain_engine, entry, statement, parameters),
+                daemon=True
+            ).start()
+
+    def _explain_sql(self, statement: str) -> str:
+        options = "ANALYZE, BUFFERS" if _is_read(statement) else "VERBOSE"
+        return f"EXPLAIN ({options}) {statement}"
+
+    async def _explain_async(self, explain_engine: AsyncEngine, entry: Dict[str, Any], statement: str, parameters: Any) -> None:
+        try:
+            async with explain_engine.connect() as conn:
+                conn = await conn.execution_options(slow_query_explain=True)
+                async with conn.begin() as transaction:
+                    await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(self.explain_timeout_ms)}")
+                    result = await conn.exec_driver_sql(self._explain_sql(statement), parameters)
+                    entry["plan"] = "\n".join(row[0] for row in result.all())
+                    await transaction.rollback()
+            entry["estado_plan"] = "listo"
+        except Exception as e:
+            entry["estado_plan"] = f"error: {e.__class__.__name__}: {str(e)[:300]}"
+
+    def _explain_sync(self, explain_engine: Engine, entry: Dict[str, Any], statement: str, parameters: Any) -> None:
+        try:
+            with explain_engine.connect().execution_options(slow_query_explain=True) as conn:
+                with conn.begin() as transaction:
+                    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(self.explain_timeout_ms)}")
+                    result = conn.exec_driver_sql(self._explain_sql(statement), parameters)
+                    entry["plan"] = "\n".join(row[0] for row in result.all())
+                    transaction.rollback()
+            entry["estado_plan"] = "listo"
+        except Exception as e:
+            entry["estado_plan"] = f"error: {e.__class__.__name__}: {str(e)[:300]}"
+
+    def list(self, limit: int = 50, min_ms: float = 0, sentencia: Optional[str] = None) -> List[Dict[str, Any]]:
+        entries = [
+            entry for entry in reversed(self.entries)
+            if entry["duracion_ms"] >= min_ms and (sentencia is None or sentencia.lower() in entry["sentencia"].lower())
+        ]
+        return entries[:limit]
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        return next((entry for entry in self.entries if entry["id"] == entry_id), None)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Formas presentes en el búfer agrupadas, de mayor a menor tiempo total"""
+        groups: Dict[str, Dict[str, Any]] = {}
+        for entry in self.entries:
+            group = groups.setdefault(entry["sentencia"], {"sentencia": entry["sentencia"], "veces": 0, "total_ms": 0.0, "max_ms": 0.0})
+            group["veces"] += 1
+            group["total_ms"] += entry["duracion_ms"]
+            group["max_ms"] = max(group["max_ms"], entry["duracion_ms"])
+        return sorted(
+            ({**group, "total_ms": round(group["total_ms"], 2)} for group in groups.values()),
+            key=lambda group: group["total_ms"],
+            reverse=True
+        )
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self._last_explain.clear()
+
+
+slow_query_recorder = SlowQueryRecorder(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    capacity=settings.SLOW_QUERY_BUFFER_SIZE,
+    explain=settings.SLOW_QUERY_EXPLAIN,
+    explain_interval_seconds=settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS,
+    explain_timeout_ms=settings.SLOW_QUERY_EXPLAIN_TIMEOUT_MS
+)
@@ -0,0 +1,386 @@
+"""
+Trazas livianas de extremo a extremo (spans) sin depender del SDK de OpenTelemetry.
+
+Cada request muestreado abre un span raíz (middleware/tracing.py) y dentro de él
+quedan los spans de los servicios (decorador `traced`), de cada sentencia SQL
+(eventos del engine) y de las llamadas HTTP salientes. El span actual vive en
+una ContextVar, por lo que se hereda en asyncio.create_task, asyncio.to_thread y
+los greenlets de SQLAlchemy; los trabajos en cola guardan el contexto al
+encolarse (ver JobManager).
+
+El muestreo es en la cabecera: la decisión se toma al abrir el span raíz (o se
+respeta la del header traceparent entrante) y los hijos de una traza descartada
+no se registran. Los spans terminados se acumulan en una cola acotada y una
+tarea en segundo plano los exporta en lotes a un archivo JSONL o a un colector
+OTLP/HTTP (formato JSON, p. ej. el OpenTelemetry Collector o Jaeger en :4318).
+"""
+import asyncio
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Union
+import httpx
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.config import settings
+from app.middleware.query_budget import normalize_statement
+
+
+# Códigos de SpanKind de OTLP
+TIPOS_SPAN = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+MAX_STATEMENT_CHARS = 1000
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class SpanContext:
+    """Identidad de un span (propio o remoto, leído de traceparent) y su decisión de muestreo"""
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> Optional["SpanContext"]:
+        match = _TRACEPARENT.match(header.strip().lower()) if header else None
+        if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+            return None
+        return cls(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+class Span(SpanContext):
+    """Span registrado; se exporta al terminar"""
+    __slots__ = ("parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, kind: str, attributes: Dict[str, Any]):
+        super().__init__(trace_id, os.urandom(8).hex(), True)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.error = f"{exc.__class__.__name__}: {str(exc)[:500]}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "nombre": self.name,
+            "tipo": self.kind,
+            "inicio": datetime.fromtimestamp(self.start_ns / 1e9, tz=timezone.utc).isoformat(),
+            "duracion_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "atributos": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NonRecordingSpan:
+    """Span de una traza descartada por el muestreo: marca el contexto para que los hijos tampoco se registren"""
+    sampled = False
+    trace_id = span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+
+NON_RECORDING_SPAN = _NonRecordingSpan()
+AnySpan = Union[Span, _NonRecordingSpan]
+
+current_span: ContextVar[Optional[Union[SpanContext, _NonRecordingSpan]]] = ContextVar("current_span", default=None)
+
+_SIN_PADRE = object()
+
+
+# --- Exportadores (síncronos: corren en un hilo desde la tarea de exportación) ---
+
+class JsonlExporter:
+    """Un span por línea (JSON) agregado al final del archivo"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span], service_name: str) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps({"servicio": service_name, **span.to_dict()}, ensure_ascii=False, default=str))
+                f.write("\n")
+
+    def close(self) -> None:
+        pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class OtlpHttpExporter:
+    """POST de lotes en OTLP/HTTP con codificación JSON (/v1/traces)"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.client = httpx.Client(timeout=timeout)
+
+    def export(self, spans: List[Span], service_name: str) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "app.tracing"},
+                    "spans": [
+                        {
+                            "traceId": span.trace_id,
+                            "spanId": span.span_id,
+                            **({"parentSpanId": span.parent_id} if span.parent_id else {}),
+                            "name": span.name,
+                            "kind": TIPOS_SPAN.get(span.kind, 1),
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": _otlp_attributes(span.attributes),
+                            "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+                        }
+                        for span in spans
+                    ],
+                }],
+            }]
+        }
+        response = self.client.post(self.endpoint, json=payload)
+        response.raise_for_status()
+
+    def close(self) -> None:
+        self.client.close()
+
+
+# --- Tracer ---
+
+class Tracer:
+    """Crea spans, aplica el muestreo en la cabecera y exporta los terminados en lotes"""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        sample_rate: float = 0.1,
+        exporter: Optional[Union[JsonlExporter, OtlpHttpExporter]] = None,
+        service_name: str = "smartfloors-api",
+        max_queue: int = 10000,
+        batch_size: int = 512,
+        export_interval_seconds: float = 5.0
+    ):
+        self.enabled = enabled and exporter is not None
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.export_interval = export_interval_seconds
+        # Los spans pueden terminar en hilos (motor síncrono, to_thread): deque con append atómico
+        self.queue: Deque[Span] = deque(maxlen=max_queue)
+        self.finished = 0
+        self.exported = 0
+        self.export_errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def dropped(self) -> int:
+        """Spans descartados por cola llena (terminados que no llegaron a exportarse ni están en cola)"""
+        return self.finished - self.exported - len(self.queue) - self.export_errors
+
+    def start_span(self, name: str, kind: str = "internal", parent: Any = _SIN_PADRE, attributes: Optional[Dict[str, Any]] = None) -> AnySpan:
+        """Abre un span hijo de `parent` (por defecto el actual); sin padre decide el muestreo de la traza"""
+        if parent is _SIN_PADRE:
+            parent = current_span.get()
+        if parent is None:
+            if random.random() >= self.sample_rate:
+                return NON_RECORDING_SPAN
+            return Span(os.urandom(16).hex(), None, name, kind, attributes or {})
+        if not parent.sampled:
+            return NON_RECORDING_SPAN
+        return Span(parent.trace_id, parent.span_id, name, kind, attributes or {})
+
+    def end_span(self, span: AnySpan) -> None:
+        if isinstance(span, Span):
+            span.end_ns = time.time_ns()
+            self.finished += 1
+            self.queue.append(span)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", parent: Any = _SIN_PADRE, **attributes) -> Iterator[AnySpan]:
+        """Span como bloque `with` (también dentro de corrutinas); registra la excepción si la hay"""
+        if not self.enabled:
+            yield NON_RECORDING_SPAN
+            return
+        span = self.start_span(name, kind, parent, attributes)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            current_span.reset(token)
+            self.end_span(span)
+
+    def current_context(self) -> Optional[Union[SpanContext, _NonRecordingSpan]]:
+        """Contexto para continuar la traza fuera del request (p. ej. en un trabajo encolado), con su decisión de muestreo"""
+        span = current_span.get() if self.enabled else None
+        if span is None or not span.sampled:
+            return span
+        return SpanContext(span.trace_id, span.span_id, True)
+
+    def instrument_engine(self, engine: Engine) -> None:
+        """Un span por sentencia SQL, solo dentro de una traza muestreada (para async: engine.sync_engine)"""
+        system = engine.dialect.name
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            parent = current_span.get()
+            if parent is None or not parent.sampled:
+                return
+            operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+            context._trace_span = Span(parent.trace_id, parent.span_id, f"SQL {operation}", "client", {
+                "db.system": system,
+                "db.operation": operation,
+                "db.statement": normalize_statement(statement)[:MAX_STATEMENT_CHARS],
+                "db.executemany": executemany,
+            })
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            span = getattr(context, "_trace_span", None)
+            if span is not None:
+                span.set_attribute("db.rowcount", cursor.rowcount)
+                self.end_span(span)
+
+        @event.listens_for(engine, "handle_error")
+        def _handle_error(exception_context):
+            span = getattr(exception_context.execution_context, "_trace_span", None)
+            if span is not None:
+                span.record_exception(exception_context.original_exception)
+                self.end_span(span)
+
+    # --- Exportación ---
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.enabled:
+            await self.flush()
+            self.exporter.close()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.export_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        while self.queue:
+            batch = []
+            while self.queue and len(batch) < self.batch_size:
+                batch.append(self.queue.popleft())
+            try:
+                await asyncio.to_thread(self.exporter.export, batch, self.service_name)
+                self.exported += len(batch)
+            except Exception as e:
+                self.export_errors += len(batch)
+                print(f"Error exportando {len(batch)} spans: {e}")
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "activo": self.enabled,
+            "sample_rate": self.sample_rate,
+            "exportador": type(self.exporter).__name__ if self.exporter else None,
+            "terminados": self.finished,
+            "exportados": self.exported,
+            "en_cola": len(self.queue),
+            "errores_exportacion": self.export_errors,
+            "descartados": self.dropped,
+        }
+
+
+def traced(name: Optional[str] = None, kind: str = "internal") -> Callable:
+    """Decorador: un span por llamada (funciones y corrutinas); sin trazas activas solo agrega una comparación"""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await func(*args, **kwargs)
+                with tracer.span(span_name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def _build_exporter() -> Optional[Union[JsonlExporter, OtlpHttpExporter]]:
+    if not settings.TRACING_ENABLED:
+        return None
+    if settings.TRACING_EXPORTER == "otlp":
+        return OtlpHttpExporter(settings.TRACING_OTLP_ENDPOINT)
+    return JsonlExporter(settings.TRACING_JSONL_PATH)
+
+
+tracer = Tracer(
+    enabled=settings.TRACING_ENABLED,
+    sample_rate=settings.TRACING_SAMPLE_RATE,
+    exporter=_build_exporter(),
+    service_name=settings.TRACING_SERVICE_NAME,
+    max_queue=settings.TRACING_MAX_QUEUE,
+    export_interval_seconds=settings.TRACING_EXPORT_INTERVAL_SECONDS
+)
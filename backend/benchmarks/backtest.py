@@ -0,0 +1,286 @@
+"""
+Backtesting de los modelos de pronóstico con orígenes móviles.
+
+Reproduce una serie de lecturas (sintética, de la base de datos local o de un
+archivo Parquet/CSV) a través de cada método de pronóstico y reporta, por
+variable y horizonte, MAE, RMSE y cobertura del intervalo de confianza junto
+con la latencia p50/p99 del cálculo y la memoria pico.
+
+Uso:
+    python -m benchmarks.backtest --source synthetic --days 5
+    python -m benchmarks.backtest --source db --edificio A --piso 1 --hours 96
+    python -m benchmarks.backtest --source parquet --path lecturas.parquet --piso 2
+"""
+import argparse
+import json
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+from app.config import settings
+from app.services.forecasting import VARIABLES_PREDICCION, MODELOS_ONLINE
+from app.services.prediction_service import PredictionService, MODELO_PROMEDIO_MOVIL
+from app.services.trained_models import MODELOS_ENTRENADOS
+
+
+COLUMNAS = [config["columna"] for config in VARIABLES_PREDICCION.values()]
+METODOS = [MODELO_PROMEDIO_MOVIL, *MODELOS_ONLINE, *MODELOS_ENTRENADOS]
+
+
+# --- Fuentes de datos ---
+
+def synthetic_series(days: int = 5, seed: int = 42) -> pd.DataFrame:
+    """Serie de un minuto con ciclo diario, ruido y episodios de estrés"""
+    rng = np.random.default_rng(seed)
+    n = days * 24 * 60
+    timestamps = pd.date_range(datetime.utcnow() - timedelta(days=days), periods=n, freq="min", tz="UTC")
+    hour = (timestamps.hour + timestamps.minute / 60.0).to_numpy()
+    daily = np.sin(2 * np.pi * (hour - 9) / 24)
+
+    # Episodios de estrés de ~2 horas, en promedio uno por día
+    stress = np.zeros(n)
+    for start in rng.integers(0, n - 120, size=days):
+        stress[start:start + 120] += np.hanning(120)
+
+    temp = 24 + 1.5 * daily + 4 * stress + rng.normal(0, 0.2, n).cumsum() * 0.02 + rng.normal(0, 0.15, n)
+    humedad = 55 - 5 * daily + 3 * stress + rng.normal(0, 0.8, n)
+    energia = 12 + 3 * np.clip(daily, 0, None) + 8 * stress + rng.normal(0, 0.5, n)
+
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "temp_c": temp,
+        "humedad_pct": np.clip(humedad, 0, 100),
+        "energia_kw": np.clip(energia, 0, None),
+    })
+
+
+def load_db_series(edificio: str, piso: int, hours: int) -> pd.DataFrame:
+    """Lee las lecturas de un piso desde la base de datos configurada en DATABASE_URL"""
+    from app.database import SessionLocal
+    from app.models.lectura import Lectura
+
+    cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            Lectura.timestamp, Lectura.temp_c, Lectura.humedad_pct, Lectura.energia_kw
+        ).filter(
+            Lectura.edificio == edificio,
+            Lectura.piso == piso,
+            Lectura.timestamp >= cutoff_time
+        ).order_by(Lectura.timestamp.asc()).all()
+    finally:
+        db.close()
+    return pd.DataFrame(rows, columns=["timestamp", *COLUMNAS])
+
+
+def load_file_series(path: str, piso: int = None) -> pd.DataFrame:
+    """Lee un fixture Parquet o CSV con columnas timestamp, temp_c, humedad_pct, energia_kw (y opcionalmente piso)"""
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    if piso is not None and "piso" in df.columns:
+        df = df[df["piso"] == piso]
+    return df[["timestamp", *COLUMNAS]]
+
+
+def to_minute_grid(df: pd.DataFrame) -> pd.DataFrame:
+    """Lleva la serie a una grilla regular de un minuto"""
+    df = df.copy()
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    df[COLUMNAS] = df[COLUMNAS].astype(float)
+    grid = df.set_index("timestamp")[COLUMNAS].resample("1min").mean().interpolate(limit_area="inside").dropna()
+    return grid.reset_index()
+
+
+# --- Métodos ---
+
+Forecaster = Callable[[int, datetime, int], Tuple[np.ndarray, np.ndarray, np.ndarray]]
+Advance = Callable[[int], None]
+
+
+def _no_advance(origin: int) -> None:
+    pass
+
+
+def build_forecaster(metodo: str, df: pd.DataFrame, train_end: int) -> Tuple[Advance, Forecaster]:
+    """Prepara un método sobre el tramo de entrenamiento.
+
+    Retorna (advance, serve): advance incorpora las lecturas hasta el origen
+    (fuera de la medición de latencia, como la ingesta en producción) y serve
+    es la ruta de una petición de predicción.
+    """
+    service = PredictionService(None)
+    timestamps = df["timestamp"].to_numpy()
+    matrix = df[COLUMNAS].to_numpy(dtype=float)
+    window = settings.PREDICTION_WINDOW_HOURS * 60
+
+    def arrays(forecast):
+        series = [forecast["variables"][variable] for variable in VARIABLES_PREDICCION]
+        return tuple(np.vstack([serie[key] for serie in series]) for key in ("values", "lower", "upper"))
+
+    if metodo == MODELO_PROMEDIO_MOVIL:
+        # Lo mismo que una petición: leer la ventana reciente y calcular
+        def serve(origin, base_time, horizon):
+            history = df.iloc[max(origin + 1 - window, 0):origin + 1]
+            return arrays(service.forecast(history, horizon, base_time))
+        return _no_advance, serve
+
+    if metodo in MODELOS_ONLINE:
+        # Ajuste offline una vez y luego actualizaciones O(1) hasta cada origen
+        model_class = MODELOS_ONLINE[metodo]
+        models = [model_class.fit(timestamps[:train_end], matrix[:train_end, i]) for i in range(len(COLUMNAS))]
+        position = {"next": train_end}
+
+        def advance(origin):
+            for j in range(position["next"], origin + 1):
+                ts = pd.Timestamp(timestamps[j]).to_pydatetime()
+                for i, model in enumerate(models):
+                    model.update(ts, matrix[j, i])
+            position["next"] = origin + 1
+
+        def serve(origin, base_time, horizon):
+            results = [model.forecast(base_time, horizon) for model in models]
+            predicted = np.vstack([r[0] for r in results])
+            band = np.vstack([r[1] for r in results])
+            return arrays(service._package(predicted, band, horizon, base_time))
+        return advance, serve
+
+    if metodo in MODELOS_ENTRENADOS:
+        # Entrenamiento una vez; en cada origen solo inferencia sobre la ventana reciente
+        model_class = MODELOS_ENTRENADOS[metodo]
+        models = [model_class.fit(timestamps[:train_end], matrix[:train_end, i]) for i in range(len(COLUMNAS))]
+
+        def serve(origin, base_time, horizon):
+            start = max(origin + 1 - window, 0)
+            results = [
+                model.forecast(base_time, horizon, timestamps[start:origin + 1], matrix[start:origin + 1, i])
+                for i, model in enumerate(models)
+            ]
+            predicted = np.vstack([r[0] for r in results])
+            band = np.vstack([r[1] for r in results])
+            return arrays(service._package(predicted, band, horizon, base_time))
+        return _no_advance, serve
+
+    raise ValueError(f"Método desconocido: {metodo}")
+
+
+# --- Backtest ---
+
+def backtest(
+    df: pd.DataFrame,
+    metodos: List[str],
+    horizons: List[int],
+    train_minutes: int,
+    step_minutes: int
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Evalúa cada método con orígenes móviles; retorna (métricas de error, costo de cómputo)"""
+    df = to_minute_grid(df)
+    max_horizon = max(horizons)
+    origins = np.arange(train_minutes, len(df) - max_horizon, step_minutes)
+    if len(origins) == 0:
+        raise ValueError("La serie es demasiado corta para el entrenamiento y el horizonte pedidos")
+
+    matrix = df[COLUMNAS].to_numpy(dtype=float)
+    horizon_idx = np.asarray(horizons) - 1
+    error_rows = []
+    cost_rows = []
+
+    for metodo in metodos:
+        fit_started = time.perf_counter()
+        advance, serve = build_forecaster(metodo, df, int(origins[0]))
+        fit_seconds = time.perf_counter() - fit_started
+
+        # errores[origen, variable, horizonte]
+        errors = np.empty((len(origins), len(COLUMNAS), len(horizons)))
+        covered = np.empty_like(errors, dtype=bool)
+        latencies = np.empty(len(origins))
+
+        tracemalloc.start()
+        for n, origin in enumerate(origins):
+            base_time = pd.Timestamp(df["timestamp"].iloc[origin]).tz_convert(None).to_pydatetime()
+            advance(int(origin))
+            started = time.perf_counter()
+            values, lower, upper = serve(int(origin), base_time, max_horizon)
+            latencies[n] = time.perf_counter() - started
+
+            actual = matrix[origin + 1:origin + 1 + max_horizon].T[:, horizon_idx]
+            errors[n] = values[:, horizon_idx] - actual
+            covered[n] = (actual >= lower[:, horizon_idx]) & (actual <= upper[:, horizon_idx])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        for i, variable in enumerate(VARIABLES_PREDICCION):
+            for j, horizon in enumerate(horizons):
+                error_rows.append({
+                    "metodo": metodo,
+                    "variable": variable,
+                    "horizonte_min": horizon,
+                    "mae": float(np.mean(np.abs(errors[:, i, j]))),
+                    "rmse": float(np.sqrt(np.mean(errors[:, i, j] ** 2))),
+                    "cobertura": float(np.mean(covered[:, i, j])),
+                })
+
+        cost_rows.append({
+            "metodo": metodo,
+            "origenes": len(origins),
+            "ajuste_s": round(fit_seconds, 3),
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000),
+            "memoria_pico_kb": peak / 1024,
+        })
+
+    return pd.DataFrame(error_rows), pd.DataFrame(cost_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtesting de modelos de pronóstico SmartFloors")
+    parser.add_argument("--source", choices=["synthetic", "db", "parquet", "csv"], default="synthetic")
+    parser.add_argument("--path", help="Archivo Parquet/CSV para --source parquet|csv")
+    parser.add_argument("--edificio", default="A")
+    parser.add_argument("--piso", type=int, default=1)
+    parser.add_argument("--hours", type=int, default=96, help="Horas de historia a leer de la base de datos")
+    parser.add_argument("--days", type=int, default=5, help="Días de serie sintética")
+    parser.add_argument("--methods", default=",".join(METODOS), help="Métodos separados por coma")
+    parser.add_argument("--horizons", default="1,15,60,240", help="Horizontes en minutos separados por coma")
+    parser.add_argument("--train-hours", type=int, default=48, help="Historia previa al primer origen")
+    parser.add_argument("--step", type=int, default=30, help="Minutos entre orígenes")
+    parser.add_argument("--output", help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    if args.source == "synthetic":
+        df = synthetic_series(args.days)
+    elif args.source == "db":
+        df = load_db_series(args.edificio, args.piso, args.hours)
+    else:
+        if not args.path:
+            parser.error("--path es obligatorio para --source parquet|csv")
+        df = load_file_series(args.path, args.piso)
+
+    metodos = [m.strip() for m in args.methods.split(",") if m.strip()]
+    horizons = [int(h) for h in args.horizons.split(",")]
+    minutos = len(to_minute_grid(df))
+    necesarios = args.train_hours * 60 + max(horizons) + 1
+    if minutos < necesarios:
+        parser.error(
+            f"la serie tiene {minutos} minutos y --train-hours {args.train_hours} con horizonte {max(horizons)} "
+            f"requiere al menos {necesarios}; use una serie más larga o un --train-hours menor"
+        )
+    errors, costs = backtest(df, metodos, horizons, args.train_hours * 60, args.step)
+
+    pd.set_option("display.width", 160)
+    print("\nPrecisión por horizonte")
+    print(errors.pivot_table(
+        index=["variable", "horizonte_min"], columns="metodo", values=["mae", "rmse", "cobertura"]
+    ).round(3).to_string())
+    print("\nCosto de cómputo por origen")
+    print(costs.round(3).to_string(index=False))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"errores": errors.to_dict("records"), "costos": costs.to_dict("records")}, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""
+Generador de carga de una flota de sensores contra la API.
+
+Simula N edificios x M pisos de sensores (temperatura con ciclo diario, energía
+según la ocupación del edificio y episodios de estrés) y envía sus lecturas a los
+endpoints reales de ingesta a una tasa fija, mientras lectores concurrentes
+repiten el tráfico del frontend (dashboard, pisos, alertas, predicciones y
+tendencias). Al final reporta el rendimiento sostenido, los percentiles de
+latencia y la tasa de errores por ruta.
+
+La tasa es de lazo abierto: cada envío tiene una hora programada y la latencia se
+mide desde ella, así que si la API (o el cliente, con --ingest-concurrency) no da
+abasto, la espera aparece en la latencia en lugar de bajar la tasa en silencio.
+Cada lectura avanza el reloj simulado de su sensor en --sensor-interval segundos;
+la corrida reproduce el pasado reciente y termina cerca de la hora actual.
+
+Uso:
+    python -m benchmarks.load_test --url http://localhost:8000 --buildings 10 --floors 3 --rate 200
+    python -m benchmarks.load_test --mode binary --batch-size 500 --rate 5000 --readers 20
+    python -m benchmarks.load_test --in-process --duration 20 --output carga.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import statistics
+import string
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+import numpy as np
+
+
+MODOS_INGESTA = {
+    "single": "/api/v1/readings",
+    "batch": "/api/v1/readings/batch",
+    "binary": "/api/v1/readings/batch/binary",
+}
+
+# Valores base por piso del generador de la API; los pisos adicionales repiten el ciclo
+VALORES_BASE = [
+    {"temp": 24.0, "humedad": 55.0, "energia": 12.0},
+    {"temp": 24.5, "humedad": 58.0, "energia": 13.5},
+    {"temp": 23.5, "humedad": 52.0, "energia": 11.5},
+]
+
+
+def building_names(count: int) -> List[str]:
+    """A, B, ..., Z, AA, AB, ... (edificio admite hasta 10 caracteres)"""
+    names = []
+    for i in range(count):
+        name = ""
+        i += 1
+        while i:
+            i, rest = divmod(i - 1, 26)
+            name = string.ascii_uppercase[rest] + name
+        names.append(name)
+    return names
+
+
+def occupancy(hour: float, weekday: int) -> float:
+    """Fracción de ocupación del edificio: jornada de 8 a 19 con baja al almuerzo, casi vacío de noche y fin de semana"""
+    if weekday >= 5:
+        return 0.1 if 10 <= hour < 16 else 0.03
+    if hour < 7 or hour >= 21:
+        return 0.03
+    if hour < 9:
+        return 0.03 + 0.97 * (hour - 7) / 2
+    if hour >= 19:
+        return 1.0 - 0.97 * (hour - 19) / 2
+    return 0.7 if 13 <= hour < 14 else 1.0
+
+
+class Sensor:
+    """Sensor de un piso con reloj simulado propio y episodios de estrés"""
+
+    def __init__(self, edificio: str, piso: int, start: datetime, rng: random.Random):
+        base = VALORES_BASE[(piso - 1) % len(VALORES_BASE)]
+        self.edificio = edificio
+        self.piso = piso
+        self.clock = start
+        self.rng = rng
+        # Cada edificio tiene su propio clima y equipamiento
+        self.temp_base = base["temp"] + rng.uniform(-0.8, 0.8)
+        self.humedad_base = base["humedad"] + rng.uniform(-4, 4)
+        self.energia_base = base["energia"] * rng.uniform(0.8, 1.3)
+        self.stress_left = 0
+        self.stress_length = 0
+        self.stress_peak = (0.0, 0.0)
+
+    def next(self, interval_seconds: float, stress_per_hour: float) -> Dict[str, Any]:
+        timestamp = self.clock
+        self.clock += timedelta(seconds=interval_seconds)
+        hour = timestamp.hour + timestamp.minute / 60
+        ocupacion = occupancy(hour, timestamp.weekday())
+
+        # Episodio de estrés (falla de climatización, sobrecarga): sube y baja en campana
+        if self.stress_left == 0 and self.rng.random() < stress_per_hour * interval_seconds / 3600:
+            self.stress_length = self.stress_left = max(2, int(self.rng.uniform(20, 90) * 60 / interval_seconds))
+            self.stress_peak = (self.rng.uniform(3, 6), self.rng.uniform(5, 12))
+        stress = 0.0
+        if self.stress_left:
+            stress = math.sin(math.pi * (self.stress_length - self.stress_left + 0.5) / self.stress_length)
+            self.stress_left -= 1
+
+        diurno = math.sin(2 * math.pi * (hour - 9) / 24)
+        temp = self.temp_base + 1.5 * diurno + 1.2 * ocupacion + self.stress_peak[0] * stress + self.rng.gauss(0, 0.15)
+        humedad = self.humedad_base - 4 * diurno + 3 * ocupacion + self.rng.gauss(0, 0.8)
+        energia = self.energia_base * (0.35 + 0.9 * ocupacion) + self.stress_peak[1] * stress + self.rng.gauss(0, 0.4)
+        return {
+            "timestamp": timestamp,
+            "edificio": self.edificio,
+            "piso": self.piso,
+            "temp_c": round(min(max(temp, 15.0), 40.0), 2),
+            "humedad_pct": round(min(max(humedad, 15.0), 90.0), 2),
+            "energia_kw": round(max(energia, 0.5), 2),
+        }
+
+
+class SensorFleet:
+    """Todos los sensores; las lecturas salen en turno rotativo para que cada reloj avance parejo"""
+
+    def __init__(self, buildings: int, floors: int, start: datetime, interval_seconds: float, stress_per_hour: float, seed: int):
+        rng = random.Random(seed)
+        self.sensors = [
+            Sensor(edificio, piso, start, random.Random(rng.random()))
+            for edificio in building_names(buildings)
+            for piso in range(1, floors + 1)
+        ]
+        self.interval = interval_seconds
+        self.stress_per_hour = stress_per_hour
+        self._cursor = 0
+
+    def take(self, count: int) -> List[Dict[str, Any]]:
+        readings = []
+        for _ in range(count):
+            readings.append(self.sensors[self._cursor].next(self.interval, self.stress_per_hour))
+            self._cursor = (self._cursor + 1) % len(self.sensors)
+        return readings
+
+
+def encode_request(mode: str, readings: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Argumentos de httpx para el endpoint de ingesta del modo"""
+    if mode == "single":
+        reading = readings[0]
+        return {"json": {**reading, "timestamp": reading["timestamp"].isoformat()}}
+    if mode == "batch":
+        return {"json": {"readings": [{**reading, "timestamp": reading["timestamp"].isoformat()} for reading in readings]}}
+
+    from app.services.binary_readings import CONTENT_TYPE_STRUCT, encode_struct
+    body = encode_struct({
+        "timestamp_ms": [int(reading["timestamp"].timestamp() * 1000) for reading in readings],
+        **{name: [reading[name] for reading in readings] for name in ("edificio", "piso", "temp_c", "humedad_pct", "energia_kw")},
+    })
+    return {"content": body, "headers": {"content-type": CONTENT_TYPE_STRUCT}}
+
+
+def accepted_readings(mode: str, response: httpx.Response) -> int:
+    """Lecturas aceptadas (insertadas o en el spool) según la respuesta de ingesta"""
+    if response.status_code not in (201, 202):
+        return 0
+    if mode == "single":
+        return 1
+    body = response.json()
+    return body.get("created", 0) + body.get("spooled", 0)
+
+
+# --- Registro de resultados ---
+
+class Results:
+    """Latencias, códigos de estado y lecturas aceptadas por ruta, sin el período de calentamiento"""
+
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.routes: Dict[str, Dict[str, Any]] = {}
+        self.accepted_per_second: Dict[int, int] = {}
+        self.readings_sent = 0
+        self.readings_accepted = 0
+        self.max_start_delay = 0.0
+
+    def record(self, route: str, scheduled: float, latency: float, status: Optional[int], error: Optional[str] = None, accepted: int = 0, sent: int = 0) -> None:
+        if scheduled < self.measure_from:
+            return
+        entry = self.routes.setdefault(route, {"latencias": [], "estados": {}, "errores": 0, "ejemplos_error": []})
+        entry["latencias"].append(latency)
+        key = str(status) if status is not None else "excepción"
+        entry["estados"][key] = entry["estados"].get(key, 0) + 1
+        if error is not None or status is None or status >= 400:
+            entry["errores"] += 1
+            if len(entry["ejemplos_error"]) < 3:
+                entry["ejemplos_error"].append(error or key)
+        if sent:
+            self.readings_sent += sent
+            self.readings_accepted += accepted
+            second = int(scheduled - self.measure_from + latency)
+            self.accepted_per_second[second] = self.accepted_per_second.get(second, 0) + accepted
+
+    def summary(self, elapsed: float, window: float) -> Dict[str, Any]:
+        routes = {}
+        for route, entry in sorted(self.routes.items()):
+            latencies = np.array(entry["latencias"]) * 1000
+            routes[route] = {
+                "requests": len(latencies),
+                "req_por_s": round(len(latencies) / elapsed, 2),
+                "errores": entry["errores"],
+                "tasa_error": round(entry["errores"] / len(latencies), 4),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+                "p90_ms": round(float(np.percentile(latencies, 90)), 2),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+                "max_ms": round(float(latencies.max()), 2),
+                "estados": entry["estados"],
+                "ejemplos_error": entry["ejemplos_error"],
+            }
+        # Segundos completos de la ventana programada (los envíos en vuelo al final no la extienden)
+        per_second = [self.accepted_per_second.get(second, 0) for second in range(max(1, int(window)))]
+        return {
+            "segundos_medidos": round(elapsed, 2),
+            "lecturas_enviadas": self.readings_sent,
+            "lecturas_aceptadas": self.readings_accepted,
+            "lecturas_por_s": round(self.readings_accepted / elapsed, 2),
+            "lecturas_por_s_mediana": statistics.median(per_second),
+            "lecturas_por_s_minimo": min(per_second),
+            "retraso_max_inicio_ms": round(self.max_start_delay * 1000, 2),
+            "rutas": routes,
+        }
+
+
+# --- Tráfico ---
+
+async def timed_request(
+    client: httpx.AsyncClient,
+    results: Results,
+    route: str,
+    scheduled: float,
+    method: str,
+    path: str,
+    mode: Optional[str] = None,
+    sent: int = 0,
+    **kwargs
+) -> None:
+    """Request medido desde su hora programada; con `sent` cuenta además las lecturas aceptadas"""
+    try:
+        response = await client.request(method, path, **kwargs)
+    except httpx.HTTPError as e:
+        results.record(route, scheduled, time.perf_counter() - scheduled, None, f"{e.__class__.__name__}: {e}", sent=sent)
+        return
+    latency = time.perf_counter() - scheduled
+    error = response.text[:200] if response.status_code >= 400 else None
+    accepted = accepted_readings(mode, response) if sent else 0
+    results.record(route, scheduled, latency, response.status_code, error, accepted, sent)
+
+
+async def ingest_loop(client: httpx.AsyncClient, fleet: SensorFleet, results: Results, args, deadline: float) -> None:
+    """Envíos programados a tasa fija; como máximo --ingest-concurrency en vuelo"""
+    batch = 1 if args.mode == "single" else args.batch_size
+    period = batch / args.rate
+    route = f"POST {MODOS_INGESTA[args.mode]}"
+    slots = asyncio.Semaphore(args.ingest_concurrency)
+    tasks = set()
+
+    async def send(scheduled: float, readings: List[Dict[str, Any]]) -> None:
+        try:
+            await timed_request(
+                client, results, route, scheduled, "POST", MODOS_INGESTA[args.mode],
+                mode=args.mode, sent=len(readings), **encode_request(args.mode, readings)
+            )
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    for k in range(math.ceil((deadline - start) / period)):
+        scheduled = start + k * period
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await slots.acquire()
+        results.max_start_delay = max(results.max_start_delay, time.perf_counter() - scheduled)
+        task = asyncio.create_task(send(scheduled, fleet.take(batch)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def reader_loop(client: httpx.AsyncClient, results: Results, floors: List[int], think_seconds: float, deadline: float, seed: int) -> None:
+    """Un usuario con el dashboard abierto: cada refresco pide en paralelo lo mismo que el frontend"""
+    rng = random.Random(seed)
+    # Los lectores arrancan escalonados para no refrescar todos a la vez
+    await asyncio.sleep(rng.uniform(0, think_seconds))
+    while time.perf_counter() < deadline:
+        scheduled = time.perf_counter()
+        start = (datetime.now(timezone.utc) - timedelta(hours=4)).isoformat()
+        requests: List[Tuple[str, str, Dict[str, Any]]] = [
+            ("GET /api/v1/dashboard/summary", "/api/v1/dashboard/summary", {}),
+            ("GET /api/v1/alerts", "/api/v1/alerts", {"params": {"order_by": "desc", "limit": 50}}),
+        ]
+        for piso in floors:
+            requests.extend([
+                ("GET /api/v1/readings/floors/{piso}/current", f"/api/v1/readings/floors/{piso}/current", {}),
+                ("GET /api/v1/predictions/{piso}", f"/api/v1/predictions/{piso}", {"params": {"horizon": 60}}),
+                ("GET /api/v1/readings", "/api/v1/readings", {"params": {"piso": piso, "start": start, "limit": 240}}),
+            ])
+        await asyncio.gather(*(
+            timed_request(client, results, route, scheduled, "GET", path, **kwargs)
+            for route, path, kwargs in requests
+        ))
+        await asyncio.sleep(max(0.0, think_seconds * rng.uniform(0.5, 1.5) - (time.perf_counter() - scheduled)))
+
+
+async def run(args) -> Dict[str, Any]:
+    sensors = args.buildings * args.floors
+    # El reloj simulado termina cerca de ahora: cada sensor reporta ~rate*duración/sensores veces
+    reports_per_sensor = math.ceil(args.rate * (args.duration + args.warmup) / sensors)
+    start = datetime.now(timezone.utc) - timedelta(seconds=reports_per_sensor * args.sensor_interval)
+    fleet = SensorFleet(args.buildings, args.floors, start, args.sensor_interval, args.stress_per_hour, args.seed)
+    limits = httpx.Limits(max_connections=args.ingest_concurrency + args.readers * 16)
+    timeout = httpx.Timeout(args.timeout)
+
+    async def drive(client: httpx.AsyncClient) -> Dict[str, Any]:
+        begin = time.perf_counter()
+        results = Results(measure_from=begin + args.warmup)
+        deadline = begin + args.warmup + args.duration
+        reader_floors = list(range(1, min(args.floors, 3) + 1)) if args.reader_floors is None else args.reader_floors
+        await asyncio.gather(
+            ingest_loop(client, fleet, results, args, deadline),
+            *(reader_loop(client, results, reader_floors, args.reader_think, deadline, args.seed + i) for i in range(args.readers))
+        )
+        elapsed = time.perf_counter() - results.measure_from
+        return results.summary(elapsed, args.duration)
+
+    if args.in_process:
+        from app.main import app
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://carga", timeout=timeout) as client:
+                summary = await drive(client)
+    else:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+            summary = await drive(client)
+
+    return {
+        "configuracion": {
+            "edificios": args.buildings,
+            "pisos": args.floors,
+            "sensores": sensors,
+            "modo": args.mode,
+            "lote": 1 if args.mode == "single" else args.batch_size,
+            "tasa_objetivo": args.rate,
+            "lectores": args.readers,
+            "destino": "en proceso" if args.in_process else args.url,
+        },
+        **summary,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    config = report["configuracion"]
+    print(
+        f"{config['edificios']} edificios x {config['pisos']} pisos ({config['sensores']} sensores), "
+        f"modo {config['modo']} (lote {config['lote']}), {config['lectores']} lectores, {report['segundos_medidos']} s medidos"
+    )
+    print(
+        f"Lecturas aceptadas: {report['lecturas_aceptadas']}/{report['lecturas_enviadas']} "
+        f"-> {report['lecturas_por_s']}/s (objetivo {config['tasa_objetivo']}/s, "
+        f"mediana por segundo {report['lecturas_por_s_mediana']}, mínimo {report['lecturas_por_s_minimo']})"
+    )
+    if report["retraso_max_inicio_ms"] > 1000:
+        print(f"Advertencia: los envíos se atrasaron hasta {report['retraso_max_inicio_ms']:.0f} ms (sin cupo en --ingest-concurrency)")
+    print(f"\n{'ruta':<46} {'req':>7} {'req/s':>8} {'error':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'máx. ms':>9}")
+    for route, stats in report["rutas"].items():
+        print(
+            f"{route:<46} {stats['requests']:>7} {stats['req_por_s']:>8} {stats['tasa_error']:>7.2%} "
+            f"{stats['p50_ms']:>9} {stats['p90_ms']:>9} {stats['p99_ms']:>9} {stats['max_ms']:>9}"
+        )
+        if stats["errores"]:
+            print(f"    estados {stats['estados']}; ej.: {stats['ejemplos_error'][0][:120]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de carga de una flota de sensores SmartFloors")
+    parser.add_argument("--url", default="http://localhost:8000", help="URL base de la API")
+    parser.add_argument("--in-process", action="store_true", help="Levantar la API en este proceso (sin red; comparte el event loop)")
+    parser.add_argument("--buildings", type=int, default=5, help="Edificios simulados")
+    parser.add_argument("--floors", type=int, default=3, help="Pisos por edificio")
+    parser.add_argument("--mode", choices=list(MODOS_INGESTA), default="batch", help="Endpoint de ingesta")
+    parser.add_argument("--batch-size", type=int, default=50, help="Lecturas por request en los modos batch y binary")
+    parser.add_argument("--rate", type=float, default=100, help="Lecturas por segundo objetivo")
+    parser.add_argument("--ingest-concurrency", type=int, default=32, help="Requests de ingesta en vuelo como máximo")
+    parser.add_argument("--readers", type=int, default=5, help="Usuarios con el dashboard abierto")
+    parser.add_argument("--reader-think", type=float, default=2.0, help="Segundos entre refrescos de cada lector (el frontend usa 60)")
+    parser.add_argument("--reader-floors", type=int, nargs="*", help="Pisos que consultan los lectores (por defecto 1..min(floors, 3))")
+    parser.add_argument("--duration", type=float, default=60, help="Segundos medidos")
+    parser.add_argument("--warmup", type=float, default=5, help="Segundos iniciales descartados")
+    parser.add_argument("--sensor-interval", type=float, default=60, help="Segundos simulados entre lecturas de un sensor")
+    parser.add_argument("--stress-per-hour", type=float, default=0.05, help="Probabilidad de un episodio de estrés por sensor y hora simulada")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout por request en segundos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Guardar el reporte en JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Verificación de presupuestos de sentencias SQL por ruta.
+
+Levanta la API en el mismo proceso (sin servidor HTTP), recorre las rutas de
+QUERY_BUDGETS contra la base configurada en DATABASE_URL y termina con código 1
+si alguna ejecuta más sentencias que su presupuesto. Pensado para correrlo
+antes de subir cambios que toquen consultas:
+
+Uso:
+    python -m benchmarks.query_budgets
+    python -m benchmarks.query_budgets --repeat 3 --output presupuestos.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Dict, List
+import httpx
+from app.main import app
+from app.middleware.query_budget import query_tracker
+
+
+# Valores para los parámetros de ruta de las plantillas
+PARAMETROS_RUTA = {"piso": "1", "edificio": "A"}
+
+
+async def check(repeat: int = 1) -> List[Dict]:
+    query_tracker.reset()
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://budget") as client:
+            params = dict(PARAMETROS_RUTA)
+            for endpoint, budget in query_tracker.budgets.items():
+                method, template = endpoint.split(" ", 1)
+                if method != "GET":
+                    # Solo rutas de lectura: el chequeo no debe modificar datos
+                    results.append({"ruta": endpoint, "presupuesto": budget, "estado": "omitida (escritura)"})
+                    continue
+                try:
+                    path = template.format(**params)
+                except (KeyError, IndexError):
+                    results.append({"ruta": endpoint, "presupuesto": budget, "estado": "omitida (parámetros)"})
+                    continue
+                for _ in range(repeat):
+                    await client.request(method, path)
+
+    summary = query_tracker.summary()["rutas"]
+    for endpoint, budget in query_tracker.budgets.items():
+        route = summary.get(endpoint)
+        if route is None:
+            continue
+        results.append({
+            "ruta": endpoint,
+            "presupuesto": budget,
+            "max_sentencias": route["max_sentencias"],
+            "estado": "excedida" if route["excedidos"] else "ok",
+            "repetidas": route["repetidas"][:3],
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Presupuestos de sentencias SQL por ruta SmartFloors")
+    parser.add_argument("--repeat", type=int, default=1, help="Requests por ruta (la primera suele llenar cachés)")
+    parser.add_argument("--output", help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    # Los excesos se reportan aquí en lugar de levantar excepciones dentro del request
+    query_tracker.enforce = False
+    results = asyncio.run(check(args.repeat))
+
+    print(f"{'ruta':<52} {'presup.':>8} {'máx.':>6}  estado")
+    for result in results:
+        print(f"{result['ruta']:<52} {result['presupuesto']:>8} {result.get('max_sentencias', '-'):>6}  {result['estado']}")
+        for repeated in result.get("repetidas", []):
+            print(f"    {repeated['max_por_request']} x {repeated['sentencia'][:110]}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if any(result["estado"] == "excedida" for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
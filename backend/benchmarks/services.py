@@ -0,0 +1,414 @@
+"""
+Micro-benchmarks de las funciones de servicio más usadas, con línea base guardada.
+
+Crea una base de datos desechable (una base temporal en el servidor Postgres de
+DATABASE_URL, o un archivo SQLite temporal con --sqlite), la llena con umbrales
+y unas horas de lecturas sintéticas y mide:
+
+- AlertService.get_threshold_level y check_reading_alerts (lectura normal y con excedencia)
+- PredictionService.predict_temperature a 60 y 240 minutos
+- AIService._get_fallback_recommendation
+- DataGeneratorService.import_from_json con --import-rows lecturas (10.000 por defecto)
+- get_dashboard_summary (DashboardService.get_summary, con una sesión directa)
+
+Los casos cuyo SQL es propio de Postgres (INSERT ... ON CONFLICT de los modelos
+en línea) se omiten en SQLite. Con --save-baseline los resultados quedan en
+benchmarks/baselines/; con --compare se comparan las medianas contra esa línea
+base y el comando termina con código 1 si alguna empeora más que --tolerance.
+Las líneas base solo son comparables en la misma máquina y motor de base de datos.
+Con READINGS_COMPACT_LAYOUT=true (solo Postgres) los casos corren sobre el formato
+compacto de lecturas.
+
+Uso:
+    python -m benchmarks.services
+    python -m benchmarks.services --sqlite
+    python -m benchmarks.services --save-baseline
+    python -m benchmarks.services --compare --tolerance 0.25
+    python -m benchmarks.services --casos alertas dashboard --import-rows 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.engine import make_url
+from app.config import settings
+
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Horas de lecturas sembradas por piso (el dashboard mira las últimas 4)
+HORAS_SEMBRADAS = 6
+PISOS = [1, 2, 3]
+
+
+# --- Base de datos desechable ---
+
+def create_throwaway_database(sqlite: bool) -> Tuple[str, str, Callable[[], None]]:
+    """Crea la base temporal; retorna (URL síncrona, URL asíncrona, función de limpieza)"""
+    if sqlite:
+        fd, path = tempfile.mkstemp(prefix="smartfloors_bench_", suffix=".db")
+        os.close(fd)
+        return f"sqlite:///{path}", f"sqlite+aiosqlite:///{path}", lambda: os.remove(path)
+
+    url = make_url(settings.DATABASE_URL)
+    name = f"smartfloors_bench_{os.getpid()}"
+    # CREATE/DROP DATABASE no pueden correr dentro de una transacción
+    admin = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+
+    def drop() -> None:
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+        admin.dispose()
+
+    bench_url = url.set(database=name)
+    async_url = bench_url.set(drivername="postgresql+asyncpg")
+    return (
+        bench_url.render_as_string(hide_password=False),
+        async_url.render_as_string(hide_password=False),
+        drop
+    )
+
+
+def configure_settings(sync_url: str, async_url: str) -> None:
+    """Apunta la aplicación a la base temporal; debe llamarse antes de importar app.database"""
+    settings.DATABASE_URL = sync_url
+    settings.ASYNC_DATABASE_URL = async_url
+    # Recomendaciones predefinidas: el benchmark no depende de la red
+    settings.GEMINI_API_KEY = None
+    # Los planes EXPLAIN en segundo plano competirían con las mediciones
+    settings.SLOW_QUERY_EXPLAIN = False
+
+
+def seed(hours: int = HORAS_SEMBRADAS, seed_value: int = 7) -> None:
+    """Crea las tablas y siembra umbrales, lecturas de un minuto por piso y algunas alertas activas"""
+    from sqlalchemy import insert
+    from app.database import Base, SessionLocal, engine
+    from app.models import Alerta, EstadoModelo, Lectura, Piso, Prediccion, Umbral
+    from app.models.umbral import UMBRALES_INICIALES
+
+    # Suscripcion usa ARRAY de Postgres y ningún caso la necesita
+    tables = [model.__table__ for model in (Lectura, Alerta, Prediccion, Umbral, EstadoModelo, Piso)]
+    Base.metadata.create_all(bind=engine, tables=tables)
+
+    rng = np.random.default_rng(seed_value)
+    n = hours * 60
+    start = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(minutes=n)
+    hour = np.arange(n) / 60.0
+    rows = []
+    for piso in PISOS:
+        temp = 24 + 1.5 * np.sin(2 * np.pi * hour / 24) + rng.normal(0, 0.3, n)
+        humedad = 55 + rng.normal(0, 2, n)
+        energia = 12 + rng.normal(0, 1, n)
+        rows.extend(
+            {
+                "timestamp": start + timedelta(minutes=i),
+                "edificio": "A",
+                "piso": piso,
+                "temp_c": round(float(temp[i]), 2),
+                "humedad_pct": round(float(humedad[i]), 2),
+                "energia_kw": round(float(energia[i]), 2),
+            }
+            for i in range(n)
+        )
+
+    with SessionLocal() as db:
+        db.execute(insert(Umbral), UMBRALES_INICIALES)
+        db.execute(insert(Piso), [{"edificio": "A", "piso": piso} for piso in PISOS])
+        db.execute(insert(Lectura), rows)
+        for piso in PISOS:
+            db.add(Alerta(
+                timestamp=start + timedelta(minutes=n - 1),
+                piso=piso,
+                variable="energia",
+                nivel="informativa",
+                valor_actual=16.0,
+                umbral=15.0,
+                recomendacion="Revisar consumo",
+                estado="activa"
+            ))
+        db.commit()
+
+    # Con READINGS_COMPACT_LAYOUT los casos corren sobre la vista del formato compacto
+    if settings.READINGS_COMPACT_LAYOUT and engine.dialect.name == "postgresql":
+        from app.models.lectura_compacta import migrate_to_compact
+        migrate_to_compact(engine)
+
+
+# --- Medición ---
+
+def summarize(samples: List[float], number: int) -> Dict[str, Any]:
+    """Estadísticas por llamada en microsegundos (cada muestra es el promedio de `number` llamadas)"""
+    us = sorted(sample * 1e6 for sample in samples)
+    return {
+        "llamadas_por_muestra": number,
+        "muestras": len(us),
+        "min_us": round(us[0], 2),
+        "mediana_us": round(statistics.median(us), 2),
+        "p95_us": round(float(np.percentile(us, 95)), 2),
+        "media_us": round(statistics.fmean(us), 2),
+    }
+
+
+def measure(fn: Callable[[], Any], number: int, repeat: int, warmup: int = 1) -> Dict[str, Any]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return summarize(samples, number)
+
+
+async def measure_async(fn: Callable[[], Awaitable[Any]], number: int, repeat: int, warmup: int = 1) -> Dict[str, Any]:
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        samples.append((time.perf_counter() - start) / number)
+    return summarize(samples, number)
+
+
+# --- Casos ---
+
+def import_rows(count: int, start: datetime) -> List[Dict[str, Any]]:
+    """Lecturas en el formato JSON de /import, repartidas entre los pisos, con ~10% de excedencias"""
+    rng = np.random.default_rng(count)
+    stress = rng.random(count) < 0.1
+    temp = np.where(stress, rng.uniform(28, 31, count), rng.uniform(22, 25.5, count))
+    humedad = rng.uniform(45, 65, count)
+    energia = np.where(stress, rng.uniform(15, 22, count), rng.uniform(9, 14, count))
+    return [
+        {
+            "timestamp": (start + timedelta(seconds=i // len(PISOS))).isoformat(),
+            "edificio": "A",
+            "piso": PISOS[i % len(PISOS)],
+            "temp_c": round(float(temp[i]), 2),
+            "humedad_pct": round(float(humedad[i]), 2),
+            "energia_kw": round(float(energia[i]), 2),
+        }
+        for i in range(count)
+    ]
+
+
+async def run_cases(selected: List[str], repeat: int, import_rows_count: int, dialect: str) -> Dict[str, Dict[str, Any]]:
+    from app.database import AsyncSessionLocal, async_engine
+    from app.models.lectura import Lectura
+    from app.services.dashboard_service import DashboardService
+    from app.services.ai_service import AIService
+    from app.services.alert_service import AlertService
+    from app.services.data_generator_service import DataGeneratorService
+    from app.services.prediction_service import PredictionService
+
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def wanted(name: str) -> bool:
+        return not selected or any(token in name for token in selected)
+
+    async with AsyncSessionLocal() as db:
+        alert_service = AlertService(db)
+        now = datetime.now(timezone.utc)
+
+        if wanted("alertas.get_threshold_level"):
+            thresholds = await alert_service.get_thresholds("humedad")
+            values = [15.0, 23.0, 50.0, 72.0, 78.0, 85.0]
+
+            def threshold_levels():
+                for value in values:
+                    alert_service.get_threshold_level(value, thresholds)
+
+            results["alertas.get_threshold_level"] = measure(threshold_levels, number=2000, repeat=repeat)
+            results["alertas.get_threshold_level"]["nota"] = f"{len(values)} valores por llamada"
+
+        if wanted("alertas.check_reading_alerts"):
+            normal = Lectura(timestamp=now, edificio="A", piso=1, temp_c=24.0, humedad_pct=55.0, energia_kw=12.0)
+            # Excede temperatura y energía: la primera llamada crea las alertas, las siguientes las actualizan
+            excedencia = Lectura(timestamp=now, edificio="A", piso=2, temp_c=29.8, humedad_pct=55.0, energia_kw=21.0)
+            results["alertas.check_reading_alerts[normal]"] = await measure_async(
+                lambda: alert_service.check_reading_alerts(normal), number=50, repeat=repeat
+            )
+            results["alertas.check_reading_alerts[excedencia]"] = await measure_async(
+                lambda: alert_service.check_reading_alerts(excedencia), number=50, repeat=repeat
+            )
+
+        if wanted("prediccion.predict_temperature"):
+            prediction_service = PredictionService(db)
+            # Historial de 4 horas con una consulta simple (fetch_frame usa agregados propios de Postgres)
+            result = await db.execute(
+                select(*prediction_service.columnas_historico.values())
+                .filter(Lectura.piso == 1, Lectura.timestamp >= now - timedelta(hours=4))
+                .order_by(Lectura.timestamp.asc())
+            )
+            df = pd.DataFrame(result.all(), columns=list(prediction_service.columnas_historico))
+            for horizon in (60, 240):
+                name = f"prediccion.predict_temperature[{horizon}]"
+                results[name] = measure(
+                    lambda: prediction_service.predict_temperature(df, horizon), number=200, repeat=repeat
+                )
+                results[name]["nota"] = f"{len(df)} lecturas de historial"
+
+        if wanted("ia._get_fallback_recommendation"):
+            ai_service = AIService()
+            calls = [
+                (1, "temperatura", "critica", 30.2, 29.5),
+                (2, "humedad", "media", 77.0, 75.1),
+                (3, "energia", "informativa", 16.5, 15.0),
+            ]
+
+            def fallbacks():
+                for args in calls:
+                    ai_service._get_fallback_recommendation(*args)
+
+            results["ia._get_fallback_recommendation"] = measure(fallbacks, number=2000, repeat=repeat)
+            results["ia._get_fallback_recommendation"]["nota"] = f"{len(calls)} variables por llamada"
+
+        if wanted("dashboard.get_dashboard_summary"):
+            results["dashboard.get_dashboard_summary"] = await measure_async(
+                lambda: DashboardService(db).get_summary(), number=20, repeat=repeat
+            )
+
+    if wanted("importacion.import_from_json"):
+        name = f"importacion.import_from_json[{import_rows_count}]"
+        if dialect != "postgresql":
+            results[name] = {"omitido": "los modelos en línea usan INSERT ... ON CONFLICT de Postgres"}
+        else:
+            # Cada corrida usa timestamps nuevos (la restricción unique_reading rechazaría los repetidos)
+            runs = max(1, min(repeat, 3))
+            samples = []
+            base = now + timedelta(days=1)
+            for run in range(runs):
+                data = import_rows(import_rows_count, base + timedelta(days=run))
+                async with AsyncSessionLocal() as db:
+                    start = time.perf_counter()
+                    imported, errors, _, _ = await DataGeneratorService(db).import_from_json(data)
+                    samples.append((time.perf_counter() - start) / import_rows_count)
+                if errors:
+                    print(f"Advertencia: {errors} lecturas rechazadas al importar")
+            results[name] = summarize(samples, import_rows_count)
+            results[name]["nota"] = "tiempo por lectura importada"
+
+    await async_engine.dispose()
+    return results
+
+
+# --- Línea base ---
+
+def machine_info(dialect: str) -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "motor": dialect,
+    }
+
+
+def baseline_path(path: Optional[str], dialect: str) -> str:
+    return path or os.path.join(BASELINE_DIR, f"services_{dialect}.json")
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Cambio relativo de la mediana por caso; regresión si supera la tolerancia"""
+    rows = []
+    for name, result in results.items():
+        previous = baseline["resultados"].get(name)
+        if "mediana_us" not in result or not previous or "mediana_us" not in previous:
+            continue
+        change = result["mediana_us"] / previous["mediana_us"] - 1
+        rows.append({
+            "caso": name,
+            "base_us": previous["mediana_us"],
+            "actual_us": result["mediana_us"],
+            "cambio": change,
+            "regresion": change > tolerance,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de servicios SmartFloors")
+    parser.add_argument("--sqlite", action="store_true", help="Usar un archivo SQLite temporal en lugar de Postgres")
+    parser.add_argument("--repeat", type=int, default=7, help="Muestras por caso")
+    parser.add_argument("--import-rows", type=int, default=10000, help="Lecturas por corrida de import_from_json")
+    parser.add_argument("--casos", nargs="*", default=[], help="Solo los casos cuyo nombre contenga alguno de estos textos")
+    parser.add_argument("--save-baseline", nargs="?", const="", metavar="ARCHIVO", help="Guardar los resultados como línea base")
+    parser.add_argument("--compare", nargs="?", const="", metavar="ARCHIVO", help="Comparar contra la línea base")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento relativo de la mediana tolerado al comparar")
+    parser.add_argument("--keep-db", action="store_true", help="No borrar la base temporal (para inspeccionarla)")
+    parser.add_argument("--output", help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    sync_url, async_url, cleanup = create_throwaway_database(args.sqlite)
+    dialect = make_url(sync_url).get_backend_name()
+    print(f"Base temporal: {make_url(sync_url).render_as_string(hide_password=True)}")
+    try:
+        configure_settings(sync_url, async_url)
+        seed()
+        results = asyncio.run(run_cases(args.casos, args.repeat, args.import_rows, dialect))
+    finally:
+        from app.database import engine
+        engine.dispose()
+        if args.keep_db:
+            print("Base temporal conservada (--keep-db)")
+        else:
+            cleanup()
+
+    print(f"{'caso':<46} {'mediana µs':>12} {'p95 µs':>12} {'mín. µs':>12}")
+    for name, result in results.items():
+        if "omitido" in result:
+            print(f"{name:<46} {'omitido: ' + result['omitido']}")
+            continue
+        print(f"{name:<46} {result['mediana_us']:>12.2f} {result['p95_us']:>12.2f} {result['min_us']:>12.2f}  {result.get('nota', '')}")
+
+    report = {
+        "generado": datetime.utcnow().isoformat(),
+        "maquina": machine_info(dialect),
+        "resultados": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    regressions = []
+    if args.compare is not None:
+        path = baseline_path(args.compare or None, dialect)
+        with open(path) as f:
+            baseline = json.load(f)
+        if baseline.get("maquina") != report["maquina"]:
+            print(f"Advertencia: la línea base se generó en otra máquina o motor ({baseline.get('maquina')})")
+        print(f"\nComparación con {path} (tolerancia {args.tolerance:.0%})")
+        for row in compare(results, baseline, args.tolerance):
+            estado = "REGRESIÓN" if row["regresion"] else "ok"
+            print(f"{row['caso']:<46} {row['base_us']:>12.2f} -> {row['actual_us']:>12.2f}  {row['cambio']:+7.1%}  {estado}")
+            if row["regresion"]:
+                regressions.append(row["caso"])
+
+    if args.save_baseline is not None:
+        path = baseline_path(args.save_baseline or None, dialect)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Línea base guardada en {path}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Tamaño en disco y páginas leídas de lecturas: formato normal frente al compacto.
+
+Crea una base desechable en el servidor Postgres de DATABASE_URL, siembra
+lecturas de un minuto (--edificios x --pisos durante --dias) en la tabla del
+formato normal, la migra al formato compacto (READINGS_COMPACT_LAYOUT, ver
+app/models/lectura_compacta.py) y compara:
+
+- tamaño de la tabla, de sus índices y total (después de VACUUM ANALYZE)
+- páginas de 8 KB que tocan las consultas típicas (EXPLAIN ANALYZE BUFFERS):
+  última lectura de un piso, un día de un piso y métricas de 4 horas de todos
+
+Con --indices-anteriores el formato normal incluye también los dos índices
+duplicados que init_db.py ahora elimina (ix_lecturas_id, idx_lecturas_timestamp).
+
+Uso:
+    python -m benchmarks.storage
+    python -m benchmarks.storage --dias 30 --pisos 20 --indices-anteriores
+"""
+import argparse
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection, make_url
+from benchmarks.services import configure_settings, create_throwaway_database
+
+
+SEMBRAR_SQL = """
+    INSERT INTO lecturas (timestamp, edificio, piso, temp_c, humedad_pct, energia_kw, created_at)
+    SELECT t, chr(65 + e), p,
+           round((22 + 4 * sin(m / 240.0) + random())::numeric, 2),
+           round((45 + 10 * random())::numeric, 2),
+           round((5 + 20 * random())::numeric, 2),
+           t + interval '2 seconds'
+    FROM generate_series(0, :minutos - 1) AS m
+    CROSS JOIN generate_series(0, :edificios - 1) AS e
+    CROSS JOIN generate_series(1, :pisos) AS p
+    CROSS JOIN LATERAL (SELECT CAST(:inicio AS timestamptz) + m * interval '1 minute' AS t) AS x
+    ORDER BY t, e, p
+"""
+
+INDICES_ANTERIORES_SQL = [
+    "CREATE INDEX ix_lecturas_id ON lecturas (id)",
+    "CREATE INDEX idx_lecturas_timestamp ON lecturas (timestamp DESC)",
+]
+
+CONSULTAS = {
+    "ultima_lectura_piso": "SELECT * FROM lecturas WHERE edificio = 'A' AND piso = 1 ORDER BY timestamp DESC LIMIT 1",
+    "dia_de_un_piso": "SELECT * FROM lecturas WHERE edificio = 'A' AND piso = 1 AND timestamp >= CAST(:fin AS timestamptz) - interval '1 day' ORDER BY timestamp",
+    "metricas_4h": """
+        SELECT edificio, piso, avg(temp_c), max(temp_c), min(temp_c), avg(humedad_pct), avg(energia_kw), sum(energia_kw)
+        FROM lecturas WHERE timestamp >= CAST(:fin AS timestamptz) - interval '4 hours' GROUP BY edificio, piso
+    """,
+}
+
+
+def sizes(conn: Connection, *tablas: str) -> Dict[str, int]:
+    """Bytes de las tablas (heap + TOAST), de sus índices y total"""
+    heap = indices = 0
+    for tabla in tablas:
+        heap += conn.scalar(text("SELECT pg_table_size(CAST(:t AS regclass))"), {"t": tabla})
+        indices += conn.scalar(text("SELECT pg_indexes_size(CAST(:t AS regclass))"), {"t": tabla})
+    return {"tabla": heap, "indices": indices, "total": heap + indices}
+
+
+def buffers(conn: Connection, fin: datetime) -> Dict[str, int]:
+    """Páginas (compartidas, leídas o en caché) que toca cada consulta"""
+    result = {}
+    for name, sql in CONSULTAS.items():
+        plan = conn.scalar(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), {"fin": fin})
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        raiz = plan[0]["Plan"]
+        result[name] = raiz.get("Shared Hit Blocks", 0) + raiz.get("Shared Read Blocks", 0)
+    return result
+
+
+def medir(conn: Connection, fin: datetime, *tablas: str) -> Dict[str, Any]:
+    for tabla in tablas:
+        conn.execute(text(f"VACUUM ANALYZE {tabla}"))
+    return {"tamano": sizes(conn, *tablas), "paginas": buffers(conn, fin)}
+
+
+def mb(n: int) -> str:
+    return f"{n / 1024 / 1024:.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamaño de lecturas en el formato normal y el compacto")
+    parser.add_argument("--edificios", type=int, default=4)
+    parser.add_argument("--pisos", type=int, default=10, help="Pisos por edificio")
+    parser.add_argument("--dias", type=int, default=7, help="Días de lecturas de un minuto por piso")
+    parser.add_argument("--indices-anteriores", action="store_true", help="Incluir los índices duplicados del formato normal anterior")
+    parser.add_argument("--keep-db", action="store_true", help="No borrar la base temporal (para inspeccionarla)")
+    parser.add_argument("--output", help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    sync_url, async_url, cleanup = create_throwaway_database(sqlite=False)
+    print(f"Base temporal: {make_url(sync_url).render_as_string(hide_password=True)}")
+    configure_settings(sync_url, async_url)
+    from app.database import Base
+    from app.models import Lectura
+    from app.models.lectura_compacta import migrate_to_compact
+
+    minutos = args.dias * 24 * 60
+    fin = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    inicio = fin - timedelta(minutes=minutos)
+    engine = create_engine(sync_url, isolation_level="AUTOCOMMIT")
+    try:
+        Base.metadata.create_all(bind=engine, tables=[Lectura.__table__])
+        with engine.connect() as conn:
+            if args.indices_anteriores:
+                for sql in INDICES_ANTERIORES_SQL:
+                    conn.execute(text(sql))
+            conn.execute(text(SEMBRAR_SQL), {"minutos": minutos, "edificios": args.edificios, "pisos": args.pisos, "inicio": inicio})
+            filas = conn.scalar(text("SELECT count(*) FROM lecturas"))
+            normal = medir(conn, fin, "lecturas")
+
+        migrate_to_compact(engine.execution_options(isolation_level="READ COMMITTED"))
+        with engine.connect() as conn:
+            compacto = medir(conn, fin, "lecturas_compactas", "edificios")
+    finally:
+        engine.dispose()
+        from app.database import engine as app_engine
+        app_engine.dispose()
+        if args.keep_db:
+            print("Base temporal conservada (--keep-db)")
+        else:
+            cleanup()
+
+    print(f"{filas} lecturas ({args.edificios} edificios x {args.pisos} pisos x {args.dias} días)")
+    print(f"{'':<22} {'normal':>12} {'compacto':>12} {'proporción':>11}")
+    for key in ("tabla", "indices", "total"):
+        a, b = normal["tamano"][key], compacto["tamano"][key]
+        print(f"{key:<22} {mb(a):>12} {mb(b):>12} {b / a:>11.2f}")
+    print(f"{'bytes por lectura':<22} {normal['tamano']['total'] / filas:>12.1f} {compacto['tamano']['total'] / filas:>12.1f}")
+    print("páginas tocadas")
+    for name in CONSULTAS:
+        a, b = normal["paginas"][name], compacto["paginas"][name]
+        print(f"  {name:<20} {a:>12} {b:>12} {b / a if a else 0:>11.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "generado": datetime.utcnow().isoformat(),
+                "parametros": vars(args),
+                "lecturas": filas,
+                "normal": normal,
+                "compacto": compacto,
+            }, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
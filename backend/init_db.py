@@ -1,79 +1,121 @@
 """
 Script para inicializar la base de datos con datos iniciales
-"""
-from app.database import SessionLocal, engine, Base
-from app.models import Lectura, Alerta, Prediccion, Umbral, Suscripcion
-from sqlalchemy import text
 
-# Crear todas las tablas
-Base.metadata.create_all(bind=engine)
+Con SHARD_DATABASE_URLS inicializa también cada shard adicional: todas las tablas,
+los umbrales (las alertas de cada edificio se evalúan en su shard) y los índices.
+"""
+from app.config import settings
+from app.database import engine, Base
+from app.models import Lectura, Alerta, Prediccion, Umbral, Suscripcion, Piso
+from app.models.umbral import UMBRALES_INICIALES
+from app.models.lectura_compacta import create_tables, lecturas_es_tabla, migrate_to_compact
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
 
-db = SessionLocal()
 
-try:
-    # Verificar si ya existen umbrales
-    existing_thresholds = db.query(Umbral).count()
+def inicializar(engine_destino, nombre: str):
+    if settings.SHARD_DATABASE_URLS:
+        print(f"== {nombre} ==")
     
-    if existing_thresholds == 0:
-        print("Inicializando umbrales...")
-        
-        # Insertar umbrales según especificaciones
-        umbrales_data = [
-            # Temperatura
-            # OK: <26°C (óptima: 24°C) - no se define umbral, es el estado normal
-            {"variable": "temperatura", "nivel": "informativa", "valor_min": 26.0, "valor_max": 27.9, "descripcion": "Temperatura ligeramente elevada"},
-            {"variable": "temperatura", "nivel": "media", "valor_min": 28.0, "valor_max": 29.4, "descripcion": "Temperatura alta, requiere atención"},
-            {"variable": "temperatura", "nivel": "critica", "valor_min": 29.5, "valor_max": None, "descripcion": "Temperatura crítica, acción inmediata"},
-            
-            # Humedad
-            # OK: 25-70% (óptima: 50-60%) - no se define umbral, es el estado normal
-            {"variable": "humedad", "nivel": "informativa_baja", "valor_min": None, "valor_max": 24.9, "descripcion": "Humedad baja"},
-            {"variable": "humedad", "nivel": "informativa_alta", "valor_min": 70.1, "valor_max": None, "descripcion": "Humedad alta"},
-            {"variable": "humedad", "nivel": "media_baja", "valor_min": None, "valor_max": 21.9, "descripcion": "Humedad muy baja"},
-            {"variable": "humedad", "nivel": "media_alta", "valor_min": 75.1, "valor_max": None, "descripcion": "Humedad muy alta"},
-            {"variable": "humedad", "nivel": "critica_baja", "valor_min": None, "valor_max": 19.9, "descripcion": "Humedad críticamente baja"},
-            {"variable": "humedad", "nivel": "critica_alta", "valor_min": 80.1, "valor_max": None, "descripcion": "Humedad críticamente alta"},
-            
-            # Energía
-            # OK: <15kW - no se define umbral, es el estado normal
-            {"variable": "energia", "nivel": "informativa", "valor_min": 15.0, "valor_max": 19.9, "descripcion": "Consumo elevado"},
-            {"variable": "energia", "nivel": "media", "valor_min": 20.0, "valor_max": 24.9, "descripcion": "Consumo alto"},
-            {"variable": "energia", "nivel": "critica", "valor_min": 25.0, "valor_max": None, "descripcion": "Consumo crítico"},
-        ]
-        
-        for umbral_data in umbrales_data:
-            umbral = Umbral(**umbral_data)
-            db.add(umbral)
-        
-        db.commit()
-        print(f"✅ {len(umbrales_data)} umbrales creados")
+    # Crear todas las tablas; con READINGS_COMPACT_LAYOUT una tabla lecturas existente
+    # recibe primero sus migraciones y después se copia al formato compacto
+    with engine_destino.connect() as conn:
+        migrar_a_compacto = settings.READINGS_COMPACT_LAYOUT and lecturas_es_tabla(conn)
+    if migrar_a_compacto:
+        Base.metadata.create_all(bind=engine_destino)
     else:
-        print(f"✅ Ya existen {existing_thresholds} umbrales en la base de datos")
+        create_tables(engine_destino, actualizar_vista=True)
+    tabla_lecturas = not settings.READINGS_COMPACT_LAYOUT or migrar_a_compacto
+    
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine_destino)()
     
-    # Crear índices adicionales si no existen
-    print("Verificando índices...")
-    indices_sql = [
-        "CREATE INDEX IF NOT EXISTS idx_lecturas_timestamp ON lecturas(timestamp DESC);",
-        "CREATE INDEX IF NOT EXISTS idx_lecturas_piso_timestamp ON lecturas(piso, timestamp DESC);",
-        "CREATE INDEX IF NOT EXISTS idx_lecturas_edificio_piso ON lecturas(edificio, piso);",
-        "CREATE INDEX IF NOT EXISTS idx_alertas_timestamp ON alertas(timestamp DESC);",
-        "CREATE INDEX IF NOT EXISTS idx_alertas_piso_estado ON alertas(piso, estado);",
-        "CREATE INDEX IF NOT EXISTS idx_alertas_nivel ON alertas(nivel);",
-        "CREATE INDEX IF NOT EXISTS idx_predicciones_piso_timestamp ON predicciones(piso, timestamp_prediccion);",
-    ]
+    try:
+        # Verificar si ya existen umbrales
+        existing_thresholds = db.query(Umbral).count()
     
-    for sql in indices_sql:
-        try:
-            db.execute(text(sql))
+        if existing_thresholds == 0:
+            print("Inicializando umbrales...")
+        
+            # Insertar umbrales según especificaciones
+            for umbral_data in UMBRALES_INICIALES:
+                umbral = Umbral(**umbral_data)
+                db.add(umbral)
+        
             db.commit()
-        except Exception as e:
-            print(f"⚠️  Índice ya existe o error: {e}")
+            print(f"✅ {len(UMBRALES_INICIALES)} umbrales creados")
+        else:
+            print(f"✅ Ya existen {existing_thresholds} umbrales en la base de datos")
     
-    print("✅ Base de datos inicializada correctamente")
+        # Bases creadas antes del registro de edificios y pisos: sin límite de pisos y con edificio en alertas/predicciones
+        print("Verificando columnas y restricciones...")
+        migraciones_sql = [
+            "ALTER TABLE alertas DROP CONSTRAINT IF EXISTS check_piso;",
+            "ALTER TABLE predicciones DROP CONSTRAINT IF EXISTS check_piso;",
+            "ALTER TABLE alertas ADD COLUMN IF NOT EXISTS edificio VARCHAR(10) NOT NULL DEFAULT 'A';",
+            "ALTER TABLE predicciones ADD COLUMN IF NOT EXISTS edificio VARCHAR(10) NOT NULL DEFAULT 'A';",
+            "INSERT INTO pisos (edificio, piso, activo) SELECT DISTINCT edificio, piso, true FROM lecturas ON CONFLICT DO NOTHING;",
+            # Índices solo por piso: reemplazados por los de (edificio, piso, ...)
+            "DROP INDEX IF EXISTS ix_lecturas_piso;",
+            "DROP INDEX IF EXISTS idx_lecturas_piso_timestamp;",
+            "DROP INDEX IF EXISTS idx_lecturas_edificio_piso;",
+            "DROP INDEX IF EXISTS ix_alertas_piso;",
+            "DROP INDEX IF EXISTS idx_alertas_piso_estado;",
+            "DROP INDEX IF EXISTS ix_predicciones_piso;",
+            "DROP INDEX IF EXISTS idx_predicciones_piso_timestamp;",
+            "DROP INDEX IF EXISTS idx_predicciones_piso_modelo_generacion;",
+            # Duplicados de la clave primaria (id) y de ix_lecturas_timestamp
+            "DROP INDEX IF EXISTS ix_lecturas_id;",
+            "DROP INDEX IF EXISTS idx_lecturas_timestamp;",
+        ]
+        if tabla_lecturas:
+            migraciones_sql.insert(0, "ALTER TABLE lecturas DROP CONSTRAINT IF EXISTS check_piso;")
+    
+        for sql in migraciones_sql:
+            try:
+                db.execute(text(sql))
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️  Error en migración: {e}")
+    
+        if migrar_a_compacto:
+            print("Migrando lecturas al formato compacto...")
+            copiadas = migrate_to_compact(engine_destino)
+            print(f"✅ {copiadas} lecturas copiadas a lecturas_compactas (la tabla anterior queda como lecturas_formato_anterior)")
+    
+        # Crear índices adicionales si no existen
+        print("Verificando índices...")
+        # El formato compacto crea sus índices con la tabla (lectura_compacta.py)
+        indices_sql = [
+            "CREATE INDEX IF NOT EXISTS idx_alertas_timestamp ON alertas(timestamp DESC);",
+            "CREATE INDEX IF NOT EXISTS idx_alertas_edificio_piso_estado ON alertas(edificio, piso, estado);",
+            "CREATE INDEX IF NOT EXISTS idx_alertas_edificio_timestamp ON alertas(edificio, timestamp);",
+            "CREATE INDEX IF NOT EXISTS idx_alertas_nivel ON alertas(nivel);",
+            "CREATE INDEX IF NOT EXISTS idx_predicciones_edificio_piso_modelo_generacion ON predicciones(edificio, piso, modelo, timestamp_generacion);",
+        ]
+        if not settings.READINGS_COMPACT_LAYOUT:
+            indices_sql.insert(0, "CREATE INDEX IF NOT EXISTS idx_lecturas_edificio_piso_timestamp ON lecturas(edificio, piso, timestamp);")
+    
+        for sql in indices_sql:
+            try:
+                db.execute(text(sql))
+                db.commit()
+            except Exception as e:
+                print(f"⚠️  Índice ya existe o error: {e}")
     
-except Exception as e:
-    print(f"❌ Error inicializando base de datos: {e}")
-    db.rollback()
-finally:
-    db.close()
+        print("✅ Base de datos inicializada correctamente")
+    
+    except Exception as e:
+        print(f"❌ Error inicializando base de datos: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
 
+inicializar(engine, "shard_0")
+for i, url in enumerate(settings.SHARD_DATABASE_URLS, start=1):
+    shard_engine = create_engine(url)
+    try:
+        inicializar(shard_engine, f"shard_{i}")
+    finally:
+        shard_engine.dispose()
@@ -0,0 +1,47 @@
+"""
+Configuración común de las pruebas.
+
+Las pruebas de rutas corren contra una base desechable en el servidor Postgres de
+DATABASE_URL, creada al iniciar la sesión y borrada al terminar; si el servidor no
+responde, esas pruebas se omiten y las de lógica pura corren igual. La aplicación
+se apunta a esa base aquí, antes de que cualquier prueba importe app.database.
+"""
+import tempfile
+import pytest
+from sqlalchemy.exc import SQLAlchemyError
+from app.config import settings
+from benchmarks.services import configure_settings, create_throwaway_database
+
+
+settings.PREDICTION_SCHEDULER_ENABLED = False
+settings.LINE_PROTOCOL_ENABLED = False
+settings.SPOOL_DIR = tempfile.mkdtemp(prefix="smartfloors_spool_")
+
+try:
+    _sync_url, _async_url, _drop_database = create_throwaway_database(sqlite=False)
+    configure_settings(_sync_url, _async_url)
+    BASE_NO_DISPONIBLE = None
+except SQLAlchemyError as e:
+    _drop_database = None
+    BASE_NO_DISPONIBLE = f"Postgres no disponible en DATABASE_URL: {e.__class__.__name__}"
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if _drop_database is not None:
+        from app.database import engine
+        engine.dispose()
+        _drop_database()
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Base temporal con todas las tablas y los datos de benchmarks.services.seed"""
+    if BASE_NO_DISPONIBLE:
+        pytest.skip(BASE_NO_DISPONIBLE)
+    from app.database import engine
+    from app.models.lectura_compacta import create_tables
+    from benchmarks.services import seed
+
+    create_tables(engine)
+    seed()
+    return engine
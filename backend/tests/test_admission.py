@@ -0,0 +1,63 @@
+import asyncio
+from app.middleware.admission import PRIORIDAD_INGESTA, PRIORIDAD_LECTURA, AdmissionController, PriorityLimiter
+
+
+def test_cupo_pasa_a_la_mayor_prioridad_y_fifo_dentro_de_cada_una():
+    async def main():
+        limiter = PriorityLimiter(1)
+        await limiter.acquire()
+        orden = []
+
+        async def espera(nombre, prioridad):
+            await limiter.acquire(prioridad)
+            orden.append(nombre)
+            limiter.release()
+
+        tareas = [
+            asyncio.create_task(espera("ingesta", PRIORIDAD_INGESTA)),
+            asyncio.create_task(espera("lectura 1", PRIORIDAD_LECTURA)),
+            asyncio.create_task(espera("lectura 2", PRIORIDAD_LECTURA)),
+        ]
+        await asyncio.sleep(0)
+        assert limiter.waiting == 3
+        limiter.release()
+        await asyncio.gather(*tareas)
+        assert orden == ["lectura 1", "lectura 2", "ingesta"]
+        assert limiter.in_use == 0 and limiter.waiting == 0
+
+    asyncio.run(main())
+
+
+def test_espera_cancelada_no_pierde_el_cupo():
+    async def main():
+        limiter = PriorityLimiter(1)
+        await limiter.acquire()
+        with_timeout = asyncio.create_task(asyncio.wait_for(limiter.acquire(), 0.01))
+        await asyncio.gather(with_timeout, return_exceptions=True)
+        assert limiter.waiting == 0
+        limiter.release()
+        assert limiter.in_use == 0
+        await asyncio.wait_for(limiter.acquire(), 0.1)
+        assert limiter.in_use == 1
+
+    asyncio.run(main())
+
+
+def test_ingesta_cancelada_devuelve_los_cupos_tomados():
+    async def main():
+        controller = AdmissionController(max_concurrent=1, endpoint_limits={"POST /x": 1})
+        # Con el cupo global ocupado, la ingesta toma el de la ruta y el de ingesta y espera el global
+        await controller.limiter.acquire()
+        espera = asyncio.create_task(controller._acquire_ingest("POST /x"))
+        await asyncio.sleep(0)
+        assert controller.endpoint_limiters["POST /x"].in_use == 1
+        assert controller.ingest_limiter.in_use == 1
+        espera.cancel()
+        await asyncio.gather(espera, return_exceptions=True)
+        controller.limiter.release()
+        assert controller.limiter.in_use == 0
+        assert controller.ingest_limiter.in_use == 0
+        assert controller.endpoint_limiters["POST /x"].in_use == 0
+        assert controller.ingest_queued == 0
+
+    asyncio.run(main())
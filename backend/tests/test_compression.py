@@ -0,0 +1,78 @@
+import asyncio
+import gzip
+import brotli
+import pytest
+from starlette.datastructures import Headers
+from app.middleware.compression import CompressionMiddleware, parse_accept_encoding
+
+
+CUERPO = b'{"valor": 22.5}' * 200
+
+
+def respuesta(*trozos, content_type="application/json", headers=()):
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", content_type.encode()), *headers],
+        })
+        for i, trozo in enumerate(trozos):
+            await send({"type": "http.response.body", "body": trozo, "more_body": i < len(trozos) - 1})
+    return app
+
+
+def llamar(app, accept_encoding):
+    mensajes = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        mensajes.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(CompressionMiddleware(app, minimum_size=1024)(scope, receive, send))
+    headers = Headers(raw=mensajes[0]["headers"])
+    return headers, b"".join(m.get("body", b"") for m in mensajes[1:])
+
+
+@pytest.mark.parametrize("accept, encoding, decode", [
+    ("gzip", "gzip", gzip.decompress),
+    ("gzip, br", "br", brotli.decompress),
+    ("br;q=0.5, gzip", "gzip", gzip.decompress),
+])
+def test_negocia_y_comprime(accept, encoding, decode):
+    headers, body = llamar(respuesta(CUERPO), accept)
+    assert headers["content-encoding"] == encoding
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(body)
+    assert decode(body) == CUERPO
+
+
+@pytest.mark.parametrize("accept, decode", [("gzip", gzip.decompress), ("br", brotli.decompress)])
+def test_respuesta_por_partes(accept, decode):
+    headers, body = llamar(respuesta(CUERPO[:100], CUERPO[100:], b""), accept)
+    assert "content-length" not in headers
+    assert decode(body) == CUERPO
+
+
+@pytest.mark.parametrize("app", [
+    respuesta(b'{"ok": true}'),
+    respuesta(CUERPO, content_type="text/event-stream"),
+    respuesta(CUERPO, headers=[(b"content-encoding", b"gzip")]),
+])
+def test_sin_compresion(app):
+    headers, body = llamar(app, "gzip, br")
+    assert "vary" not in headers
+    assert body in (b'{"ok": true}', CUERPO)
+
+
+def test_sin_codificacion_aceptada():
+    headers, body = llamar(respuesta(CUERPO), "identity")
+    assert "content-encoding" not in headers
+    assert headers["vary"] == "Accept-Encoding"
+    assert body == CUERPO
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip;q=0.8, br, deflate;q=x") == {"gzip": 0.8, "br": 1.0, "deflate": 0.0}
@@ -0,0 +1,87 @@
+import msgpack
+import numpy as np
+import pytest
+from app.services.binary_readings import decode_msgpack, decode_struct, encode_struct
+from app.services.ingest_service import validate_readings
+
+
+def columnas(**cambios):
+    columns = {
+        "timestamp_ms": np.array([1731405600000, 1731405660000, 1731405720000], dtype=np.int64),
+        "edificio": np.array([b"a", b" B ", b""], dtype=object),
+        "piso": np.array([1, 2, 3], dtype=np.int16),
+        "temp_c": np.array([21.5, 22.0, 22.5], dtype=np.float32),
+        "humedad_pct": np.array([40, 41, 42], dtype=np.float32),
+        "energia_kw": np.array([5, 6, 7], dtype=np.float32),
+    }
+    columns.update(cambios)
+    return columns
+
+
+def test_struct_ida_y_vuelta():
+    columns = decode_struct(encode_struct(columnas(edificio=np.array([b"A", b"B", b"C"]))))
+    assert columns["timestamp_ms"].tolist() == [1731405600000, 1731405660000, 1731405720000]
+    assert columns["edificio"].tolist() == [b"A", b"B", b"C"]
+    assert columns["piso"].tolist() == [1, 2, 3]
+
+
+def test_struct_largo_invalido():
+    with pytest.raises(ValueError, match="no es múltiplo"):
+        decode_struct(b"\x00" * 33)
+
+
+def test_msgpack_listas_bin_y_escalares():
+    body = msgpack.packb({
+        "timestamp_ms": np.array([1731405600000, 1731405660000], dtype="<i8").tobytes(),
+        "edificio": "B",
+        "piso": 4,
+        "temp_c": [21.5, 22.0],
+        "humedad_pct": [40, 41],
+        "energia_kw": np.array([5, 6], dtype="<f4").tobytes(),
+    })
+    columns = decode_msgpack(body)
+    assert columns["timestamp_ms"].tolist() == [1731405600000, 1731405660000]
+    assert columns["edificio"].tolist() == ["B", "B"]
+    assert columns["piso"].tolist() == [4, 4]
+    assert columns["energia_kw"].tolist() == [5.0, 6.0]
+
+
+@pytest.mark.parametrize("data, mensaje", [
+    ([1, 2], "mapa msgpack"),
+    ({"timestamp_ms": [1]}, "Faltan columnas"),
+    ({"timestamp_ms": [1, 2], "piso": [1], "temp_c": [1, 2], "humedad_pct": [1, 2], "energia_kw": [1, 2]}, "largos distintos"),
+    ({"timestamp_ms": b"\x00" * 7, "piso": 1, "temp_c": [], "humedad_pct": [], "energia_kw": []}, "múltiplo de 8"),
+])
+def test_msgpack_invalido(data, mensaje):
+    with pytest.raises(ValueError, match=mensaje):
+        decode_msgpack(msgpack.packb(data))
+
+
+def test_validacion_normaliza_edificios():
+    clean, errors = validate_readings(columnas())
+    assert errors == []
+    assert clean["edificio"].tolist() == ["A", "B", "A"]
+    assert clean["piso"].dtype == np.int64
+
+
+def test_validacion_rechaza_por_fila():
+    clean, errors = validate_readings(
+        columnas(
+            timestamp_ms=np.array([-5, 1731405660000, 1731405720000], dtype=np.int64),
+            temp_c=np.array([21.5, 80.0, np.nan]),
+            edificio=np.array([b"A", b"B", b"X" * 11], dtype=object),
+        ),
+        row_numbers=np.array([10, 11, 12])
+    )
+    assert len(clean["timestamp_ms"]) == 0
+    assert errors == [
+        "Lectura 10: timestamp fuera de rango",
+        "Lectura 12: edificio supera 10 caracteres",
+        "Lectura 11: temp_c fuera de rango [-50, 50]",
+    ]
+
+
+def test_validacion_piso_entero():
+    clean, errors = validate_readings(columnas(piso=np.array([1.0, 2.5, 3.0])))
+    assert clean["piso"].tolist() == [1, 3]
+    assert errors == ["Lectura 2: piso debe ser entero"]
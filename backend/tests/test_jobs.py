@@ -0,0 +1,84 @@
+import asyncio
+import httpx
+import numpy as np
+from fastapi import FastAPI
+from app.routers import jobs
+from app.services import job_service
+from app.services.job_service import JobManager
+
+
+def bloques(n, filas=10):
+    for i in range(n):
+        yield {"timestamp_ms": np.arange(i * filas, (i + 1) * filas, dtype=np.int64)}, [], None
+
+
+def test_cancelar_en_cola_es_inmediato():
+    async def main():
+        manager = JobManager(workers=0)
+        job = manager.submit("import", 10, bloques(1), {})
+        manager.cancel(job["job_id"])
+        await manager.stop()
+        return job, manager
+
+    job, manager = asyncio.run(main())
+    assert job["estado"] == "cancelado"
+    assert job["finished_at"] is not None
+    assert job["job_id"] not in manager._blocks
+
+
+def test_cancelar_en_curso_conserva_lo_insertado(monkeypatch):
+    eventos = {}
+
+    async def ingest(db, columns, row_numbers, source):
+        eventos["insertado"].set()
+        await eventos["continuar"].wait()
+        return {"created": len(columns["timestamp_ms"]), "errors": 0, "error_details": []}
+
+    monkeypatch.setattr(job_service, "ingest_sharded", ingest)
+
+    async def main():
+        # Los eventos se crean dentro del loop que los espera
+        eventos["insertado"], eventos["continuar"] = asyncio.Event(), asyncio.Event()
+        manager = JobManager(workers=1)
+        job = manager.submit("import", 30, bloques(3), {})
+        await eventos["insertado"].wait()
+        manager.cancel(job["job_id"])
+        assert job["estado"] == "cancelando"
+        eventos["continuar"].set()
+        while job["estado"] == "cancelando":
+            await asyncio.sleep(0.01)
+        await manager.stop()
+        return job
+
+    job = asyncio.run(main())
+    # La cancelación se aplica entre bloques: el bloque en curso queda insertado
+    assert job["estado"] == "cancelado"
+    assert job["creadas"] == job["procesadas"] == 10
+
+
+def test_historial_descarta_solo_terminados_mas_antiguos():
+    async def main():
+        manager = JobManager(workers=0, history_size=2)
+        primeros = [manager.submit("import", 10, bloques(1), {}) for _ in range(3)]
+        manager.cancel(primeros[0]["job_id"])
+        manager.cancel(primeros[1]["job_id"])
+        ultimo = manager.submit("import", 10, bloques(1), {})
+        await manager.stop()
+        return [job["job_id"] for job in primeros], ultimo["job_id"], list(manager.jobs)
+
+    primeros, ultimo, conservados = asyncio.run(main())
+    assert conservados == [primeros[2], ultimo]
+
+
+def test_cola_llena_responde_429(monkeypatch):
+    monkeypatch.setattr(jobs, "job_manager", JobManager(workers=0, max_queued=0))
+    app = FastAPI()
+    app.include_router(jobs.router, prefix="/api/v1/jobs")
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://pruebas") as client:
+            return await client.post("/api/v1/jobs/generate", json={"count": 10})
+
+    response = asyncio.run(main())
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "5"
@@ -0,0 +1,124 @@
+import asyncio
+import numpy as np
+import pytest
+from app.services import line_protocol_listener as modulo
+from app.services.line_protocol import parse_lines
+from app.services.line_protocol_listener import LineProtocolListener
+
+
+LINEA = b"lectura,edificio=A,piso=2 temp_c=24.1,humedad_pct=55,energia_kw=12i"
+
+
+def test_timestamp_ns_de_19_digitos():
+    columns, errors = parse_lines(LINEA + b" 1731405600123000000")
+    assert errors == []
+    assert columns["timestamp_ms"].tolist() == [1731405600123]
+
+
+def test_timestamp_invalido_solo_rechaza_su_linea():
+    data = b"\n".join([
+        LINEA + b" 1731405600000000000",
+        LINEA + b" abc",
+        LINEA + b" 99999999999999999999999",
+        LINEA + b" 1731405660000000000",
+    ])
+    columns, _ = parse_lines(data)
+    assert columns["timestamp_ms"].tolist() == [1731405600000, -1, -1, 1731405660000]
+
+
+def test_precisiones():
+    assert parse_lines(LINEA + b" 1731405600", precision="s")[0]["timestamp_ms"].tolist() == [1731405600000]
+    assert parse_lines(LINEA + b" 1731405600000", precision="ms")[0]["timestamp_ms"].tolist() == [1731405600000]
+    # Segundos que desbordan int64 al pasar a ms
+    assert parse_lines(LINEA + b" 99999999999999999", precision="s")[0]["timestamp_ms"].tolist() == [-1]
+
+
+def test_sin_timestamp_usa_la_hora_actual():
+    columns, _ = parse_lines(LINEA)
+    assert columns["timestamp_ms"][0] > 1731405600000
+
+
+def test_lineas_invalidas_y_columnas():
+    data = b"\n".join([
+        b"# comentario",
+        LINEA + b" 1731405600000000000",
+        b"otra,piso=1 temp_c=1,humedad_pct=2,energia_kw=3",
+        b"lectura,edificio=B temp_c=1,humedad_pct=2,energia_kw=3",
+        b"lectura,piso=3 temp_c=x,humedad_pct=2,energia_kw=3",
+    ])
+    columns, errors = parse_lines(data)
+    assert len(errors) == 2
+    assert errors[0].startswith("Línea 3: medición desconocida")
+    assert errors[1] == "Línea 4: falta piso"
+    assert columns["edificio"].tolist() == [b"A", b"A"]
+    assert columns["piso"].tolist() == [2.0, 3.0]
+    assert columns["energia_kw"].tolist() == [12.0, 3.0]
+    assert np.isnan(columns["temp_c"][1])
+
+
+def test_lote_vacio():
+    columns, errors = parse_lines(b"\n\n")
+    assert errors == []
+    assert all(len(array) == 0 for array in columns.values())
+
+
+def resultado(columns):
+    return {"created": len(columns["timestamp_ms"]), "errors": 0, "error_details": []}
+
+
+def test_flush_fallido_devuelve_el_lote_al_bufer(monkeypatch):
+    async def falla(db, columns, source):
+        raise RuntimeError("error inesperado")
+
+    monkeypatch.setattr(modulo, "ingest_or_spool", falla)
+    monkeypatch.setattr(modulo.reading_spool, "enabled", False)
+    listener = LineProtocolListener(tcp_port=None, udp_port=None)
+    listener.accept(LINEA + b" 1731405600123000000")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(listener.flush())
+    assert listener._pending_lines == 1
+
+    monkeypatch.setattr(modulo, "ingest_or_spool", lambda db, columns, source: asyncio.sleep(0, resultado(columns)))
+    assert asyncio.run(listener.flush()) == 1
+    assert listener._buffer == []
+
+
+def test_flush_fallido_guarda_el_lote_en_el_spool(monkeypatch):
+    guardadas = []
+
+    async def falla(db, columns, source):
+        raise RuntimeError("error inesperado")
+
+    async def store(columns):
+        guardadas.extend(columns["timestamp_ms"].tolist())
+        return {**resultado(columns), "created": 0, "spooled": len(guardadas)}
+
+    monkeypatch.setattr(modulo, "ingest_or_spool", falla)
+    monkeypatch.setattr(modulo.reading_spool, "enabled", True)
+    monkeypatch.setattr(modulo.reading_spool, "store", store)
+    listener = LineProtocolListener(tcp_port=None, udp_port=None)
+    listener.accept(LINEA + b" 1731405600123000000")
+
+    asyncio.run(listener.flush())
+    assert guardadas == [1731405600123]
+    assert listener.stats["lecturas_en_spool"] == 1
+    assert listener._buffer == []
+
+
+def test_stop_espera_el_lote_en_curso(monkeypatch):
+    async def lenta(db, columns, source):
+        await asyncio.sleep(0.05)
+        return resultado(columns)
+
+    monkeypatch.setattr(modulo, "ingest_or_spool", lenta)
+
+    async def main():
+        listener = LineProtocolListener(tcp_port=None, udp_port=None, batch_size=1)
+        await listener.start()
+        listener.accept(LINEA + b" 1731405600123000000")
+        await asyncio.sleep(0.01)
+        await listener.stop()
+        return listener.stats["lecturas_insertadas"]
+
+    assert asyncio.run(main()) == 1
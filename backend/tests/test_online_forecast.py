@@ -0,0 +1,126 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.forecasting import MODELOS_ONLINE, model_from_state
+
+
+INICIO = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def serie(n=300):
+    timestamps = pd.date_range(INICIO, periods=n, freq="1min").to_numpy()
+    minutos = np.arange(n)
+    return timestamps, 24 + 2 * np.sin(2 * np.pi * minutos / 120) + 0.01 * minutos
+
+
+@pytest.mark.parametrize("nombre", list(MODELOS_ONLINE))
+def test_estado_ida_y_vuelta_conserva_el_pronostico(nombre):
+    timestamps, values = serie()
+    model = MODELOS_ONLINE[nombre].fit(timestamps, values)
+    # El estado se guarda como JSON en estados_modelos
+    copia = model_from_state(json.loads(json.dumps(model.to_state())))
+    assert type(copia) is type(model)
+
+    base_time = INICIO + timedelta(minutes=len(values))
+    for a, b in zip(model.forecast(base_time, 30), copia.forecast(base_time, 30)):
+        np.testing.assert_allclose(a, b)
+
+    siguiente = INICIO + timedelta(minutes=len(values))
+    assert model.update(siguiente, 25.0) and copia.update(siguiente, 25.0)
+    assert copia.to_state() == model.to_state()
+
+
+@pytest.mark.parametrize("nombre", list(MODELOS_ONLINE))
+def test_lecturas_repetidas_o_fuera_de_orden_se_ignoran(nombre):
+    timestamps, values = serie()
+    model = MODELOS_ONLINE[nombre].fit(timestamps, values)
+    estado = model.to_state()
+    assert not model.update(INICIO, 30.0)
+    assert not model.update(INICIO + timedelta(minutes=len(values) - 1), 30.0)
+    assert model.to_state() == estado
+
+
+def correr(coro_fn):
+    """Ejecuta una prueba asíncrona contra la base y cierra las conexiones de su loop"""
+    from app.database import async_engine, shard_map
+    from app.services import online_forecast_service
+
+    async def main():
+        try:
+            return await coro_fn()
+        finally:
+            while online_forecast_service._tareas:
+                await asyncio.sleep(0.01)
+            await shard_map.stop()
+            await async_engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_observe_ajusta_en_segundo_plano_y_luego_avanza_el_estado(database):
+    from sqlalchemy import delete
+    from app.database import shard_map
+    from app.models import EstadoModelo, Lectura
+    from app.services import online_forecast_service
+    from app.services.online_forecast_service import OnlineForecastService
+
+    clave = ("A", 3, "holt")
+
+    async def main():
+        async with shard_map.session("A") as db:
+            await db.execute(delete(EstadoModelo).where(EstadoModelo.edificio == "A", EstadoModelo.piso == 3))
+            await db.commit()
+            online_forecast_service._modelos_cache.clear()
+            service = OnlineForecastService(db)
+
+            lectura = Lectura(timestamp=datetime.now(timezone.utc), edificio="A", piso=3, temp_c=24.0, humedad_pct=50.0, energia_kw=12.0)
+            # Sin estado: se programa el ajuste y la lectura no espera
+            await service.observe(lectura)
+            assert online_forecast_service._tareas
+            while online_forecast_service._tareas:
+                await asyncio.sleep(0.01)
+
+            antes = (await service.load_models([clave]))[clave]["temperatura"].to_state()
+            siguiente = Lectura(
+                timestamp=datetime.now(timezone.utc) + timedelta(minutes=1),
+                edificio="A", piso=3, temp_c=26.0, humedad_pct=50.0, energia_kw=12.0
+            )
+            await service.observe(siguiente)
+
+            # Recargado desde la tabla, no desde la caché del proceso
+            online_forecast_service._modelos_cache.clear()
+            despues = (await service.load_models([clave]))[clave]["temperatura"].to_state()
+            return antes, despues
+
+    antes, despues = correr(main)
+    assert despues["n"] == antes["n"] + 1
+    assert despues["last_value"] == 26.0
+
+
+def test_pronostico_de_un_piso_sin_estado_no_ajusta_en_el_request(database):
+    from sqlalchemy import delete, func, select
+    from app.database import shard_map
+    from app.models import EstadoModelo
+    from app.services import online_forecast_service
+    from app.services.prediction_service import MODELO_PROMEDIO_MOVIL, PredictionService
+
+    async def main():
+        async with shard_map.session("A") as db:
+            await db.execute(delete(EstadoModelo).where(EstadoModelo.edificio == "A", EstadoModelo.piso == 2))
+            await db.commit()
+            online_forecast_service._modelos_cache.clear()
+
+            forecast = await PredictionService(db).forecast_online(2, "ewma", 30, "A")
+            sin_estado = await db.scalar(
+                select(func.count()).select_from(EstadoModelo).where(EstadoModelo.piso == 2, EstadoModelo.modelo == "ewma")
+            )
+            pendientes = len(online_forecast_service._tareas)
+            return forecast, sin_estado, pendientes
+
+    forecast, sin_estado, pendientes = correr(main)
+    assert forecast["modelo"] == MODELO_PROMEDIO_MOVIL
+    assert sin_estado == 0
+    assert pendientes == 1
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import httpx
+import numpy as np
+import pytest
+from app.middleware.query_budget import QueryBudgetExceeded, normalize_statement, query_tracker
+from app.services.binary_readings import CONTENT_TYPE_STRUCT, encode_struct
+
+
+# Valores para los parámetros de ruta de las plantillas (como benchmarks/query_budgets.py)
+PARAMETROS_RUTA = {"piso": "1", "edificio": "A"}
+RUTAS_GET = [endpoint for endpoint in query_tracker.budgets if endpoint.startswith("GET ")]
+RUTAS_ESCRITURA = {
+    "POST /api/v1/readings/batch",
+    "POST /api/v1/readings/batch/binary",
+    "POST /api/v1/alerts/{alert_id}/acknowledge",
+}
+
+
+@pytest.fixture(scope="module")
+def api(database):
+    """Cliente sobre la API en proceso, con los presupuestos aplicados (un exceso levanta QueryBudgetExceeded)"""
+    # app.main crea las tablas al importarse: solo después de saber que hay base
+    from app.main import app
+
+    loop = asyncio.new_event_loop()
+    lifespan = app.router.lifespan_context(app)
+    loop.run_until_complete(lifespan.__aenter__())
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://pruebas")
+    enforce = query_tracker.enforce
+    query_tracker.enforce = True
+
+    def request(method, path, **kwargs):
+        return loop.run_until_complete(client.request(method, path, **kwargs))
+
+    yield request
+    query_tracker.enforce = enforce
+    loop.run_until_complete(client.aclose())
+    loop.run_until_complete(lifespan.__aexit__(None, None, None))
+    loop.close()
+
+
+def lote(n, inicio):
+    """n lecturas de un minuto repartidas en los pisos sembrados; una de cada cinco excede la temperatura"""
+    return [
+        {
+            "timestamp": (inicio + timedelta(minutes=k)).isoformat(),
+            "edificio": "A",
+            "piso": k % 3 + 1,
+            "temp_c": 35.0 if k % 5 == 0 else 23.0,
+            "humedad_pct": 50.0,
+            "energia_kw": 10.0,
+        }
+        for k in range(n)
+    ]
+
+
+def test_todas_las_rutas_con_presupuesto_estan_probadas():
+    assert set(query_tracker.budgets) == set(RUTAS_GET) | RUTAS_ESCRITURA
+
+
+@pytest.mark.parametrize("endpoint", RUTAS_GET)
+def test_rutas_de_lectura_dentro_del_presupuesto(api, endpoint):
+    method, template = endpoint.split(" ", 1)
+    path = template.format(**PARAMETROS_RUTA)
+    # La segunda vez con las cachés calientes
+    for _ in range(2):
+        assert api(method, path).status_code == 200
+
+
+@pytest.mark.parametrize("n", [1, 50, 500])
+def test_lote_json_con_sentencias_fijas(api, n):
+    inicio = datetime.now(timezone.utc) - timedelta(days=30 + n)
+    response = api("POST", "/api/v1/readings/batch", json={"readings": lote(n, inicio)})
+    assert response.status_code == 201
+    assert response.json()["created"] == n
+
+
+def test_lote_binario_con_sentencias_fijas(api):
+    n = 200
+    inicio = datetime.now(timezone.utc) - timedelta(days=10)
+    body = encode_struct({
+        "timestamp_ms": int(inicio.timestamp() * 1000) + np.arange(n, dtype=np.int64) * 60000,
+        "edificio": "A",
+        "piso": np.arange(n) % 3 + 1,
+        "temp_c": np.where(np.arange(n) % 5 == 0, 35.0, 23.0),
+        "humedad_pct": 50.0,
+        "energia_kw": 10.0,
+    })
+    response = api("POST", "/api/v1/readings/batch/binary", content=body, headers={"Content-Type": CONTENT_TYPE_STRUCT})
+    assert response.status_code == 201
+    assert response.json()["created"] == n
+
+
+def test_reconocer_alerta(api):
+    alertas = api("GET", "/api/v1/alerts", params={"estado": "activa"}).json()["alerts"]
+    response = api("POST", f"/api/v1/alerts/{alertas[0]['id']}/acknowledge")
+    assert response.status_code == 200
+
+
+def test_exceso_levanta_error(api):
+    endpoint = "GET /api/v1/readings"
+    budget = query_tracker.budgets[endpoint]
+    query_tracker.budgets[endpoint] = 0
+    try:
+        with pytest.raises(QueryBudgetExceeded):
+            api("GET", "/api/v1/readings")
+    finally:
+        query_tracker.budgets[endpoint] = budget
+
+
+def test_normalize_statement_colapsa_literales_y_listas():
+    a = normalize_statement("SELECT * FROM lecturas\n WHERE piso IN ($1, $2, $3) AND edificio = 'A' LIMIT 10")
+    b = normalize_statement("SELECT *  FROM lecturas WHERE piso IN ($1,$2) AND edificio = 'it''s' LIMIT 5")
+    assert a == b == "SELECT * FROM lecturas WHERE piso IN (?, ...) AND edificio = ? LIMIT ?"
+
+
+def test_normalize_statement_estilos_de_parametros():
+    # Solo las listas se colapsan; un parámetro suelto ya no es un literal
+    assert normalize_statement("SELECT * FROM t WHERE id IN (%(a)s, %(b)s) AND x = %s") == "SELECT * FROM t WHERE id IN (?, ...) AND x = %s"
+    assert normalize_statement("SELECT * FROM t WHERE id IN (?, ?, ?)") == "SELECT * FROM t WHERE id IN (?, ...)"
@@ -0,0 +1,14 @@
+from app.sharding import merge_sorted
+
+
+def test_merge_sorted_con_offset_y_limite():
+    partes = [[1, 4, 7], [2, 5], [], [3, 6, 8]]
+    assert merge_sorted(partes, key=lambda x: x) == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert merge_sorted(partes, key=lambda x: x, offset=2, limit=3) == [3, 4, 5]
+    assert merge_sorted(partes, key=lambda x: x, offset=7, limit=3) == [8]
+
+
+def test_merge_sorted_descendente_por_clave():
+    partes = [[{"ts": 9}, {"ts": 3}], [{"ts": 7}, {"ts": 1}]]
+    result = merge_sorted(partes, key=lambda fila: fila["ts"], reverse=True, limit=3)
+    assert [fila["ts"] for fila in result] == [9, 7, 3]
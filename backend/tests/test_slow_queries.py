@@ -0,0 +1,28 @@
+import pytest
+from app.services.ingest_service import INSERT_LECTURAS, INSERT_LECTURAS_COMPACTAS
+from app.slow_queries import SlowQueryRecorder, _is_read
+
+
+@pytest.mark.parametrize("statement", [
+    "SELECT * FROM lecturas WHERE piso = $1",
+    "  select updated_at, deleted_by from alertas",
+    "WITH x AS (SELECT 1) SELECT * FROM x",
+])
+def test_lecturas_puras(statement):
+    assert _is_read(statement)
+
+
+@pytest.mark.parametrize("statement", [
+    str(INSERT_LECTURAS),
+    str(INSERT_LECTURAS_COMPACTAS),
+    "WITH borradas AS (DELETE FROM alertas RETURNING id) SELECT count(*) FROM borradas",
+    "SELECT * FROM estados_modelo WHERE piso = 1 FOR UPDATE",
+    "SELECT * FROM estados_modelo FOR KEY SHARE",
+    "SELECT pg_try_advisory_lock(280001)",
+    "SELECT nextval('lecturas_compactas_id_seq')",
+    "UPDATE alertas SET estado = 'reconocida'",
+    "",
+])
+def test_escrituras_no_usan_analyze(statement):
+    assert not _is_read(statement)
+    assert "ANALYZE" not in SlowQueryRecorder()._explain_sql(statement)
@@ -0,0 +1,89 @@
+import asyncio
+import zlib
+import numpy as np
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app.services.spool import ENCABEZADO_REGISTRO, REGISTRO_SPOOL, ReadingSpool
+
+
+def lote(n, inicio=0):
+    return {
+        "timestamp_ms": np.arange(inicio, inicio + n, dtype=np.int64) * 60000 + 1731405600000,
+        "edificio": np.array(["A"] * n, dtype=object),
+        "piso": np.full(n, 2),
+        "temp_c": np.full(n, 22.5),
+        "humedad_pct": np.full(n, 40.0),
+        "energia_kw": np.full(n, 5.0),
+    }
+
+
+def escribir(spool, *lotes):
+    async def main():
+        for columns in lotes:
+            await spool.store(columns)
+        await spool.sync(seal=True)
+    asyncio.run(main())
+    [segment] = spool.segments()
+    return segment
+
+
+def leer(spool, segment):
+    return [len(records) for records in spool.read_segment(segment)]
+
+
+def test_registros_completos(tmp_path):
+    spool = ReadingSpool(directory=str(tmp_path))
+    segment = escribir(spool, lote(3), lote(2, 3))
+    assert leer(spool, segment) == [3, 2]
+    records = np.concatenate(list(spool.read_segment(segment)))
+    assert records["edificio"].tolist() == [b"A"] * 5
+    assert spool.stats["registros_corruptos"] == 0
+
+
+def test_cola_truncada_se_descarta(tmp_path):
+    spool = ReadingSpool(directory=str(tmp_path))
+    segment = escribir(spool, lote(3), lote(2, 3))
+    data = segment.read_bytes()
+    segment.write_bytes(data[:-10])
+    assert leer(spool, segment) == [3]
+    assert spool.stats["registros_corruptos"] == 1
+
+
+def test_crc_invalido_detiene_la_lectura(tmp_path):
+    spool = ReadingSpool(directory=str(tmp_path))
+    segment = escribir(spool, lote(3), lote(2, 3))
+    data = bytearray(segment.read_bytes())
+    data[ENCABEZADO_REGISTRO.size + 1] ^= 0xFF
+    segment.write_bytes(bytes(data))
+    assert leer(spool, segment) == []
+    assert spool.stats["registros_corruptos"] == 1
+
+
+def test_largo_que_no_es_multiplo_del_registro(tmp_path):
+    spool = ReadingSpool(directory=str(tmp_path))
+    payload = b"\x00" * (REGISTRO_SPOOL.itemsize + 1)
+    segment = spool.directory / "00000000000000000001.spool"
+    segment.write_bytes(ENCABEZADO_REGISTRO.pack(len(payload), zlib.crc32(payload)) + payload)
+    assert leer(spool, segment) == []
+    assert spool.stats["registros_corruptos"] == 1
+
+
+def test_cada_proceso_usa_su_directorio(tmp_path):
+    spool = ReadingSpool(directory=str(tmp_path))
+    otro = ReadingSpool(directory=str(tmp_path))
+    escribir(spool, lote(1))
+    # Mismo pid, pero el directorio ya tiene dueño: el segundo toma otro
+    assert otro.directory != spool.directory
+    assert otro.other_directories() == [spool.directory]
+    with otro.adopt(spool.directory) as adoptado:
+        assert not adoptado
+
+
+def test_disponibilidad_por_shard(tmp_path):
+    spool = ReadingSpool(directory=str(tmp_path))
+    assert not spool.handles(IntegrityError("INSERT", {}, Exception("duplicado")), "shard_1")
+    assert spool.handles(OperationalError("SELECT 1", {}, Exception("conexión rechazada")), "shard_1")
+    # Solo los edificios del shard caído van directo al spool
+    assert spool.bypass("shard_1")
+    assert not spool.bypass("shard_0")
+    assert not spool.db_available
+    assert spool.summary()["shards_no_disponibles"] == ["shard_1"]
@@ -201,7 +201,7 @@ export default function Dashboard() {
         <div className="grid grid-cols-1 md:grid-cols-3 gap-4 mb-6">
           {pisos.map((piso) => (
             <FloorCard
-              key={piso.piso}
+              key={`${piso.edificio}-${piso.piso}`}
               piso={piso.piso}
               summary={piso}
               onViewDetails={(piso) => setSelectedPiso(piso)}
@@ -306,8 +306,8 @@ export default function Dashboard() {
               <span className="text-xs text-gray-500 dark:text-gray-400">(Últimas 4 horas)</span>
             </div>
             <div className="grid grid-cols-1 lg:grid-cols-3 gap-4">
-              {[1, 2, 3].map((piso) => (
-                <div key={piso} className="bg-white dark:bg-gray-800 rounded-lg p-4 shadow-sm border border-gray-200 dark:border-gray-700">
+              {pisos.map(({ edificio, piso }) => (
+                <div key={`${edificio}-${piso}`} className="bg-white dark:bg-gray-800 rounded-lg p-4 shadow-sm border border-gray-200 dark:border-gray-700">
                   <h3 className="text-lg font-semibold text-gray-900 dark:text-white mb-4 pb-2 border-b border-gray-200 dark:border-gray-700">
                     Piso {piso}
                   </h3>
@@ -4,6 +4,8 @@ const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
 const api = axios.create({
   baseURL: API_BASE_URL,
+  // Envía la cookie de lectura de las propias escrituras (réplicas de lectura en el backend)
+  withCredentials: true,
   headers: {
     'Content-Type': 'application/json',
   },